@@ -3,7 +3,8 @@ from __future__ import annotations
 import streamlit as st
 
 from src.config import load_config
-from src.data.loader import load_processed_table
+from src.data.options import filter_options
+from src.data.schema import OPTIONAL_FILTER_COLUMNS
 from src.ui.state import init_state
 
 
@@ -12,10 +13,12 @@ st.set_page_config(page_title="SG Job Profitability OS", layout="wide")
 config = load_config()
 init_state()
 
+# Option lists come from the dim_filter_options mart (or one scan of the fact table), cached
+# for the process lifetime.
 try:
-    fact_timesheet = load_processed_table(config.data_dir, "fact_timesheet_day_enriched")
+    options = filter_options(config.data_dir)
 except FileNotFoundError:
-    fact_timesheet = None
+    options = {}
 
 st.sidebar.title("SG Profitability OS")
 
@@ -40,12 +43,10 @@ exclude_leave = st.sidebar.toggle("Exclude leave", value=True)
 include_non_billable = st.sidebar.toggle("Include non-billable", value=True)
 
 optional_filters = {}
-if fact_timesheet is not None:
-    for col in ["client", "business_unit", "role", "function", "onshore_flag", "job_status", "state"]:
-        if col in fact_timesheet.columns:
-            values = sorted([v for v in fact_timesheet[col].dropna().unique()])
-            choice = st.sidebar.multiselect(col.replace("_", " ").title(), values)
-            optional_filters[col] = choice
+for col in OPTIONAL_FILTER_COLUMNS:
+    if col in options:
+        choice = st.sidebar.multiselect(col.replace("_", " ").title(), options[col])
+        optional_filters[col] = choice
 
 st.session_state["global_filters"] = {
     "time_window": selected_window,
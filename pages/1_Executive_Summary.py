@@ -3,10 +3,18 @@ from __future__ import annotations
 import streamlit as st
 
 from src.config import load_config
-from src.data.loader import load_mart_table, load_processed_table
-from src.data.semantic import month_key_to_period, leave_exclusion_mask
+from src.data.duckdb_engine import engine_from_config
+from src.data.filters import dimension_filters, filtered_table, read_filtered
+from src.data.loader import resolve_table_path
+from src.data.quote_dim import load_quote_dim
+from src.data.result_cache import cached_pack
+from src.data.options import category_options, department_options
+from src.data.router import query
+from src.instrumentation import span
 from src.metrics.utilisation import utilisation_pack
 from src.metrics.quote_delivery import quote_delivery_pack
+from src.data.semantic import build_quote_dim
+from src.metrics.margin_bridge import monthly_bridge, summarise_bridge
 from src.metrics.rate_capture import rate_capture_pack
 from src.ui.components import kpi_strip
 from src.ui.layout import render_header, render_filter_chips
@@ -18,115 +26,145 @@ from src.ui.state import init_state, update_drill
 config = load_config()
 init_state()
 filters = st.session_state.get("global_filters", {})
+TIMESHEET = ["fact_timesheet_day_enriched"]
+engine = engine_from_config(config)
 
 
-def apply_time_filter(df):
-    if "month_key" not in df.columns:
-        return df
-    periods = month_key_to_period(df["month_key"])
-    window = filters.get("window_value")
-    if isinstance(window, int):
-        latest = periods.max()
-        if latest is pd.NaT:
-            return df
-        cutoff = latest - window + 1
-        return df.loc[periods >= cutoff]
-    if window == "FYTD":
-        latest = periods.max()
-        if latest is pd.NaT:
-            return df
-        fy_start = pd.Period(f"{latest.year}-07", freq="M") if latest.month >= 7 else pd.Period(f"{latest.year-1}-07", freq="M")
-        return df.loc[periods >= fy_start]
-    if window == "Custom":
-        start = filters.get("start_month")
-        end = filters.get("end_month")
-        if start and end:
-            return df.loc[(periods >= pd.Period(start, freq="M")) & (periods <= pd.Period(end, freq="M"))]
-    return df
-
-
-import pandas as pd
+def load_filtered_mart(name: str, filter_columns: list[str]):
+    # Marts are pre-aggregated: they can only serve the time window and filters on the columns
+    # they keep. Returns None when the caller should aggregate the fact table instead.
+    if filters.get("exclude_leave") or not set(dimension_filters(filters)) <= set(filter_columns):
+        return None
+    try:
+        return read_filtered(resolve_table_path(config.data_dir, "marts", name), filters)
+    except FileNotFoundError:
+        return None
+
+
+def load_fact_timesheet():
+    # Only the packs below read the fact table; KPIs and drills are routed to the marts.
+    return filtered_table(config.data_dir, "fact_timesheet_day_enriched", filters)
+
+
+def full_quote_dim():
+    # Quotes attributed over the full history, as the marts attribute them.
+    quote_dim = load_quote_dim(config.data_dir)
+    if quote_dim is None:
+        quote_dim = build_quote_dim(filtered_table(config.data_dir, "fact_timesheet_day_enriched", {}))
+    return quote_dim
+
 
 try:
-    fact_timesheet = load_processed_table(config.data_dir, "fact_timesheet_day_enriched")
+    resolve_table_path(config.data_dir, "processed", "fact_timesheet_day_enriched")
 except FileNotFoundError as exc:
     st.error(str(exc))
     st.stop()
-fact_timesheet = apply_time_filter(fact_timesheet)
-
-if filters.get("exclude_leave"):
-    fact_timesheet = fact_timesheet.loc[~leave_exclusion_mask(fact_timesheet)]
-
-for col, values in filters.items():
-    if col in fact_timesheet.columns and isinstance(values, list) and values:
-        fact_timesheet = fact_timesheet.loc[fact_timesheet[col].isin(values)]
 
 render_header("Executive Summary", ["Company"])
 render_filter_chips({k: v for k, v in filters.items() if isinstance(v, list) and v})
 
-profit = fact_timesheet.agg(
-    revenue=("rev_alloc", "sum"),
-    cost=("base_cost", "sum"),
-    hours=("hours_raw", "sum"),
-)
-margin = profit["revenue"] - profit["cost"]
-margin_pct = margin / profit["revenue"] if profit["revenue"] else 0
-util = utilisation_pack(fact_timesheet, ["company"], exclude_leave=False)
-util_pct = util["utilisation"].iloc[0] if not util.empty else 0
-realised_rate = profit["revenue"] / profit["hours"] if profit["hours"] else 0
-
-kpi_strip([
-    ("Revenue", fmt_currency(profit["revenue"])),
-    ("Cost", fmt_currency(profit["cost"])),
-    ("Margin", fmt_currency(margin)),
-    ("Margin %", fmt_percent(margin_pct)),
-    ("Hours", fmt_hours(profit["hours"])),
-    ("Realised Rate", fmt_rate(realised_rate)),
-    ("Utilisation", fmt_percent(util_pct)),
-])
+with span("Executive Summary / KPIs"):
+    totals = query(config.data_dir, ["revenue", "cost", "hours"], [], filters)
+    profit = totals.iloc[0] if not totals.empty else {"revenue": 0.0, "cost": 0.0, "hours": 0.0}
+    margin = profit["revenue"] - profit["cost"]
+    margin_pct = margin / profit["revenue"] if profit["revenue"] else 0
+    util = cached_pack(
+        config.data_dir,
+        "utilisation_pack",
+        lambda: utilisation_pack(load_fact_timesheet(), ["company"], exclude_leave=False),
+        TIMESHEET,
+        params={"exclude_leave": False},
+        group_keys=["company"],
+        filters=filters,
+    )
+    util_pct = util["utilisation"].iloc[0] if not util.empty else 0
+    realised_rate = profit["revenue"] / profit["hours"] if profit["hours"] else 0
+
+    kpi_strip([
+        ("Revenue", fmt_currency(profit["revenue"])),
+        ("Cost", fmt_currency(profit["cost"])),
+        ("Margin", fmt_currency(margin)),
+        ("Margin %", fmt_percent(margin_pct)),
+        ("Hours", fmt_hours(profit["hours"])),
+        ("Realised Rate", fmt_rate(realised_rate)),
+        ("Utilisation", fmt_percent(util_pct)),
+    ])
 
 st.subheader("Quote to Delivery")
-quote_delivery = quote_delivery_pack(fact_timesheet, ["department_final"])
-st.dataframe(quote_delivery, use_container_width=True)
+with span("Executive Summary / Quote to Delivery"):
+    quote_delivery = cached_pack(
+        config.data_dir,
+        "quote_delivery_pack",
+        lambda: quote_delivery_pack(load_fact_timesheet(), ["department_final"]),
+        TIMESHEET,
+        group_keys=["department_final"],
+        filters=filters,
+    )
+    st.dataframe(quote_delivery, use_container_width=True)
 
 st.subheader("Quote Rate vs Realised")
-rate_capture = rate_capture_pack(fact_timesheet, ["department_final"])
-st.dataframe(rate_capture, use_container_width=True)
+with span("Executive Summary / Rate Capture"):
+    if engine is not None:
+        rate_capture = engine.rate_capture_pack(TIMESHEET[0], ["department_final"], filters=filters)
+    else:
+        rate_capture = cached_pack(
+            config.data_dir,
+            "rate_capture_pack",
+            lambda: rate_capture_pack(load_fact_timesheet(), ["department_final"]),
+            TIMESHEET,
+            group_keys=["department_final"],
+            filters=filters,
+        )
+    st.dataframe(rate_capture, use_container_width=True)
 
 st.subheader("Drill")
-departments = sorted(fact_timesheet["department_final"].dropna().unique())
-selected_dept = st.selectbox("Department", ["All"] + departments)
+DRILL_MEASURES = ["hours", "cost", "revenue", "margin"]
+
+
+def drill(key: str, **selection):
+    # Each level is served by the coarsest mart holding it under the filters (leave exclusion
+    # needs a task-level mart); other filters fall back to the fact table.
+    with span(f"Executive Summary / Drill {key}"):
+        return query(config.data_dir, DRILL_MEASURES, [key], filters, **selection)
+
+
+selected_dept = st.selectbox("Department", ["All"] + department_options(config.data_dir))
 if selected_dept != "All":
     update_drill(selected_dept, None)
-    drill_level = "department"
+    drill_level_name = "department"
 else:
     update_drill(None, None)
-    drill_level = "company"
+    drill_level_name = "company"
 
-if drill_level == "company":
-    drill_df = fact_timesheet.groupby("department_final", dropna=False)["rev_alloc"].sum().reset_index()
-    drill_table(drill_df, "dept_drill")
+if drill_level_name == "company":
+    drill_table(drill("department_final"), "dept_drill")
 else:
-    categories = sorted(fact_timesheet.loc[fact_timesheet["department_final"] == selected_dept, "job_category"].dropna().unique())
-    selected_cat = st.selectbox("Job Category", ["All"] + categories)
+    categories = drill("job_category", department_final=selected_dept)
+    selected_cat = st.selectbox("Job Category", ["All"] + category_options(config.data_dir, selected_dept))
     if selected_cat != "All":
         update_drill(selected_dept, selected_cat)
+        selection = {"department_final": selected_dept, "job_category": selected_cat}
         task_tab, staff_tab = st.tabs(["Tasks", "Staff"])
         with task_tab:
-            task_df = fact_timesheet.loc[
-                (fact_timesheet["department_final"] == selected_dept)
-                & (fact_timesheet["job_category"] == selected_cat)
-            ].groupby("task_name", dropna=False)["rev_alloc"].sum().reset_index()
-            drill_table(task_df, "task_drill")
+            drill_table(drill("task_name", **selection), "task_drill")
         with staff_tab:
-            staff_df = fact_timesheet.loc[
-                (fact_timesheet["department_final"] == selected_dept)
-                & (fact_timesheet["job_category"] == selected_cat)
-            ].groupby("staff_name", dropna=False)["rev_alloc"].sum().reset_index()
-            drill_table(staff_df, "staff_drill")
+            drill_table(drill("staff_name", **selection), "staff_drill")
     else:
-        cat_df = fact_timesheet.loc[fact_timesheet["department_final"] == selected_dept].groupby("job_category", dropna=False)["rev_alloc"].sum().reset_index()
-        drill_table(cat_df, "cat_drill")
+        drill_table(categories, "cat_drill")
+
+st.subheader("Margin Bridge")
+with span("Executive Summary / Margin Bridge"):
+    # Both sources give the monthly bridge of monthly_bridge, so they agree under any filter.
+    bridge = load_filtered_mart("cube_margin_bridge", ["company", "department_final", "job_category"])
+    if bridge is None:
+        bridge = cached_pack(
+            config.data_dir,
+            "monthly_bridge",
+            lambda: monthly_bridge(load_fact_timesheet(), full_quote_dim()),
+            TIMESHEET,
+            filters=filters,
+        )
+    st.dataframe(summarise_bridge(bridge, ["department_final"]), use_container_width=True)
 
 st.subheader("Action Shortlist")
 hotspots = quote_delivery.sort_values("hours_variance", ascending=False).head(10)
@@ -4,9 +4,17 @@ import pandas as pd
 import streamlit as st
 
 from src.config import load_config
-from src.data.cohorts import cohort_stats, recency_weights
 from src.data.loader import load_mart_table, load_processed_table
-from src.data.semantic import month_key_to_period
+from src.data.options import category_options, department_options
+from src.instrumentation import span
+from src.metrics.benchmarks import BENCHMARK_QUANTILES
+from src.metrics.quote_builder import (
+    BENCHMARK_WINDOWS,
+    quote_builder_scope,
+    quote_builder_tasks,
+    select_store,
+    task_benchmarks,
+)
 from src.ui.formatting import fmt_currency, fmt_percent
 from src.ui.layout import render_header, render_filter_chips
 from src.ui.state import init_state
@@ -20,56 +28,90 @@ filters = st.session_state.get("global_filters", {})
 render_header("Quote Builder", ["Company", "Quote Builder"])
 render_filter_chips({k: v for k, v in filters.items() if isinstance(v, list) and v})
 
-try:
-    fact_timesheet = load_processed_table(config.data_dir, "fact_timesheet_day_enriched")
-except FileNotFoundError as exc:
-    st.error(str(exc))
-    st.stop()
+QUOTE_BUILDER_COLUMNS = [
+    "department_final",
+    "job_category",
+    "job_no",
+    "task_name",
+    "staff_name",
+    "month_key",
+    "hours_raw",
+    "base_cost",
+    "rev_alloc",
+    "quoted_time_total",
+    "quoted_amount_total",
+]
 
 try:
-    mart_tasks = load_mart_table(config.data_dir, "cube_dept_category_task", fallback_processed="fact_timesheet_day_enriched")
+    dept = st.selectbox("Department", department_options(config.data_dir))
 except FileNotFoundError as exc:
     st.error(str(exc))
     st.stop()
+category = st.selectbox("Job Category", category_options(config.data_dir, dept))
+# The benchmark store (quote_builder_scope / quote_builder_tasks / benchmark_task_quantiles
+# marts) covers every department, category, standard window and toggle; the fact table is read
+# only for custom windows or when the marts have not been built.
+try:
+    scope_store = load_mart_table(config.data_dir, "quote_builder_scope")
+except FileNotFoundError:
+    scope_store = None
 
-
-dept_options = sorted(fact_timesheet["department_final"].dropna().unique())
-dept = st.selectbox("Department", dept_options)
-cat_options = sorted(fact_timesheet.loc[fact_timesheet["department_final"] == dept, "job_category"].dropna().unique())
-category = st.selectbox("Job Category", cat_options)
-
-benchmark_window = st.selectbox("Benchmark Window", [3, 6, 12, 24])
+window_choice = st.selectbox("Benchmark Window", [*BENCHMARK_WINDOWS, "Custom"])
+if window_choice == "Custom":
+    benchmark_window = int(st.number_input("Custom window (months)", min_value=1, max_value=120, value=36))
+else:
+    benchmark_window = window_choice
 recency_on = st.toggle("Recency-weighted", value=True)
 active_only = st.toggle("Active staff only", value=True)
 
-subset = fact_timesheet.loc[(fact_timesheet["department_final"] == dept) & (fact_timesheet["job_category"] == category)]
-periods = month_key_to_period(subset["month_key"])
-latest = periods.max()
-if latest is not pd.NaT:
-    cutoff = latest - benchmark_window + 1
-    subset = subset.loc[periods >= cutoff]
-
-if active_only:
-    active_staff = subset.groupby("staff_name")["hours_raw"].sum()
-    subset = subset.loc[subset["staff_name"].isin(active_staff[active_staff > 0].index)]
-
-weights = recency_weights(subset["month_key"], config.recency_half_life_months) if recency_on else pd.Series(1, index=subset.index)
-
-mart_subset = mart_tasks.loc[
-    (mart_tasks["department_final"] == dept) & (mart_tasks["job_category"] == category)
-]
+selection = [("department_final", "==", dept), ("job_category", "==", category)]
+with span("Quote Builder / Benchmark store"):
+    subset = None
+    scope = tasks = None
+    if scope_store is not None and benchmark_window in BENCHMARK_WINDOWS:
+        scope = scope_store
+        try:
+            tasks = load_mart_table(config.data_dir, "quote_builder_tasks", filters=selection)
+        except FileNotFoundError:
+            scope = None
+    if scope is None:
+        subset = load_processed_table(
+            config.data_dir, "fact_timesheet_day_enriched", columns=QUOTE_BUILDER_COLUMNS, filters=selection
+        )
+        windows = (benchmark_window,)
+        scope = quote_builder_scope(subset, config.recency_half_life_months, config.active_staff_recency_months, windows)
+        tasks = quote_builder_tasks(subset, windows)
+
+    key = {"department_final": dept, "job_category": category, "window": benchmark_window, "active_only": active_only}
+    scope_row = select_store(scope, recency_weighted=recency_on, **key)
+    scope_row = scope_row.iloc[0] if not scope_row.empty else None
+    mart_subset = select_store(tasks, **key)
+
+with span("Quote Builder / Task benchmarks"):
+    benchmarks = None
+    if benchmark_window in BENCHMARK_WINDOWS:
+        try:
+            benchmarks = load_mart_table(config.data_dir, "benchmark_task_quantiles", filters=selection)
+        except FileNotFoundError:
+            pass
+    if benchmarks is None:
+        if subset is None:
+            subset = load_processed_table(
+                config.data_dir, "fact_timesheet_day_enriched", columns=QUOTE_BUILDER_COLUMNS, filters=selection
+            )
+        benchmarks = task_benchmarks(subset, config.recency_half_life_months, (benchmark_window,))
+    weighting = "recency" if recency_on else "uniform"
+    benchmarks = select_store(benchmarks, weighting=weighting, **key)
+benchmark_ranges = [f"actual_hours_{label}" for label in BENCHMARK_QUANTILES]
 
 task_template = mart_subset[["task_name", "quoted_hours", "quoted_amount", "hours", "overrun_rate"]].copy()
 if task_template.empty:
-    task_template = subset.groupby("task_name", dropna=False).agg(
-        quoted_hours=("quoted_time_total", "median"),
-        quoted_amount=("quoted_amount_total", "median"),
-        hours=("hours_raw", "median"),
-    ).reset_index()
+    # Typical job-task quote and delivery from the (recency-weighted) benchmark medians.
+    task_template = benchmarks.rename(columns={
+        "quoted_hours_p50": "quoted_hours", "quoted_amount_p50": "quoted_amount", "actual_hours_p50": "hours"
+    })[["task_name", "quoted_hours", "quoted_amount", "hours"]]
     task_template["overrun_rate"] = pd.NA
-
-if "quoted_hours" not in task_template.columns:
-    task_template = task_template.rename(columns={"quoted_time_total": "quoted_hours", "quoted_amount_total": "quoted_amount"})
+task_template = task_template.merge(benchmarks[["task_name", *benchmark_ranges]], on="task_name", how="left")
 
 task_template["suggested_hours"] = task_template["quoted_hours"].fillna(task_template["hours"])
 
@@ -79,18 +121,19 @@ st.subheader("Task Template")
 edited = st.data_editor(task_template, num_rows="dynamic", use_container_width=True)
 
 planned_hours = edited["suggested_hours"].sum()
+cost_rate = realised_rate = 0.0
+if scope_row is not None:
+    cost_rate = 0.0 if pd.isna(scope_row["cost_rate"]) else float(scope_row["cost_rate"])
+    realised_rate = 0.0 if pd.isna(scope_row["realised_rate"]) else float(scope_row["realised_rate"])
 if edited["quoted_amount"].notna().any():
     quote_amount = edited["quoted_amount"].sum()
 else:
-    quote_amount = planned_hours * (subset["rev_alloc"].sum() / subset["hours_raw"].sum())
+    quote_amount = planned_hours * realised_rate
 
-cost_rate = (subset["base_cost"].sum() / subset["hours_raw"].sum()) if subset["hours_raw"].sum() else 0
 implied_cost = planned_hours * cost_rate
 margin = quote_amount - implied_cost
 margin_pct = margin / quote_amount if quote_amount else 0
 
-stats = cohort_stats(subset, recency_on, config.active_staff_recency_months)
-
 st.subheader("Economics")
 cols = st.columns(5)
 cols[0].metric("Planned hours", f"{planned_hours:,.1f}")
@@ -99,7 +142,14 @@ cols[2].metric("Implied cost", fmt_currency(implied_cost))
 cols[3].metric("Expected margin", fmt_currency(margin))
 cols[4].metric("Margin %", fmt_percent(margin_pct))
 
-st.caption(f"n_jobs: {stats.n_jobs} | n_active_staff: {stats.n_active_staff} | {stats.date_span} | recency weighted: {stats.recency_weighted}")
+if scope_row is not None:
+    date_span = f"{scope_row['first_month_key']} to {scope_row['last_month_key']}"
+    st.caption(
+        f"n_jobs: {scope_row['n_jobs']} | n_active_staff: {scope_row['n_active_staff']} | {date_span} | "
+        f"recency weighted: {recency_on}"
+    )
+else:
+    st.caption("No timesheet rows in this window.")
 
 if st.button("Save quote plan"):
     st.session_state["quote_plan"] = edited.to_dict(orient="records")
@@ -3,29 +3,49 @@ from __future__ import annotations
 import streamlit as st
 
 from src.config import load_config
-from src.data.loader import load_processed_table
-from src.metrics.active_projects import active_projects_pack
+from src.data.duckdb_engine import engine_from_config
+from src.data.filters import filtered_table
+from src.data.result_cache import cached_pack
+from src.instrumentation import span
+from src.metrics.active_projects import ACTIVE_PROJECTS_COLUMNS, active_projects_pack
 from src.ui.layout import render_header, render_filter_chips
 from src.exports import export_csv
 
 
 config = load_config()
 filters = st.session_state.get("global_filters", {})
+engine = engine_from_config(config)
 
 render_header("Active Delivery", ["Company", "Active Delivery"])
 render_filter_chips({k: v for k, v in filters.items() if isinstance(v, list) and v})
 
-try:
-    fact_timesheet = load_processed_table(config.data_dir, "fact_timesheet_day_enriched")
-except FileNotFoundError as exc:
-    st.error(str(exc))
-    st.stop()
-active_jobs = active_projects_pack(fact_timesheet, config.active_job_recency_days)
-
-st.subheader("At-Risk Jobs")
-active_jobs["risk_status"] = "on track"
-active_jobs.loc[active_jobs["quote_consumed_pct"] > 0.9, "risk_status"] = "watch"
-active_jobs.loc[active_jobs["quote_consumed_pct"] > 1.0, "risk_status"] = "at risk"
-
-st.dataframe(active_jobs, use_container_width=True)
-export_csv(active_jobs, "active_jobs.csv", "Export at-risk jobs")
+with span("Active Delivery / At-Risk Jobs"):
+    # The fact table is only read when the result cache has no entry for these inputs.
+    try:
+        if engine is not None:
+            active_jobs = engine.active_projects_pack(
+                "fact_timesheet_day_enriched", config.active_job_recency_days, filters=filters
+            )
+        else:
+            active_jobs = cached_pack(
+                config.data_dir,
+                "active_projects_pack",
+                lambda: active_projects_pack(
+                    filtered_table(config.data_dir, "fact_timesheet_day_enriched", filters, columns=ACTIVE_PROJECTS_COLUMNS),
+                    config.active_job_recency_days,
+                ),
+                ["fact_timesheet_day_enriched"],
+                params={"recency_days": config.active_job_recency_days},
+                filters=filters,
+            )
+    except FileNotFoundError as exc:
+        st.error(str(exc))
+        st.stop()
+
+    st.subheader("At-Risk Jobs")
+    active_jobs["risk_status"] = "on track"
+    active_jobs.loc[active_jobs["quote_consumed_pct"] > 0.9, "risk_status"] = "watch"
+    active_jobs.loc[active_jobs["quote_consumed_pct"] > 1.0, "risk_status"] = "at risk"
+
+    st.dataframe(active_jobs, use_container_width=True)
+    export_csv(active_jobs, "active_jobs.csv", "Export at-risk jobs")
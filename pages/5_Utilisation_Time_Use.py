@@ -3,8 +3,11 @@ from __future__ import annotations
 import streamlit as st
 
 from src.config import load_config
-from src.data.loader import load_processed_table
-from src.metrics.utilisation import utilisation_pack, leakage_breakdown
+from src.data.duckdb_engine import engine_from_config
+from src.data.filters import filtered_table
+from src.data.result_cache import cached_pack
+from src.instrumentation import span
+from src.metrics.utilisation import UTILISATION_COLUMNS, leakage_breakdown, utilisation_packs
 from src.ui.layout import render_header, render_filter_chips
 from src.ui.charts import scatter_chart, bar_chart
 
@@ -15,20 +18,54 @@ filters = st.session_state.get("global_filters", {})
 render_header("Utilisation & Time Use", ["Company", "Utilisation"])
 render_filter_chips({k: v for k, v in filters.items() if isinstance(v, list) and v})
 
+UTILISATION_GROUPINGS = {
+    "staff": ["staff_name", "department_final"],
+    "department": ["department_final"],
+}
+
+engine = engine_from_config(config)
 try:
-    fact_timesheet = load_processed_table(config.data_dir, "fact_timesheet_day_enriched")
+    if engine is not None:
+        packs = engine.utilisation_packs("fact_timesheet_day_enriched", UTILISATION_GROUPINGS, filters=filters)
+        breakdown = engine.leakage_breakdown("fact_timesheet_day_enriched", ["department_final"], filters=filters)
+    else:
+        def load_fact_timesheet():
+            return filtered_table(
+                config.data_dir, "fact_timesheet_day_enriched", filters, columns=UTILISATION_COLUMNS + ["breakdown"]
+            )
+
+        packs = cached_pack(
+            config.data_dir,
+            "utilisation_packs",
+            lambda: utilisation_packs(load_fact_timesheet(), UTILISATION_GROUPINGS, exclude_leave=True),
+            ["fact_timesheet_day_enriched"],
+            params={"groupings": UTILISATION_GROUPINGS, "exclude_leave": True},
+            filters=filters,
+        )
+        breakdown = cached_pack(
+            config.data_dir,
+            "leakage_breakdown",
+            lambda: leakage_breakdown(load_fact_timesheet(), ["department_final"], breakdown_field="breakdown"),
+            ["fact_timesheet_day_enriched"],
+            params={"breakdown_field": "breakdown"},
+            group_keys=["department_final"],
+            filters=filters,
+        )
 except FileNotFoundError as exc:
     st.error(str(exc))
     st.stop()
-util = utilisation_pack(fact_timesheet, ["staff_name", "department_final"], exclude_leave=True)
+
+util = packs["staff"]
 
 st.subheader("Staff Scatter")
-scatter = util.copy()
-scatter["non_billable_share"] = 1 - scatter["utilisation"].fillna(0)
-chart = scatter_chart(scatter, "utilisation", "non_billable_share", color="department_final")
-st.altair_chart(chart, use_container_width=True)
+with span("Utilisation & Time Use / Staff Scatter"):
+    scatter = util.copy()
+    scatter["non_billable_share"] = 1 - scatter["utilisation"].fillna(0)
+    chart = scatter_chart(scatter, "utilisation", "non_billable_share", color="department_final")
+    st.altair_chart(chart, use_container_width=True)
 
 st.subheader("Department Summary")
-breakdown = leakage_breakdown(fact_timesheet, ["department_final"], breakdown_field="breakdown")
-bar = bar_chart(breakdown, "department_final", "hours_raw", color="breakdown")
-st.altair_chart(bar, use_container_width=True)
+with span("Utilisation & Time Use / Department Summary"):
+    st.dataframe(packs["department"], use_container_width=True)
+    bar = bar_chart(breakdown, "department_final", "hours_raw", color="breakdown")
+    st.altair_chart(bar, use_container_width=True)
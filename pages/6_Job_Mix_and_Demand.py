@@ -3,8 +3,11 @@ from __future__ import annotations
 import streamlit as st
 
 from src.config import load_config
-from src.data.loader import load_processed_table
-from src.metrics.capacity import capacity_pack
+from src.data.duckdb_engine import engine_from_config
+from src.data.filters import filtered_table
+from src.data.result_cache import cached_pack
+from src.instrumentation import span
+from src.metrics.capacity import CAPACITY_COLUMNS, capacity_pack
 from src.metrics.job_mix import job_mix_pack
 from src.ui.layout import render_header, render_filter_chips
 from src.ui.charts import line_chart, scatter_chart
@@ -17,19 +20,44 @@ filters = st.session_state.get("global_filters", {})
 render_header("Job Mix & Demand", ["Company", "Job Mix"])
 render_filter_chips({k: v for k, v in filters.items() if isinstance(v, list) and v})
 
-try:
-    fact_job_task = load_processed_table(config.data_dir, "fact_job_task_month")
-    fact_timesheet = load_processed_table(config.data_dir, "fact_timesheet_day_enriched")
-except FileNotFoundError as exc:
-    st.error(str(exc))
-    st.stop()
-
 cohort = st.selectbox("Cohort Definition", ["A", "B", "C"], index=0)
 st.session_state["cohort_definition"] = cohort
 
 weeks_in_window = 4
-capacity = capacity_pack(fact_timesheet, ["staff_name"], weeks_in_window)
-job_mix = job_mix_pack(fact_job_task, capacity, weeks_in_window, util_target=0.75)
+engine = engine_from_config(config)
+with span("Job Mix & Demand / Job Mix"):
+    # The fact tables are only read on result cache misses.
+    try:
+        if engine is not None:
+            capacity = engine.capacity_pack("fact_timesheet_day_enriched", ["staff_name"], weeks_in_window, filters=filters)
+            job_mix = engine.job_mix_pack("fact_job_task_month", capacity, weeks_in_window, 0.75, filters=filters)
+        else:
+            capacity = cached_pack(
+                config.data_dir,
+                "capacity_pack",
+                lambda: capacity_pack(
+                    filtered_table(config.data_dir, "fact_timesheet_day_enriched", filters, columns=CAPACITY_COLUMNS),
+                    ["staff_name"],
+                    weeks_in_window,
+                ),
+                ["fact_timesheet_day_enriched"],
+                params={"weeks_in_window": weeks_in_window},
+                group_keys=["staff_name"],
+                filters=filters,
+            )
+            job_mix = cached_pack(
+                config.data_dir,
+                "job_mix_pack",
+                lambda: job_mix_pack(
+                    filtered_table(config.data_dir, "fact_job_task_month", filters), capacity, weeks_in_window, util_target=0.75
+                ),
+                ["fact_job_task_month", "fact_timesheet_day_enriched"],
+                params={"weeks_in_window": weeks_in_window, "util_target": 0.75},
+                filters=filters,
+            )
+    except FileNotFoundError as exc:
+        st.error(str(exc))
+        st.stop()
 
 st.subheader("Job Mix KPIs")
 summary = job_mix.agg(
@@ -44,12 +72,14 @@ cols[2].metric("Total quoted hours", f"{summary['total_quoted_hours']:,.0f}")
 cols[3].metric("Implied FTE", f"{job_mix['implied_fte_required'].mean():.2f}")
 
 st.subheader("Trend")
-if "month_key" in job_mix.columns:
-    trend = job_mix.groupby("month_key", dropna=False)["job_count"].sum().reset_index()
-    chart = line_chart(trend, "month_key", "job_count")
-    st.altair_chart(chart, use_container_width=True)
+with span("Job Mix & Demand / Trend"):
+    if "month_key" in job_mix.columns:
+        trend = job_mix.groupby("month_key", dropna=False, observed=True)["job_count"].sum().reset_index()
+        chart = line_chart(trend, "month_key", "job_count")
+        st.altair_chart(chart, use_container_width=True)
 
 st.subheader("Job Quadrant")
-quad = job_mix[["avg_quoted_hours_per_job", "avg_quoted_amount_per_job"]].dropna()
-quad_chart = scatter_chart(quad, "avg_quoted_hours_per_job", "avg_quoted_amount_per_job")
-st.altair_chart(quad_chart, use_container_width=True)
+with span("Job Mix & Demand / Job Quadrant"):
+    quad = job_mix[["avg_quoted_hours_per_job", "avg_quoted_amount_per_job"]].dropna()
+    quad_chart = scatter_chart(quad, "avg_quoted_hours_per_job", "avg_quoted_amount_per_job")
+    st.altair_chart(quad_chart, use_container_width=True)
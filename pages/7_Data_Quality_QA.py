@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import pandas as pd
 import streamlit as st
 
 from src.config import load_config
-from src.data.loader import load_processed_table
+from src.data.arrow_store import get_store
+from src.data.dtypes import summarise_dtype_report
+from src.data.filters import filter_cache
+from src.data.loader import dtype_reports, load_processed_table
+from src.data.result_cache import result_cache
+from src import instrumentation
 from src.ui.layout import render_header
 
 
@@ -25,7 +31,11 @@ st.dataframe(audit_unallocated, use_container_width=True)
 
 st.subheader("Quote Match Coverage")
 try:
-    fact_timesheet = load_processed_table(config.data_dir, "fact_timesheet_day_enriched")
+    fact_timesheet = load_processed_table(
+        config.data_dir,
+        "fact_timesheet_day_enriched",
+        columns=["job_no", "task_name", "department_final", "staff_name", "month_key", "quote_match_flag", "quoted_time_total"],
+    )
 except FileNotFoundError as exc:
     st.error(str(exc))
     st.stop()
@@ -36,3 +46,46 @@ if "quote_match_flag" in fact_timesheet.columns:
 st.subheader("Anomalies")
 missing_quote = fact_timesheet.loc[fact_timesheet["quoted_time_total"].isna()].head(50)
 st.dataframe(missing_quote, use_container_width=True)
+
+if config.arrow_store:
+    st.subheader("Shared Table Store")
+    st.dataframe(get_store().memory_report(), use_container_width=True)
+
+st.subheader("Filter Cache")
+st.dataframe(pd.DataFrame([filter_cache().report()]), use_container_width=True)
+
+st.subheader("Result Cache")
+st.dataframe(pd.DataFrame([result_cache(config.data_dir).report()]), use_container_width=True)
+if st.button("Clear result cache"):
+    result_cache(config.data_dir).clear()
+
+st.subheader("Performance")
+# Spans from this process (the mart build workers keep their own); INSTRUMENTATION sets the
+# default mode, the toggle switches timing on or off for the whole process.
+recording = st.toggle("Record timings", value=instrumentation.enabled())
+if recording != instrumentation.enabled():
+    instrumentation.configure("timing" if recording else "off")
+spans = instrumentation.spans()
+if spans:
+    st.caption(f"{len(spans)} spans (mode: {instrumentation.mode()})")
+    span_frame = instrumentation.spans_frame(spans)
+    st.dataframe(instrumentation.span_summary(span_frame), use_container_width=True)
+    st.dataframe(span_frame.tail(200).iloc[::-1], use_container_width=True)
+    cols = st.columns(3)
+    cols[0].download_button(
+        "Export spans JSONL", instrumentation.to_jsonl(spans), file_name="spans.jsonl", mime="application/jsonl"
+    )
+    cols[1].download_button(
+        "Export Chrome trace", instrumentation.to_chrome_trace(spans), file_name="trace.json", mime="application/json"
+    )
+    if cols[2].button("Clear spans"):
+        instrumentation.clear()
+        st.rerun()
+else:
+    st.caption("No spans recorded yet: turn on recording (or set INSTRUMENTATION=1) and rerun a page.")
+
+reports = dtype_reports()
+if reports:
+    st.subheader("Dtype Profile")
+    summary = {name: summarise_dtype_report(report) for name, report in reports.items()}
+    st.dataframe(pd.DataFrame.from_dict(summary, orient="index"), use_container_width=True)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from src.config import load_config
+from src.data.build_manifest import load_manifest
+from src.data.catalog import catalog_key, load_catalog
+from src.data.loader import load_table
+from src.data.marts import build_all_marts
+from src.data.semantic import profitability_rollup
+from src.data.synthetic import write_synthetic_tables
+from src.metrics.active_projects import active_projects_pack
+from src.metrics.capacity import capacity_pack
+from src.metrics.job_mix import job_level_quotes, job_mix_pack
+from src.metrics.margin_bridge import margin_bridge_pack
+from src.metrics.quote_delivery import quote_delivery_pack
+from src.metrics.utilisation import utilisation_pack
+
+TIMESHEET = "fact_timesheet_day_enriched"
+JOB_TASK_MONTH = "fact_job_task_month"
+SCOPE = ["department_final", "job_category"]
+
+# name -> (input table, run(frame, context) -> output frame)
+PACKS = {
+    "profitability_rollup": (TIMESHEET, lambda df, ctx: profitability_rollup(df, SCOPE)),
+    "quote_delivery_pack": (TIMESHEET, lambda df, ctx: quote_delivery_pack(df, SCOPE)),
+    "utilisation_pack": (TIMESHEET, lambda df, ctx: utilisation_pack(df, ["staff_name"])),
+    "capacity_pack": (TIMESHEET, lambda df, ctx: capacity_pack(df, ["staff_name"], 4)),
+    "job_mix_pack": (JOB_TASK_MONTH, lambda df, ctx: job_mix_pack(df, ctx["capacity"], 4, 0.75, ctx["job_quote"])),
+    "active_projects_pack": (TIMESHEET, lambda df, ctx: active_projects_pack(df, 21)),
+    "margin_bridge_pack": (TIMESHEET, lambda df, ctx: margin_bridge_pack(df, SCOPE + ["month_key"])),
+}
+BUILD_ALL_MARTS = "build_all_marts"
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _run_pack(name: str, processed_dir: str) -> list[dict]:
+    # Runs in a fresh process, so the peak RSS belongs to this pack alone (input load included).
+    processed = Path(processed_dir)
+    start = time.perf_counter()
+    timesheet = load_table(processed / f"{TIMESHEET}.parquet")
+    if name == BUILD_ALL_MARTS:
+        job_task = load_table(processed / f"{JOB_TASK_MONTH}.parquet")
+        load_seconds = time.perf_counter() - start
+        loaded_rss = _peak_rss_mb()
+        with tempfile.TemporaryDirectory(prefix="bench-marts-") as data_dir:
+            start = time.perf_counter()
+            built = build_all_marts(timesheet, job_task, Path(data_dir), 21, 4, 0.75)
+            seconds = time.perf_counter() - start
+            timings = load_manifest(Path(data_dir)).get("timings", {})
+            catalog = load_catalog(Path(data_dir))
+            rows = {mart: catalog[catalog_key("marts", mart)].row_count for mart in built}
+        records = [{
+            "pack": name, "rows_in": len(timesheet), "rows_out": int(sum(rows.values())),
+            "seconds": seconds, "load_seconds": load_seconds, "loaded_rss_mb": loaded_rss,
+        }]
+        records += [
+            {"pack": f"mart:{mart}", "rows_in": len(timesheet), "rows_out": rows[mart], "seconds": timings[mart]}
+            for mart in built if mart in timings
+        ]
+        records[0]["peak_rss_mb"] = _peak_rss_mb()
+        return records
+
+    table, run = PACKS[name]
+    context = {}
+    if table == JOB_TASK_MONTH:
+        # The capacity and job-level quote inputs are prepared outside the timed run, as the
+        # mart build computes the quotes once over the full history.
+        context["capacity"] = capacity_pack(timesheet, ["staff_name"], 4)
+        df = load_table(processed / f"{JOB_TASK_MONTH}.parquet")
+        context["job_quote"] = job_level_quotes(df)
+    else:
+        df = timesheet
+    del timesheet
+    load_seconds = time.perf_counter() - start
+    loaded_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    out = run(df, context)
+    seconds = time.perf_counter() - start
+    return [{
+        "pack": name, "rows_in": len(df), "rows_out": len(out), "seconds": seconds,
+        "load_seconds": load_seconds, "loaded_rss_mb": loaded_rss, "peak_rss_mb": _peak_rss_mb(),
+    }]
+
+
+def _commit() -> str | None:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def load_history(path: Path) -> list[dict]:
+    return json.loads(path.read_text()) if path.exists() else []
+
+
+def _previous(history: list[dict], record: dict) -> dict | None:
+    # Latest earlier run of the same pack at the same size and seed.
+    matches = [
+        item for item in history
+        if (item["pack"], item["rows"], item["seed"]) == (record["pack"], record["rows"], record["seed"])
+    ]
+    return matches[-1] if matches else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Time every metric pack and mart over seeded synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--packs", nargs="+", default=[*PACKS, BUILD_ALL_MARTS], choices=[*PACKS, BUILD_ALL_MARTS])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--history", type=Path, default=None, help="JSON history file (default DATA_DIR/benchmarks/pack_history.json)")
+    parser.add_argument("--work-dir", type=Path, default=None, help="where the synthetic tables are written (default: a temp dir)")
+    args = parser.parse_args()
+
+    history_path = args.history or load_config().data_dir / "benchmarks" / "pack_history.json"
+    history = load_history(history_path)
+    run_info = {
+        "commit": _commit(),
+        "run_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "seed": args.seed,
+    }
+    context = multiprocessing.get_context("spawn")
+    print(f"{'rows':>11} {'pack':<34} {'seconds':>9} {'rows/s':>12} {'peak MB':>9} {'vs prev':>8}")
+    with tempfile.TemporaryDirectory(prefix="bench-data-", dir=args.work_dir) as work_dir:
+        for rows in args.sizes:
+            processed = Path(work_dir) / f"rows-{rows}"
+            start = time.perf_counter()
+            write_synthetic_tables(processed, rows, args.seed, args.months)
+            print(f"{rows:>11,} {'(generate)':<34} {time.perf_counter() - start:>9.2f}")
+            for pack in args.packs:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    records = pool.submit(_run_pack, pack, str(processed)).result()
+                for record in records:
+                    record = {**run_info, "rows": rows, **record}
+                    record["rows_per_sec"] = record["rows_in"] / record["seconds"] if record["seconds"] else None
+                    previous = _previous(history, record)
+                    change = f"{record['seconds'] / previous['seconds'] - 1:+.0%}" if previous and previous["seconds"] else ""
+                    peak = f"{record['peak_rss_mb']:.0f}" if "peak_rss_mb" in record else ""
+                    rate = f"{record['rows_per_sec']:,.0f}" if record["rows_per_sec"] else ""
+                    print(f"{rows:>11,} {record['pack']:<34} {record['seconds']:>9.3f} {rate:>12} {peak:>9} {change:>8}")
+                    history.append(record)
+                history_path.parent.mkdir(parents=True, exist_ok=True)
+                history_path.write_text(json.dumps(history, indent=1, default=str))
+    print(f"History written to {history_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,13 +1,23 @@
 from __future__ import annotations
 
+import argparse
+import os
 import sys
 
 from src.config import load_config
+from src.data.build_manifest import load_manifest
 from src.data.loader import load_processed_table
 from src.data.marts import build_all_marts
+from src.data.quote_dim import load_quote_dim
+from src.data.semantic import QUOTE_DIM_TABLE
 
 
 def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the mart tables under DATA_DIR/marts.")
+    parser.add_argument("--full", action="store_true", help="ignore the build manifest and rebuild every month")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes for the marts")
+    args = parser.parse_args()
+
     config = load_config()
     try:
         fact_timesheet = load_processed_table(config.data_dir, "fact_timesheet_day_enriched")
@@ -15,6 +25,9 @@ def main() -> int:
     except FileNotFoundError as exc:
         print(str(exc))
         return 1
+    quote_dim = load_quote_dim(config.data_dir)
+    if quote_dim is None:
+        print(f"{QUOTE_DIM_TABLE} missing or older than the fact table (run scripts/ingest.py); deriving it from the fact")
 
     build_all_marts(
         fact_timesheet=fact_timesheet,
@@ -23,8 +36,21 @@ def main() -> int:
         recency_days=config.active_job_recency_days,
         weeks_in_window=4,
         util_target=0.75,
+        incremental=not args.full,
+        jobs=args.jobs,
+        quote_dim=quote_dim,
+        recency_half_life_months=config.recency_half_life_months,
+        active_staff_months=config.active_staff_recency_months,
     )
-    print("Marts built successfully")
+    manifest = load_manifest(config.data_dir)
+    timings = manifest.get("timings", {})
+    for step in ("prepare", "plan"):
+        print(f"{step}: {timings.get(step, 0):.2f}s")
+    for name, months in manifest.get("marts", {}).items():
+        status = "rebuilt" if months == "all" else f"{len(months)} month(s) rebuilt" if months else "unchanged"
+        print(f"{name}: {status}" + (f" in {timings[name]:.2f}s" if name in timings else ""))
+    print(f"marts wall time: {timings.get('marts_wall', 0):.2f}s with {args.jobs} job(s)")
+    print(f"Marts built successfully (watermark {manifest.get('watermark')})")
     return 0
 
 
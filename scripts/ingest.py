@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from src.config import load_config
+from src.data.arrow_store import ensure_ipc
+from src.data.catalog import catalog_path, register_layer
+from src.data.loader import load_processed_table, resolve_table_path
+from src.data.partitions import write_partitions
+from src.data.quote_dim import write_quote_dim
+
+# Month-keyed processed tables that --partition rewrites as hive-partitioned datasets.
+PARTITIONED_TABLES = ("fact_timesheet_day_enriched", "fact_job_task_month")
+
+
+def partition_processed(data_dir: Path, by: list[str]) -> None:
+    # Rewrites each month-keyed file as <name>/aus_fy=.../month_key=.../part-0.parquet and keeps
+    # the original as <name>.<ext>.bak, which the loader ignores.
+    for name in PARTITIONED_TABLES:
+        try:
+            path = resolve_table_path(data_dir, "processed", name)
+        except FileNotFoundError:
+            continue
+        if path.is_dir():
+            continue
+        # Read without the dtype profile so the stored values are unchanged.
+        df = pd.read_parquet(path) if path.suffix == ".parquet" else pd.read_csv(path)
+        if "month_key" not in df.columns:
+            continue
+        files = write_partitions(df, path.parent / name, by=[col for col in by if col in df.columns])
+        path.rename(path.with_name(f"{path.name}.bak"))
+        print(f"{name}: {len(files)} partition files")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Register the processed tables in the catalog.")
+    parser.add_argument("--partition", action="store_true", help="store month-keyed tables hive-partitioned by FY and month")
+    parser.add_argument("--by-department", action="store_true", help="with --partition, also partition by department_final")
+    args = parser.parse_args()
+
+    config = load_config()
+    processed_dir = config.data_dir / "processed"
+    if not processed_dir.exists():
+        print(f"Missing {processed_dir}")
+        return 1
+    if args.partition:
+        partition_processed(config.data_dir, ["department_final"] if args.by_department else [])
+
+    try:
+        fact_timesheet = load_processed_table(config.data_dir, "fact_timesheet_day_enriched")
+    except FileNotFoundError:
+        fact_timesheet = None
+    if fact_timesheet is not None:
+        # Deduplicated once here so the packs and marts join to it instead of re-deduping the fact;
+        # it records the fact's content hash, so a refreshed fact is not paired with a stale dim.
+        write_quote_dim(config.data_dir, fact_timesheet)
+
+    entries = register_layer(config.data_dir, "processed")
+    for key, entry in sorted(entries.items()):
+        if entry.layer == "processed":
+            print(f"{key}: {entry.row_count:,} rows ({entry.format})")
+            if config.arrow_store:
+                print(f"  arrow store copy: {ensure_ipc(config.data_dir / entry.path)}")
+    print(f"Catalog written to {catalog_path(config.data_dir)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
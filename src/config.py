@@ -9,6 +9,14 @@ def _get_env(name: str, default: str) -> str:
     return os.getenv(name, default)
 
 
+def _instrumentation_mode(value: str) -> str:
+    # off, timing (durations, rows, cache hits) or memory (also tracemalloc peaks; slower).
+    value = value.lower()
+    if value == "memory":
+        return "memory"
+    return "timing" if value in {"1", "true", "yes", "on", "timing"} else "off"
+
+
 @dataclass(frozen=True)
 class AppConfig:
     data_dir: Path
@@ -17,6 +25,17 @@ class AppConfig:
     active_job_recency_days: int
     active_staff_recency_months: int
     recency_half_life_months: int
+    query_engine: str
+    duckdb_threads: int
+    duckdb_memory_limit: str
+    arrow_store: bool
+    dtype_profile: bool
+    float32_measures: bool
+    filter_cache_mb: int
+    result_cache_mb: int
+    parquet_row_group_rows: int
+    instrumentation: str
+    instrumentation_buffer: int
 
 
 def load_config() -> AppConfig:
@@ -36,4 +55,15 @@ def load_config() -> AppConfig:
         active_job_recency_days=int(_get_env("ACTIVE_JOB_RECENCY_DAYS", "21")),
         active_staff_recency_months=int(_get_env("ACTIVE_STAFF_RECENCY_MONTHS", "6")),
         recency_half_life_months=int(_get_env("RECENCY_HALF_LIFE_MONTHS", "6")),
+        query_engine=_get_env("QUERY_ENGINE", "pandas").lower(),
+        duckdb_threads=int(_get_env("DUCKDB_THREADS", "0")),
+        duckdb_memory_limit=_get_env("DUCKDB_MEMORY_LIMIT", ""),
+        arrow_store=_get_env("ARROW_STORE", "0").lower() in {"1", "true", "yes"},
+        dtype_profile=_get_env("DTYPE_PROFILE", "1").lower() in {"1", "true", "yes"},
+        float32_measures=_get_env("FLOAT32_MEASURES", "0").lower() in {"1", "true", "yes"},
+        filter_cache_mb=int(_get_env("FILTER_CACHE_MB", "512")),
+        result_cache_mb=int(_get_env("RESULT_CACHE_MB", "1024")),
+        parquet_row_group_rows=int(_get_env("PARQUET_ROW_GROUP_ROWS", "131072")),
+        instrumentation=_instrumentation_mode(_get_env("INSTRUMENTATION", "off")),
+        instrumentation_buffer=int(_get_env("INSTRUMENTATION_BUFFER", "5000")),
     )
@@ -0,0 +1,503 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Iterable, Mapping, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+
+# A boolean column name, a function of the frame, or a tuple of those combined with AND.
+Mask = Union[str, Callable[[pd.DataFrame], pd.Series], tuple, None]
+DEDUP_KEYS = ("job_no", "task_name")
+
+
+@dataclass(frozen=True)
+class Sum:
+    # NaN for groups with fewer than min_count rows where the mask holds (like pandas min_count).
+    name: str
+    column: str
+    where: Mask = None
+    min_count: int = 0
+
+
+@dataclass(frozen=True)
+class Count:
+    # Rows per group (where the mask holds).
+    name: str
+    where: Mask = None
+
+
+@dataclass(frozen=True)
+class Mean:
+    name: str
+    column: str
+    where: Mask = None
+
+
+@dataclass(frozen=True)
+class Median:
+    # Sort-based; like WeightedQuantile not decomposable, so grouping_sets() rejects it.
+    name: str
+    column: str
+    where: Mask = None
+
+
+@dataclass(frozen=True)
+class WeightedQuantile:
+    # Smallest value whose cumulative weight within the group reaches q * total weight (unit
+    # weights when `weight` is None). Quantiles of the same column share one sort.
+    name: str
+    column: str
+    q: float
+    weight: str | None = None
+    where: Mask = None
+
+
+@dataclass(frozen=True)
+class WeightedMean:
+    name: str
+    column: str
+    weight: str
+    where: Mask = None
+
+
+@dataclass(frozen=True)
+class DedupSum:
+    # Sum over the first row of each dedup key (job-task quotes repeat on every timesheet row).
+    # NaN for groups holding no first rows, like a left join onto a deduplicated rollup.
+    name: str
+    column: str
+    keys: tuple[str, ...] = DEDUP_KEYS
+
+
+@dataclass(frozen=True)
+class OverrunRate:
+    # Share of dedup keys first seen in the group whose total `actual` exceeds
+    # multiplier * `quoted` (quoted taken from the key's first row, missing as 0). With
+    # dedup_rows the per-key totals are read from their `actual_total` column instead.
+    name: str
+    actual: str
+    quoted: str
+    multiplier: float = 1.0
+    keys: tuple[str, ...] = DEDUP_KEYS
+    actual_total: str = "actual_hours"
+
+
+@dataclass(frozen=True)
+class CountDistinct:
+    name: str
+    column: str
+
+
+@dataclass(frozen=True)
+class Min:
+    name: str
+    column: str
+
+
+@dataclass(frozen=True)
+class Max:
+    name: str
+    column: str
+
+
+@dataclass(frozen=True)
+class First:
+    name: str
+    column: str
+
+
+@dataclass(frozen=True)
+class Ratio:
+    # Derived from earlier measures; NaN where the denominator is 0.
+    name: str
+    numerator: str
+    denominator: str
+
+
+@dataclass(frozen=True)
+class Difference:
+    name: str
+    left: str
+    right: str
+
+
+Measure = Union[Sum, Count, Mean, Median, WeightedQuantile, WeightedMean, DedupSum, OverrunRate, CountDistinct, Min, Max, First, Ratio, Difference]
+
+
+def _factorize(series: pd.Series) -> tuple[np.ndarray, object]:
+    # Sorted codes with missing values as the last code, matching groupby(sort=True, dropna=False).
+    codes, uniques = pd.factorize(series, sort=True)
+    codes = codes.astype(np.int64, copy=False)
+    if len(codes) and codes.min() < 0:
+        codes = np.where(codes < 0, len(uniques), codes)
+    return codes, uniques
+
+
+class _GroupIndex:
+    # Dense group ids over several key columns, built one key at a time so the composite
+    # code never exceeds rows * cardinality.
+    def __init__(self, df: pd.DataFrame, keys: Sequence[str]) -> None:
+        self.keys = list(keys)
+        self.uniques = []
+        self.steps = []
+        n = len(df)
+        ids = np.zeros(n, dtype=np.int64)
+        n_groups = 1 if n else 0
+        for key in self.keys:
+            codes, uniques = _factorize(df[key])
+            card = len(uniques) + 1
+            composite = ids * card + codes
+            bound = n_groups * card
+            if bound <= 4 * n + 1024:
+                present = np.zeros(bound, dtype=bool)
+                present[composite] = True
+                seen = np.flatnonzero(present)
+                remap = np.cumsum(present) - 1
+                ids = remap[composite]
+            else:
+                seen, ids = np.unique(composite, return_inverse=True)
+                ids = ids.reshape(-1)
+            self.uniques.append(uniques)
+            self.steps.append((card, seen))
+            n_groups = len(seen)
+        self.ids = ids
+        self.n_groups = n_groups
+
+    def lookup(self, other: pd.DataFrame) -> np.ndarray:
+        # Group ids for rows of another frame; -1 where the key combination is not a group here.
+        ids = np.zeros(len(other), dtype=np.int64)
+        valid = np.ones(len(other), dtype=bool)
+        for key, uniques, (card, seen) in zip(self.keys, self.uniques, self.steps):
+            codes = uniques.get_indexer(other[key]).astype(np.int64)
+            codes[other[key].isna().to_numpy()] = len(uniques)
+            valid &= codes >= 0
+            composite = ids * card + np.maximum(codes, 0)
+            pos = np.searchsorted(seen, composite)
+            found = pos < len(seen)
+            found[found] = seen[pos[found]] == composite[found]
+            valid &= found
+            ids = np.where(found, pos, 0)
+        return np.where(valid, ids, -1)
+
+    def key_frame(self) -> pd.DataFrame:
+        columns = {}
+        group = np.arange(self.n_groups, dtype=np.int64)
+        for key, uniques, (card, seen) in reversed(list(zip(self.keys, self.uniques, self.steps))):
+            composite = seen[group]
+            codes = composite % card
+            if (codes == len(uniques)).any():
+                values = uniques.take(np.where(codes == len(uniques), -1, codes), allow_fill=True, fill_value=np.nan)
+            else:
+                values = uniques.take(codes)
+            columns[key] = pd.Series(values, name=key)
+            group = composite // card
+        return pd.DataFrame({key: columns[key] for key in self.keys})
+
+
+def isin_keys(other: pd.DataFrame, df: pd.DataFrame, keys: Sequence[str]) -> np.ndarray:
+    # Rows of `other` whose key combination occurs in df (missing keys match each other).
+    return _GroupIndex(df, keys).lookup(other) >= 0
+
+
+def _values(df: pd.DataFrame, column: str) -> np.ndarray:
+    return df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _bincount(ids: np.ndarray, weights: np.ndarray | None, n_groups: int, mask: np.ndarray | None = None) -> np.ndarray:
+    if mask is not None:
+        ids = ids[mask]
+        weights = weights[mask] if weights is not None else None
+    if weights is not None:
+        weights = np.where(np.isnan(weights), 0.0, weights)
+    return np.bincount(ids, weights=weights, minlength=n_groups).astype(np.float64)
+
+
+def _grouped_median(ids: np.ndarray, values: np.ndarray, n_groups: int, mask: np.ndarray | None) -> np.ndarray:
+    # Sort by (group, value) once; each group's median sits at fixed offsets from its start.
+    present = ~np.isnan(values) if mask is None else mask & ~np.isnan(values)
+    ids, values = ids[present], values[present]
+    order = np.lexsort((values, ids))
+    values = values[order]
+    counts = np.bincount(ids, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    filled = counts > 0
+    low = starts[filled] + (counts[filled] - 1) // 2
+    high = starts[filled] + counts[filled] // 2
+    medians = np.full(n_groups, np.nan)
+    medians[filled] = (values[low] + values[high]) / 2
+    return medians
+
+
+def _sorted_groups(
+    ids: np.ndarray, values: np.ndarray, n_groups: int, mask: np.ndarray | None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Row order by (group, value) over the present values, and each group's [start, end) in it.
+    present = ~np.isnan(values)
+    if mask is not None:
+        present &= mask
+    rows = np.flatnonzero(present)
+    order = rows[np.lexsort((values[rows], ids[rows]))]
+    counts = np.bincount(ids[rows], minlength=n_groups)
+    ends = np.cumsum(counts)
+    return order, ends - counts, ends
+
+
+def _weighted_quantile(values: np.ndarray, cumulative: np.ndarray, starts: np.ndarray, ends: np.ndarray, q: float) -> np.ndarray:
+    # Smallest value whose running weight within its group reaches q * the group's total weight.
+    before = np.where(starts > 0, cumulative[np.maximum(starts - 1, 0)], 0.0)
+    total = np.where(ends > starts, cumulative[np.maximum(ends - 1, 0)], 0.0) - before
+    filled = total > 0
+    positions = np.searchsorted(cumulative, before + q * total, side="left")
+    positions = np.clip(positions, starts, np.maximum(ends - 1, starts))
+    result = np.full(len(starts), np.nan)
+    result[filled] = values[positions[filled]]
+    return result
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator != 0, numerator / np.where(denominator != 0, denominator, 1.0), np.nan)
+
+
+class _Scan:
+    def __init__(self, df: pd.DataFrame, group_keys: Sequence[str], dedup_rows: pd.DataFrame | None) -> None:
+        self.df = df
+        self.groups = _GroupIndex(df, group_keys)
+        self.dedup_rows = dedup_rows
+        self._first: dict[tuple[str, ...], np.ndarray] = {}
+        self._key_ids: dict[tuple[str, ...], _GroupIndex] = {}
+        self._masks: dict[object, np.ndarray] = {}
+        self._sorted: dict[tuple, tuple] = {}
+
+    def mask(self, where: Mask) -> np.ndarray | None:
+        if where is None:
+            return None
+        if isinstance(where, tuple):
+            masks = [self.mask(part) for part in where]
+            return np.logical_and.reduce(masks)
+        if where not in self._masks:
+            mask = self.df[where] if isinstance(where, str) else where(self.df)
+            if isinstance(mask, pd.Series):
+                mask = mask.to_numpy(dtype=bool, na_value=False)
+            self._masks[where] = np.asarray(mask, dtype=bool)
+        return self._masks[where]
+
+    def sorted_groups(self, column: str, weight: str | None, where: Mask) -> tuple:
+        # The (group, value) sort is shared by every weight and quantile of a column; rows with
+        # a missing weight count with weight zero.
+        key = (column, where)
+        if key not in self._sorted:
+            values = _values(self.df, column)
+            order, starts, ends = _sorted_groups(self.groups.ids, values, self.groups.n_groups, self.mask(where))
+            self._sorted[key] = (values[order], order, starts, ends, {})
+        values, order, starts, ends, cumulative = self._sorted[key]
+        if weight not in cumulative:
+            weights = np.ones(len(order)) if weight is None else np.nan_to_num(_values(self.df, weight)[order], nan=0.0)
+            cumulative[weight] = np.cumsum(weights)
+        return values, cumulative[weight], starts, ends
+
+    def key_index(self, keys: tuple[str, ...]) -> _GroupIndex:
+        if keys not in self._key_ids:
+            self._key_ids[keys] = _GroupIndex(self.df, keys)
+        return self._key_ids[keys]
+
+    def first_rows(self, keys: tuple[str, ...]) -> np.ndarray:
+        # Row positions of the first occurrence of each key, in row order (drop_duplicates keep="first").
+        if keys not in self._first:
+            _, first = np.unique(self.key_index(keys).ids, return_index=True)
+            self._first[keys] = np.sort(first)
+        return self._first[keys]
+
+    def dedup(self, measure: DedupSum) -> tuple[np.ndarray, np.ndarray]:
+        n_groups = self.groups.n_groups
+        if self.dedup_rows is not None:
+            ids = self.groups.lookup(self.dedup_rows)
+            values = _values(self.dedup_rows, measure.column)
+            keep = ids >= 0
+            ids, values = ids[keep], values[keep]
+        else:
+            first = self.first_rows(measure.keys)
+            ids = self.groups.ids[first]
+            values = _values(self.df, measure.column)[first]
+        return _bincount(ids, values, n_groups), np.bincount(ids, minlength=n_groups)
+
+    def overrun(self, measure: OverrunRate) -> tuple[np.ndarray, np.ndarray]:
+        n_groups = self.groups.n_groups
+        if self.dedup_rows is not None:
+            if measure.actual_total not in self.dedup_rows.columns:
+                raise ValueError(f"OverrunRate with dedup_rows needs their {measure.actual_total!r} column")
+            ids = self.groups.lookup(self.dedup_rows)
+            actual = _values(self.dedup_rows, measure.actual_total)
+            quoted = np.nan_to_num(_values(self.dedup_rows, measure.quoted), nan=0.0)
+            keep = ids >= 0
+            ids, actual, quoted = ids[keep], actual[keep], quoted[keep]
+        else:
+            key_index = self.key_index(measure.keys)
+            first = self.first_rows(measure.keys)
+            actual = _bincount(key_index.ids, _values(self.df, measure.actual), key_index.n_groups)[key_index.ids[first]]
+            quoted = np.nan_to_num(_values(self.df, measure.quoted)[first], nan=0.0)
+            ids = self.groups.ids[first]
+        flags = (actual > quoted * measure.multiplier).astype(np.float64)
+        return np.bincount(ids, weights=flags, minlength=n_groups), np.bincount(ids, minlength=n_groups)
+
+    def partial(self, measure: Measure) -> tuple:
+        # Per-group state that coarser groupings can be combined from (see _combine).
+        df, ids, n_groups = self.df, self.groups.ids, self.groups.n_groups
+        if isinstance(measure, Sum):
+            mask = self.mask(measure.where)
+            total = _bincount(ids, _values(df, measure.column), n_groups, mask)
+            return (total,) if measure.min_count <= 0 else (total, _bincount(ids, None, n_groups, mask))
+        if isinstance(measure, Count):
+            return (_bincount(ids, None, n_groups, self.mask(measure.where)),)
+        if isinstance(measure, Mean):
+            values = _values(df, measure.column)
+            mask = self.mask(measure.where)
+            present = ~np.isnan(values) if mask is None else mask & ~np.isnan(values)
+            return _bincount(ids, values, n_groups, present), _bincount(ids, None, n_groups, present)
+        if isinstance(measure, Median):
+            return (_grouped_median(ids, _values(df, measure.column), n_groups, self.mask(measure.where)),)
+        if isinstance(measure, WeightedQuantile):
+            return (_weighted_quantile(*self.sorted_groups(measure.column, measure.weight, measure.where), measure.q),)
+        if isinstance(measure, WeightedMean):
+            values, weights = _values(df, measure.column), _values(df, measure.weight)
+            mask = self.mask(measure.where)
+            return _bincount(ids, values * weights, n_groups, mask), _bincount(ids, weights, n_groups, mask)
+        if isinstance(measure, DedupSum):
+            return self.dedup(measure)
+        if isinstance(measure, OverrunRate):
+            return self.overrun(measure)
+        if isinstance(measure, CountDistinct):
+            codes, uniques = _factorize(df[measure.column])
+            card = len(uniques) + 1
+            present = codes < len(uniques)
+            return np.unique(ids[present] * card + codes[present]), card
+        if isinstance(measure, Min):
+            return (df[measure.column].groupby(ids, sort=True).min().reset_index(drop=True),)
+        if isinstance(measure, Max):
+            return (df[measure.column].groupby(ids, sort=True).max().reset_index(drop=True),)
+        if isinstance(measure, First):
+            # Row position of each group's first non-missing value; len(df) when there is none.
+            column = df[measure.column]
+            rows = np.flatnonzero(column.notna().to_numpy())
+            groups, first = np.unique(ids[rows], return_index=True)
+            positions = np.full(n_groups, len(df), dtype=np.int64)
+            positions[groups] = rows[first]
+            return positions, column
+        raise TypeError(f"Unsupported measure: {measure!r}")
+
+
+def _combine(measure: Measure, partial: tuple, coarse_ids: np.ndarray, n_groups: int) -> tuple:
+    # Re-aggregate per-group partials onto coarser groups; coarse_ids maps each fine group.
+    if isinstance(measure, (Median, WeightedQuantile)):
+        raise ValueError(f"{measure.name}: quantiles cannot be combined across grouping sets")
+    if isinstance(measure, CountDistinct):
+        pairs, card = partial
+        return np.unique(coarse_ids[pairs // card] * card + pairs % card), card
+    if isinstance(measure, Min):
+        return (partial[0].groupby(coarse_ids, sort=True).min().reset_index(drop=True),)
+    if isinstance(measure, Max):
+        return (partial[0].groupby(coarse_ids, sort=True).max().reset_index(drop=True),)
+    if isinstance(measure, First):
+        positions, column = partial
+        combined = np.full(n_groups, len(column), dtype=np.int64)
+        np.minimum.at(combined, coarse_ids, positions)
+        return combined, column
+    return tuple(np.bincount(coarse_ids, weights=part, minlength=n_groups) for part in partial)
+
+
+def _finish(measure: Measure, partial: tuple, n_groups: int, result: dict[str, object]) -> object:
+    if isinstance(measure, Sum) and measure.min_count > 0:
+        total, count = partial
+        return np.where(count >= measure.min_count, total, np.nan)
+    if isinstance(measure, (Sum, Median, WeightedQuantile)):
+        return partial[0]
+    if isinstance(measure, Count):
+        return partial[0].astype(np.int64)
+    if isinstance(measure, (Mean, WeightedMean, OverrunRate)):
+        return _safe_divide(*partial)
+    if isinstance(measure, DedupSum):
+        total, count = partial
+        return np.where(count > 0, total, np.nan)
+    if isinstance(measure, CountDistinct):
+        pairs, card = partial
+        return np.bincount(pairs // card, minlength=n_groups)
+    if isinstance(measure, (Min, Max)):
+        return partial[0]
+    if isinstance(measure, First):
+        positions, column = partial
+        found = positions < len(column)
+        values = column.iloc[np.where(found, positions, 0)].reset_index(drop=True) if len(column) else column
+        return values.where(found) if not found.all() else values
+    if isinstance(measure, Ratio):
+        return _safe_divide(np.asarray(result[measure.numerator], dtype=np.float64),
+                            np.asarray(result[measure.denominator], dtype=np.float64))
+    if isinstance(measure, Difference):
+        return np.asarray(result[measure.left], dtype=np.float64) - np.asarray(result[measure.right], dtype=np.float64)
+    raise TypeError(f"Unsupported measure: {measure!r}")
+
+
+def _is_derived(measure: Measure) -> bool:
+    return isinstance(measure, (Ratio, Difference))
+
+
+def aggregate(
+    df: pd.DataFrame,
+    group_keys: Sequence[str],
+    measures: Iterable[Measure],
+    dedup_rows: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    # One factorize pass over the group keys, one bincount per measure, ratios derived at the
+    # end. Output matches groupby(group_keys, sort=True, dropna=False, observed=True).
+    # dedup_rows supplies pre-deduplicated rows for DedupSum (e.g. quote rows deduplicated over
+    # a wider history than df); they are attributed to df's groups and others are ignored.
+    scan = _Scan(df, group_keys, dedup_rows)
+    n_groups = scan.groups.n_groups
+    result: dict[str, object] = {}
+    for measure in measures:
+        partial = None if _is_derived(measure) else scan.partial(measure)
+        result[measure.name] = _finish(measure, partial, n_groups, result)
+    out = scan.groups.key_frame()
+    for name, values in result.items():
+        out[name] = values
+    return out
+
+
+def grouping_sets(
+    df: pd.DataFrame,
+    sets: Mapping[str, Sequence[str]],
+    measures: Iterable[Measure],
+    by: Sequence[str] = (),
+    dedup_rows: pd.DataFrame | None = None,
+    level_column: str = "level",
+) -> pd.DataFrame:
+    # Every named grouping set (each crossed with `by`) in one scan of df: measures are
+    # aggregated once at the finest grouping (the union of all keys) and each set is combined
+    # from those per-group partials. Dedup quotes stay attributed to each key's first row and
+    # distinct counts are recounted from (group, value) pairs, so every level matches its own
+    # aggregate() call. Keys a set does not group by are missing in its rows.
+    measures = list(measures)
+    by = list(by)
+    keys = list(dict.fromkeys([key for group in sets.values() for key in group] + by))
+    scan = _Scan(df, keys, dedup_rows)
+    partials = {m.name: scan.partial(m) for m in measures if not _is_derived(m)}
+    fine = scan.groups.key_frame()
+    frames = []
+    for level, group in sets.items():
+        coarse = _GroupIndex(fine, list(group) + by)
+        result: dict[str, object] = {}
+        for measure in measures:
+            partial = None
+            if not _is_derived(measure):
+                partial = _combine(measure, partials[measure.name], coarse.ids, coarse.n_groups)
+            result[measure.name] = _finish(measure, partial, coarse.n_groups, result)
+        out = coarse.key_frame()
+        for key in keys:
+            if key not in out.columns:
+                out[key] = fine[key].iloc[:0].reindex(range(coarse.n_groups))
+        for name, values in result.items():
+            out[name] = values
+        out.insert(0, level_column, level)
+        frames.append(out[[level_column, *keys, *result]])
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import os
+import threading
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from src.data.partitions import partition_files
+from src.data.semantic import month_key_to_ord
+from src.instrumentation import mark_cache
+
+
+ARROW_EXTS = (".arrow", ".feather")
+IPC_CACHE_DIRNAME = ".arrow"
+
+
+@dataclass
+class StoreEntry:
+    source: Path
+    ipc_path: Path
+    mtime_ns: int
+    table: pa.Table
+    mapped_bytes: int
+    heap_bytes: int
+    refs: int = 0
+    hits: int = 0
+
+
+def ipc_path_for(source: Path) -> Path:
+    source = Path(source)
+    if source.suffix in ARROW_EXTS:
+        return source
+    return source.parent / IPC_CACHE_DIRNAME / f"{source.stem}.arrow"
+
+
+def write_ipc(table: pa.Table, path: Path) -> Path:
+    # Uncompressed IPC so readers can memory-map the buffers directly.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+    return path
+
+
+def map_ipc_frame(path: Path) -> pd.DataFrame:
+    # split_blocks lets null-free numeric columns stay views over the mapped file.
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def source_mtime_ns(source: Path) -> int:
+    # A partitioned table changes when any of its files does, not its top directory.
+    parts = partition_files(source)
+    return max(part.stat().st_mtime_ns for part in parts) if parts else Path(source).stat().st_mtime_ns
+
+
+def ensure_ipc(source: Path) -> Path:
+    source = Path(source)
+    ipc_path = ipc_path_for(source)
+    if ipc_path == source:
+        return source
+    if ipc_path.exists() and ipc_path.stat().st_mtime_ns >= source_mtime_ns(source):
+        return ipc_path
+    if source.is_dir():
+        table = pa.concat_tables([pq.read_table(part) for part in partition_files(source)], promote_options="default")
+    elif source.suffix == ".parquet":
+        table = pq.read_table(source)
+    elif source.suffix == ".csv":
+        table = pacsv.read_csv(source)
+    else:
+        raise ValueError(f"Unsupported file extension: {source.suffix}")
+    return write_ipc(table, ipc_path)
+
+
+def _with_month_ord(table: pa.Table) -> pa.Table:
+    if "month_key" not in table.column_names or "month_ord" in table.column_names:
+        return table
+    month_key = table.column("month_key").to_pandas()
+    return table.append_column("month_ord", pa.array(month_key_to_ord(month_key).to_numpy(), type=pa.int32()))
+
+
+class ArrowTableStore:
+    def __init__(self) -> None:
+        self._entries: dict[str, StoreEntry] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, source: Path) -> StoreEntry:
+        key = str(Path(source).resolve())
+        mtime_ns = source_mtime_ns(Path(source))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.mtime_ns == mtime_ns:
+                entry.hits += 1
+                return entry
+            mark_cache("miss")
+            ipc_path = ensure_ipc(Path(source))
+            mapped = pa.memory_map(str(ipc_path), "r")
+            before = pa.total_allocated_bytes()
+            table = _with_month_ord(pa.ipc.open_file(mapped).read_all())
+            entry = StoreEntry(
+                source=Path(source),
+                ipc_path=ipc_path,
+                mtime_ns=mtime_ns,
+                table=table,
+                mapped_bytes=ipc_path.stat().st_size,
+                heap_bytes=max(pa.total_allocated_bytes() - before, 0),
+                refs=entry.refs if entry is not None else 0,
+            )
+            self._entries[key] = entry
+            return entry
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+
+    def frame(self, source: Path, columns: Iterable[str] | None = None) -> pd.DataFrame:
+        entry = self._entry(source)
+        table = entry.table
+        if columns is not None:
+            wanted = list(columns)
+            if "month_key" in wanted and "month_ord" in table.column_names:
+                wanted.append("month_ord")
+            wanted = list(dict.fromkeys(wanted))
+            table = table.select([c for c in wanted if c in table.column_names])
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        key = str(Path(source).resolve())
+        with self._lock:
+            entry.refs += 1
+        weakref.finalize(df, self._release, key)
+        return df
+
+    def evict(self, source: Path | None = None) -> None:
+        with self._lock:
+            if source is None:
+                self._entries = {k: e for k, e in self._entries.items() if e.refs > 0}
+            else:
+                key = str(Path(source).resolve())
+                entry = self._entries.get(key)
+                if entry is not None and entry.refs == 0:
+                    del self._entries[key]
+
+    def memory_report(self) -> pd.DataFrame:
+        with self._lock:
+            rows = [
+                {
+                    "table": entry.source.stem,
+                    "source": str(entry.source),
+                    "ipc_path": str(entry.ipc_path),
+                    "rows": entry.table.num_rows,
+                    "columns": entry.table.num_columns,
+                    "mapped_bytes": entry.mapped_bytes,
+                    "heap_bytes": entry.heap_bytes,
+                    "live_views": entry.refs,
+                    "hits": entry.hits,
+                }
+                for entry in self._entries.values()
+            ]
+        return pd.DataFrame(
+            rows,
+            columns=["table", "source", "ipc_path", "rows", "columns", "mapped_bytes", "heap_bytes", "live_views", "hits"],
+        )
+
+
+_STORE = ArrowTableStore()
+
+
+def get_store() -> ArrowTableStore:
+    return _STORE
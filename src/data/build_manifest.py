@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data.partitions import partition_label
+from src.data.semantic import get_month_ord
+
+
+MANIFEST_FILENAME = "_build_manifest.json"
+# Bump when a mart builder changes so the next incremental build starts from scratch.
+BUILD_VERSION = 3
+
+
+def manifest_path(data_dir: Path) -> Path:
+    return Path(data_dir) / "marts" / MANIFEST_FILENAME
+
+
+def load_manifest(data_dir: Path) -> dict:
+    path = manifest_path(data_dir)
+    if not path.exists():
+        return {}
+    manifest = json.loads(path.read_text())
+    return manifest if manifest.get("version") == BUILD_VERSION else {}
+
+
+def write_manifest(data_dir: Path, manifest: dict) -> Path:
+    path = manifest_path(data_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps({"version": BUILD_VERSION, **manifest}, indent=2, sort_keys=True))
+    os.replace(tmp_path, path)
+    return path
+
+
+def _row_hashes(df: pd.DataFrame) -> tuple[list[str], np.ndarray]:
+    columns = sorted(c for c in df.columns if c != "month_ord")
+    return columns, pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+
+def month_hashes(df: pd.DataFrame) -> dict[str, str]:
+    # Row order inside a month is part of the hash: first-occurrence quote attribution and
+    # floating-point sums both depend on it.
+    columns, hashes = _row_hashes(df)
+    ords = get_month_ord(df).to_numpy()
+    order = np.argsort(ords, kind="stable")
+    uniques, starts = np.unique(ords[order], return_index=True)
+    bounds = list(starts[1:]) + [len(order)]
+    result = {}
+    for value, start, end in zip(uniques, starts, bounds):
+        digest = hashlib.sha256(",".join(columns).encode())
+        digest.update(hashes[order[start:end]].tobytes())
+        result[partition_label(int(value))] = digest.hexdigest()
+    return result
+
+
+def changed_months(previous: dict[str, str] | None, current: dict[str, str]) -> set[str]:
+    if not previous:
+        return set(current)
+    return {label for label in set(previous) | set(current) if previous.get(label) != current.get(label)}
+
+
+def watermark(hashes: dict[str, str]) -> str | None:
+    labels = [label for label in hashes if label[:1].isdigit()]
+    return max(labels) if labels else None
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.data.partitions import partition_files
+
+
+CATALOG_FILENAME = "catalog.json"
+CATALOG_VERSION = 1
+TABLE_FORMATS = {".parquet": "parquet", ".csv": "csv", ".arrow": "arrow", ".feather": "arrow"}
+
+_CATALOG_CACHE: dict[str, tuple[tuple[int, int], dict[str, "TableEntry"]]] = {}
+
+
+@dataclass(frozen=True)
+class TableEntry:
+    name: str
+    layer: str
+    path: str
+    format: str
+    schema: dict[str, str]
+    row_count: int
+    mtime_ns: int
+    content_hash: str
+
+
+def catalog_path(data_dir: Path) -> Path:
+    return Path(data_dir) / CATALOG_FILENAME
+
+
+def catalog_key(layer: str, name: str) -> str:
+    return f"{layer}/{name}"
+
+
+def _parquet_footer(path: Path) -> bytes:
+    with open(path, "rb") as handle:
+        handle.seek(-8, os.SEEK_END)
+        tail = handle.read(8)
+        footer_length = int.from_bytes(tail[:4], "little")
+        handle.seek(-(8 + footer_length), os.SEEK_END)
+        return handle.read(footer_length)
+
+
+def content_hash(path: Path) -> str:
+    # Parquet footers carry per-row-group sizes and statistics, so hashing the footer
+    # tracks content changes without reading the data pages.
+    path = Path(path)
+    digest = hashlib.sha256()
+    if path.is_dir():
+        for part in partition_files(path):
+            digest.update(f"{part.relative_to(path)}:{content_hash(part)}".encode())
+        return digest.hexdigest()
+    if path.suffix == ".parquet":
+        digest.update(str(path.stat().st_size).encode())
+        digest.update(_parquet_footer(path))
+        return digest.hexdigest()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _relative_path(data_dir: Path, path: Path) -> str:
+    try:
+        return str(Path(path).resolve().relative_to(Path(data_dir).resolve()))
+    except ValueError:
+        return str(Path(path).resolve())
+
+
+def describe_table(data_dir: Path, layer: str, path: Path) -> TableEntry:
+    path = Path(path)
+    parts = partition_files(path)
+    fmt = "parquet" if parts else TABLE_FORMATS.get(path.suffix)
+    if fmt is None:
+        raise ValueError(f"Unsupported file extension: {path.suffix}")
+    if parts:
+        schema = {field.name: str(field.type) for field in pq.read_schema(parts[0])}
+        row_count = sum(pq.read_metadata(part).num_rows for part in parts)
+    elif fmt == "parquet":
+        metadata = pq.read_metadata(path)
+        schema = {field.name: str(field.type) for field in metadata.schema.to_arrow_schema()}
+        row_count = metadata.num_rows
+    elif fmt == "arrow":
+        with pa.memory_map(str(path), "r") as source:
+            reader = pa.ipc.open_file(source)
+            schema = {field.name: str(field.type) for field in reader.schema}
+            row_count = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    else:
+        sample = pd.read_csv(path, nrows=1000)
+        schema = {col: str(dtype) for col, dtype in sample.dtypes.items()}
+        with open(path, "rb") as handle:
+            row_count = max(sum(1 for _ in handle) - 1, 0)
+    return TableEntry(
+        name=path.stem,
+        layer=layer,
+        path=_relative_path(data_dir, path),
+        format=fmt,
+        schema=schema,
+        row_count=int(row_count),
+        mtime_ns=max(p.stat().st_mtime_ns for p in parts) if parts else path.stat().st_mtime_ns,
+        content_hash=content_hash(path),
+    )
+
+
+def load_catalog(data_dir: Path) -> dict[str, TableEntry]:
+    path = catalog_path(data_dir)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return {}
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _CATALOG_CACHE.get(str(path))
+    if cached and cached[0] == version:
+        return cached[1]
+    payload = json.loads(path.read_text())
+    entries = {key: TableEntry(**value) for key, value in payload.get("tables", {}).items()}
+    _CATALOG_CACHE[str(path)] = (version, entries)
+    return entries
+
+
+def write_catalog(data_dir: Path, entries: dict[str, TableEntry]) -> Path:
+    path = catalog_path(data_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "version": CATALOG_VERSION,
+        "tables": {key: asdict(entries[key]) for key in sorted(entries)},
+    }
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(payload, indent=2))
+    os.replace(tmp_path, path)
+    return path
+
+
+def register_tables(
+    data_dir: Path, layer: str, paths: Iterable[Path], replace_layer: bool = False
+) -> dict[str, TableEntry]:
+    entries = dict(load_catalog(data_dir))
+    if replace_layer:
+        entries = {key: entry for key, entry in entries.items() if entry.layer != layer}
+    for path in paths:
+        entry = describe_table(data_dir, layer, path)
+        entries[catalog_key(layer, entry.name)] = entry
+    write_catalog(data_dir, entries)
+    return entries
+
+
+def register_layer(data_dir: Path, layer: str) -> dict[str, TableEntry]:
+    layer_dir = Path(data_dir) / layer
+    paths = (
+        sorted(p for p in layer_dir.glob("*") if p.suffix in TABLE_FORMATS or partition_files(p))
+        if layer_dir.exists()
+        else []
+    )
+    return register_tables(data_dir, layer, paths, replace_layer=True)
+
+
+def resolve_table(data_dir: Path, layer: str, name: str) -> Path | None:
+    entry = load_catalog(data_dir).get(catalog_key(layer, name))
+    if entry is None:
+        return None
+    path = Path(entry.path)
+    if not path.is_absolute():
+        path = Path(data_dir) / path
+    return path if path.exists() else None
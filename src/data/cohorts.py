@@ -6,7 +6,8 @@ from typing import Iterable, Optional
 import numpy as np
 import pandas as pd
 
-from src.data.semantic import month_key_to_period
+from src.data.aggregate import WeightedQuantile, aggregate
+from src.data.semantic import get_month_ord, latest_month_ord, month_ord_to_label
 
 
 @dataclass(frozen=True)
@@ -18,45 +19,37 @@ class CohortStats:
 
 
 def active_staff(df: pd.DataFrame, months: int) -> pd.Index:
-    periods = month_key_to_period(df["month_key"])
-    latest = periods.max()
-    if latest is pd.NaT:
+    ords = get_month_ord(df)
+    latest = latest_month_ord(ords)
+    if latest is None:
         return pd.Index([])
     cutoff = latest - months + 1
-    recent = df.loc[periods >= cutoff]
-    staff_hours = recent.groupby("staff_name")["hours_raw"].sum()
+    recent = df.loc[ords >= cutoff]
+    staff_hours = recent.groupby("staff_name", observed=True)["hours_raw"].sum()
     return staff_hours[staff_hours > 0].index
 
 
-def recency_weights(month_key: pd.Series, half_life_months: int) -> pd.Series:
-    periods = month_key_to_period(month_key)
-    latest = periods.max()
-    if latest is pd.NaT:
-        return pd.Series(1.0, index=month_key.index)
-    months_diff = (latest - periods).astype(int)
+def recency_weights(month_ord: pd.Series, half_life_months: int) -> pd.Series:
+    latest = latest_month_ord(month_ord)
+    if latest is None:
+        return pd.Series(1.0, index=month_ord.index)
+    months_diff = latest - month_ord.to_numpy(np.int64)
     decay = 0.5 ** (months_diff / max(half_life_months, 1))
-    return pd.Series(decay, index=month_key.index)
+    return pd.Series(decay, index=month_ord.index)
 
 
 def weighted_median(series: pd.Series, weights: pd.Series) -> float:
-    mask = series.notna() & weights.notna()
-    if mask.sum() == 0:
-        return float("nan")
-    s = series[mask].astype(float)
-    w = weights[mask].astype(float)
-    order = np.argsort(s)
-    s_sorted = s.iloc[order]
-    w_sorted = w.iloc[order]
-    cum = w_sorted.cumsum()
-    cutoff = w_sorted.sum() * 0.5
-    return float(s_sorted.iloc[cum.searchsorted(cutoff)])
+    frame = pd.DataFrame({"value": series, "weight": weights})
+    median = aggregate(frame, [], [WeightedQuantile("median", "value", 0.5, "weight")])["median"]
+    return float(median.iloc[0]) if len(median) else float("nan")
 
 
 def cohort_stats(df: pd.DataFrame, recency_weighted: bool, active_staff_months: int) -> CohortStats:
-    periods = month_key_to_period(df["month_key"])
+    ords = get_month_ord(df)
+    valid = ords[ords >= 0]
     date_span = "-"
-    if periods.notna().any():
-        date_span = f"{periods.min().strftime('%Y-%m')} to {periods.max().strftime('%Y-%m')}"
+    if not valid.empty:
+        date_span = f"{month_ord_to_label(int(valid.min()))} to {month_ord_to_label(int(valid.max()))}"
     staff_index = active_staff(df, active_staff_months)
     n_active_staff = int(len(staff_index))
     n_jobs = int(df["job_no"].nunique()) if "job_no" in df.columns else 0
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from src.data.schema import CATEGORY_COLUMNS, FLAG_COLUMNS, MEASURE_COLUMNS
+
+
+TRUE_FLAG_VALUES = {"true", "t", "yes", "y", "1", "1.0"}
+DTYPE_REPORT_COLUMNS = ["column", "dtype_before", "dtype_after", "bytes_before", "bytes_after"]
+
+
+def to_flag(series: pd.Series) -> pd.Series:
+    # Missing flags count as False so boolean masks stay NA-free.
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series.fillna(False).astype(bool) if series.hasnans else series.astype(bool)
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.fillna(0).astype(bool)
+    values, uniques = pd.factorize(series)
+    lookup = np.array([str(value).strip().lower() in TRUE_FLAG_VALUES for value in uniques] + [False])
+    return pd.Series(lookup[values], index=series.index, name=series.name)
+
+
+def _to_category(series: pd.Series) -> pd.Series:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    return series.astype("category")
+
+
+def _to_measure(series: pd.Series, float32: bool) -> pd.Series:
+    if not pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        series = pd.to_numeric(series, errors="coerce")
+    if float32 and series.dtype != np.float32:
+        return series.astype(np.float32)
+    return series
+
+
+def apply_dtype_profile(df: pd.DataFrame, float32_measures: bool = False) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # Converts columns in place (one column at a time, so peak memory stays near one extra
+    # column) and returns the frame with a per-column before/after memory report.
+    rows = []
+    for column in df.columns:
+        if column in CATEGORY_COLUMNS:
+            convert = _to_category
+        elif column in FLAG_COLUMNS:
+            convert = to_flag
+        elif column in MEASURE_COLUMNS:
+            convert = lambda series: _to_measure(series, float32_measures)
+        else:
+            continue
+        before = df[column]
+        after = convert(before)
+        rows.append({
+            "column": column,
+            "dtype_before": str(before.dtype),
+            "dtype_after": str(after.dtype),
+            "bytes_before": int(before.memory_usage(index=False, deep=True)),
+            "bytes_after": int(after.memory_usage(index=False, deep=True)),
+        })
+        if after is not before:
+            df[column] = after
+    return df, pd.DataFrame(rows, columns=DTYPE_REPORT_COLUMNS)
+
+
+def summarise_dtype_report(report: pd.DataFrame) -> dict[str, float]:
+    before = float(report["bytes_before"].sum())
+    after = float(report["bytes_after"].sum())
+    return {
+        "bytes_before": before,
+        "bytes_after": after,
+        "saved_pct": (1 - after / before) if before else 0.0,
+    }
@@ -0,0 +1,484 @@
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from src.config import AppConfig
+from src.data.filters import dimension_filters, partition_window, time_window_bounds
+from src.data.loader import resolve_table_path
+from src.data.partitions import partition_files
+from src.metrics.job_mix import implied_capacity
+from src.metrics.margin_bridge import EFFECT_COLUMNS
+
+try:  # DuckDB optional; the pandas path stays the default engine
+    import duckdb
+except Exception:  # pragma: no cover - duckdb not installed
+    duckdb = None
+
+
+SCOPE_CREEP_FLAGS = ("no_match", "no match", "false", "0")
+
+_MONTH_ORD_SQL = (
+    "CASE WHEN regexp_full_match(CAST(month_key AS VARCHAR), '[0-9]{6}') "
+    "THEN CAST(substr(CAST(month_key AS VARCHAR), 1, 4) AS INTEGER) * 12 "
+    "+ CAST(substr(CAST(month_key AS VARCHAR), 5, 2) AS INTEGER) - 1 "
+    "ELSE CAST(substr(CAST(month_key AS VARCHAR), 1, 4) AS INTEGER) * 12 "
+    "+ CAST(substr(CAST(month_key AS VARCHAR), 6, 2) AS INTEGER) - 1 END"
+)
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _keys(group_keys: list[str], alias: str | None = None) -> str:
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(prefix + _quote_ident(k) for k in group_keys)
+
+
+def _join_on(group_keys: list[str], left: str, right: str) -> str:
+    # pandas merges match NaN keys to each other, so joins must be null-safe.
+    return " AND ".join(
+        f"{left}.{_quote_ident(k)} IS NOT DISTINCT FROM {right}.{_quote_ident(k)}" for k in group_keys
+    )
+
+
+def _order_by(group_keys: list[str]) -> str:
+    return ", ".join(f"{_quote_ident(k)} ASC NULLS LAST" for k in group_keys)
+
+
+class DuckDBEngine:
+    def __init__(
+        self,
+        data_dir: Path,
+        threads: int | None = None,
+        memory_limit: str | None = None,
+        temp_dir: Path | None = None,
+    ) -> None:
+        if duckdb is None:
+            raise ImportError("duckdb is required for the DuckDB query engine")
+        self.data_dir = Path(data_dir)
+        self.temp_dir = Path(temp_dir) if temp_dir else self.data_dir / "cache" / "duckdb"
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        self.con = duckdb.connect()
+        self.con.execute(f"SET threads = {int(threads or os.cpu_count() or 1)}")
+        self.con.execute(f"SET temp_directory = {_quote_literal(self.temp_dir)}")
+        if memory_limit:
+            self.con.execute(f"SET memory_limit = {_quote_literal(memory_limit)}")
+
+    def close(self) -> None:
+        self.con.close()
+
+    def _table_path(self, name: str) -> Path:
+        try:
+            return resolve_table_path(self.data_dir, "processed", name)
+        except FileNotFoundError:
+            return resolve_table_path(self.data_dir, "marts", name)
+
+    def _columns(self, name: str) -> list[str]:
+        return self.query(f"DESCRIBE SELECT * FROM {self._scan(name)}")["column_name"].tolist()
+
+    def _files(self, name: str) -> str | None:
+        # Partition files as a list literal, in the order the pandas loader concatenates them.
+        parts = partition_files(self._table_path(name))
+        return "[" + ", ".join(_quote_literal(part) for part in parts) + "]" if parts else None
+
+    def _scan(self, name: str) -> str:
+        path = self._table_path(name)
+        if path.suffix == ".csv":
+            return f"read_csv_auto({_quote_literal(path)})"
+        files = self._files(name)
+        if files is not None:
+            return f"read_parquet({files}, file_row_number = true, filename = true, hive_partitioning = false)"
+        return f"read_parquet({_quote_literal(path)}, file_row_number = true)"
+
+    def _window_bounds(self, name: str, filters: dict) -> tuple[int | None, int | None]:
+        path = self._table_path(name)
+        if partition_files(path):
+            bounds = {op: value for _, op, value in partition_window(path, filters)}
+            return bounds.get(">="), bounds.get("<=")
+        ords = pd.Series([], dtype="int64")
+        window = filters.get("window_value")
+        if isinstance(window, int) or window == "FYTD":
+            months = self.query(f"SELECT DISTINCT {_MONTH_ORD_SQL} AS month_ord FROM {self._scan(name)}")
+            ords = months["month_ord"].dropna().astype("int64")
+        return time_window_bounds(ords, filters)
+
+    def _where(self, name: str, columns: list[str], filters: dict) -> str:
+        # The global filters (time window, leave exclusion, multiselects) as a WHERE clause over
+        # _source's columns, keeping the rows filtered_table keeps.
+        predicates = []
+        if "month_key" in columns:
+            start, end = self._window_bounds(name, filters)
+            if start is not None:
+                predicates.append(f"_month_ord >= {int(start)}")
+            if end is not None:
+                predicates.append(f"_month_ord <= {int(end)}")
+        if filters.get("exclude_leave") and "task_name" in columns:
+            predicates.append("NOT _is_leave")
+        for col, values in dimension_filters(filters).items():
+            if col in columns:
+                # Matched on the string form, as the pandas filters match them. list_contains
+                # rather than IN: DuckDB 1.5 fails to plan an IN list next to the month range
+                # when the source is scanned twice (rate and quote CTEs).
+                literals = ", ".join(_quote_literal(value) for value in values)
+                predicates.append(f"list_contains([{literals}], CAST({_quote_ident(col)} AS VARCHAR))")
+        return f"WHERE {' AND '.join(predicates)}" if predicates else ""
+
+    def _source(self, name: str, filters: dict | None = None) -> str:
+        # Row order matters for the (job_no, task_name) quote dedupe: pandas keeps the first row.
+        columns = self._columns(name)
+        extras = []
+        if "company" not in columns:
+            extras.append("'SG' AS company")
+        if "month_key" in columns:
+            extras.append(f"{_MONTH_ORD_SQL} AS _month_ord")
+        if "filename" in columns:
+            extras.append(f"(list_position({self._files(name)}, filename)::BIGINT << 40) + file_row_number AS _row")
+        elif "file_row_number" in columns:
+            extras.append("file_row_number AS _row")
+        else:
+            extras.append("row_number() OVER () AS _row")
+        if "quote_match_flag" in columns:
+            flags = ", ".join(_quote_literal(f) for f in SCOPE_CREEP_FLAGS)
+            extras.append(f"COALESCE(lower(CAST(quote_match_flag AS VARCHAR)) IN ({flags}), false) AS _scope_creep")
+        else:
+            extras.append("false AS _scope_creep")
+        if "task_name" in columns:
+            extras.append("COALESCE(lower(CAST(task_name AS VARCHAR)) LIKE '%leave%', false) AS _is_leave")
+        source = f"(SELECT *, {', '.join(extras)} FROM {self._scan(name)})"
+        where = self._where(name, columns, filters or {})
+        return f"(SELECT * FROM {source} {where})" if where else source
+
+    def _quote_rows(self, source: str) -> str:
+        return f"(SELECT * FROM {source} QUALIFY row_number() OVER (PARTITION BY job_no, task_name ORDER BY _row) = 1)"
+
+    def query(self, sql: str) -> pd.DataFrame:
+        # One cursor per query so Streamlit sessions on different threads can share the engine.
+        cursor = self.con.cursor()
+        try:
+            return cursor.execute(sql).df()
+        finally:
+            cursor.close()
+
+    def profitability_rollup(self, table: str, group_keys: list[str], filters: dict | None = None) -> pd.DataFrame:
+        keys = _keys(group_keys)
+        return self.query(f"""
+            SELECT {keys}, hours, cost, revenue,
+                revenue - cost AS margin,
+                (revenue - cost) / NULLIF(revenue, 0) AS margin_pct,
+                revenue / NULLIF(hours, 0) AS realised_rate
+            FROM (
+                SELECT {keys},
+                    COALESCE(SUM(hours_raw), 0) AS hours,
+                    COALESCE(SUM(base_cost), 0) AS cost,
+                    COALESCE(SUM(rev_alloc), 0) AS revenue
+                FROM {self._source(table, filters)}
+                GROUP BY ALL
+            )
+            ORDER BY {_order_by(group_keys)}
+        """)
+
+    def _safe_quote_sql(self, source: str, group_keys: list[str]) -> str:
+        keys = _keys(group_keys)
+        return f"""
+            SELECT {keys},
+                COALESCE(SUM(quoted_time_total), 0) AS quoted_hours,
+                COALESCE(SUM(quoted_amount_total), 0) AS quoted_amount
+            FROM {self._quote_rows(source)}
+            GROUP BY ALL
+        """
+
+    def safe_quote_rollup(self, table: str, group_keys: list[str], filters: dict | None = None) -> pd.DataFrame:
+        sql = self._safe_quote_sql(self._source(table, filters), group_keys)
+        return self.query(f"SELECT * FROM ({sql}) ORDER BY {_order_by(group_keys)}")
+
+    def _rate_sql(self, source: str, group_keys: list[str]) -> str:
+        return f"""
+            WITH realised AS (
+                SELECT {_keys(group_keys)},
+                    COALESCE(SUM(rev_alloc), 0) AS rev_alloc,
+                    COALESCE(SUM(hours_raw), 0) AS hours_raw
+                FROM {source}
+                GROUP BY ALL
+            ),
+            quote AS ({self._safe_quote_sql(source, group_keys)})
+            SELECT {_keys(group_keys, "r")}, r.rev_alloc, r.hours_raw,
+                r.rev_alloc / NULLIF(r.hours_raw, 0) AS realised_rate,
+                q.quoted_hours, q.quoted_amount,
+                q.quoted_amount / NULLIF(q.quoted_hours, 0) AS quote_rate
+            FROM realised r
+            LEFT JOIN quote q ON {_join_on(group_keys, "r", "q")}
+        """
+
+    def rate_rollups(self, table: str, group_keys: list[str], filters: dict | None = None) -> pd.DataFrame:
+        sql = self._rate_sql(self._source(table, filters), group_keys)
+        return self.query(f"SELECT * FROM ({sql}) ORDER BY {_order_by(group_keys)}")
+
+    def rate_capture_pack(self, table: str, group_keys: list[str], filters: dict | None = None) -> pd.DataFrame:
+        sql = self._rate_sql(self._source(table, filters), group_keys)
+        return self.query(f"""
+            SELECT *, realised_rate - quote_rate AS rate_variance,
+                quoted_amount / NULLIF(quoted_hours, 0) AS quote_rate_wtd,
+                rev_alloc / NULLIF(hours_raw, 0) AS realised_rate_wtd
+            FROM ({sql})
+            ORDER BY {_order_by(group_keys)}
+        """)
+
+    def margin_bridge_pack(self, table: str, group_keys: list[str], filters: dict | None = None) -> pd.DataFrame:
+        # Quotes deduplicated within the filtered rows, like margin_bridge_pack without quote_df.
+        source = self._source(table, filters)
+        return self.query(f"""
+            WITH actuals AS (
+                SELECT {_keys(group_keys)},
+                    COALESCE(SUM(rev_alloc), 0) AS actual_revenue,
+                    COALESCE(SUM(base_cost), 0) AS actual_cost,
+                    COALESCE(SUM(hours_raw), 0) AS hours,
+                    COALESCE(SUM(hours_raw) FILTER (WHERE is_billable), 0) AS billable_hours,
+                    median(CASE WHEN hours_raw <> 0 THEN base_cost / hours_raw END) AS expected_cost_rate
+                FROM {source}
+                GROUP BY ALL
+            ),
+            quote AS ({self._safe_quote_sql(source, group_keys)}),
+            bridge AS (
+                SELECT {_keys(group_keys, "a")}, a.actual_revenue, a.actual_cost, a.hours, a.billable_hours,
+                    a.actual_revenue - a.actual_cost AS actual_margin,
+                    a.expected_cost_rate,
+                    q.quoted_hours * a.expected_cost_rate AS expected_cost,
+                    q.quoted_amount - q.quoted_hours * a.expected_cost_rate AS expected_margin,
+                    (a.hours - q.quoted_hours) * a.expected_cost_rate AS hours_variance_effect,
+                    a.actual_revenue - q.quoted_amount AS rate_variance_effect,
+                    a.actual_cost - q.quoted_hours * a.expected_cost_rate AS cost_variance_effect,
+                    (1 - COALESCE(a.billable_hours / NULLIF(a.hours, 0), 0)) * a.actual_cost
+                        AS non_billable_leakage_effect,
+                    (a.actual_revenue - a.actual_cost) - (q.quoted_amount - q.quoted_hours * a.expected_cost_rate)
+                        AS total_variance
+                FROM actuals a
+                LEFT JOIN quote q ON {_join_on(group_keys, "a", "q")}
+            )
+            SELECT *, {", ".join(f"{col} / NULLIF(total_variance, 0) AS {col}_pct" for col in EFFECT_COLUMNS)}
+            FROM bridge
+            ORDER BY {_order_by(group_keys)}
+        """)
+
+    def quote_delivery_pack(
+        self,
+        table: str,
+        group_keys: list[str],
+        severe_overrun_multiplier: float = 1.2,
+        filters: dict | None = None,
+    ) -> pd.DataFrame:
+        source = self._source(table, filters)
+        return self.query(f"""
+            WITH actuals AS (
+                SELECT {_keys(group_keys)},
+                    COALESCE(SUM(hours_raw), 0) AS hours,
+                    COALESCE(SUM(hours_raw) FILTER (WHERE _scope_creep), 0) AS unquoted_hours
+                FROM {source}
+                GROUP BY ALL
+            ),
+            quote AS ({self._safe_quote_sql(source, group_keys)}),
+            job_task_actual AS (
+                SELECT job_no, task_name, COALESCE(SUM(hours_raw), 0) AS hours_raw
+                FROM {source}
+                GROUP BY ALL
+            ),
+            overruns AS (
+                SELECT {_keys(group_keys, "jt")},
+                    AVG(CAST(a.hours_raw > COALESCE(jt.quoted_time_total, 0) AS DOUBLE)) AS overrun_rate,
+                    AVG(CAST(a.hours_raw > COALESCE(jt.quoted_time_total, 0) * {float(severe_overrun_multiplier)} AS DOUBLE))
+                        AS severe_overrun_rate
+                FROM {self._quote_rows(source)} jt
+                LEFT JOIN job_task_actual a ON {_join_on(["job_no", "task_name"], "jt", "a")}
+                GROUP BY ALL
+            )
+            SELECT {_keys(group_keys, "h")}, h.hours, q.quoted_hours, q.quoted_amount,
+                h.hours - q.quoted_hours AS hours_variance,
+                (h.hours - q.quoted_hours) / NULLIF(q.quoted_hours, 0) AS hours_variance_pct,
+                h.unquoted_hours,
+                h.unquoted_hours / NULLIF(h.hours, 0) AS unquoted_share,
+                o.overrun_rate, o.severe_overrun_rate
+            FROM actuals h
+            LEFT JOIN quote q ON {_join_on(group_keys, "h", "q")}
+            LEFT JOIN overruns o ON {_join_on(group_keys, "h", "o")}
+            ORDER BY {_order_by(group_keys)}
+        """)
+
+    def utilisation_pack(
+        self, table: str, group_keys: list[str], exclude_leave: bool = True, filters: dict | None = None
+    ) -> pd.DataFrame:
+        where = "WHERE NOT _is_leave" if exclude_leave else ""
+        keys = _keys(group_keys)
+        return self.query(f"""
+            SELECT {keys}, billable_hours, total_hours,
+                billable_hours / NULLIF(total_hours, 0) AS utilisation,
+                target,
+                target - billable_hours / NULLIF(total_hours, 0) AS util_gap
+            FROM (
+                SELECT {keys},
+                    CASE WHEN COUNT(*) FILTER (WHERE is_billable) > 0
+                        THEN COALESCE(SUM(hours_raw) FILTER (WHERE is_billable), 0) END AS billable_hours,
+                    COALESCE(SUM(hours_raw), 0) AS total_hours,
+                    SUM(utilisation_target * hours_raw) / NULLIF(SUM(hours_raw), 0) AS target
+                FROM {self._source(table, filters)}
+                {where}
+                GROUP BY ALL
+            )
+            ORDER BY {_order_by(group_keys)}
+        """)
+
+    def utilisation_packs(
+        self, table: str, groupings: dict[str, list[str]], exclude_leave: bool = True, filters: dict | None = None
+    ) -> dict[str, pd.DataFrame]:
+        return {name: self.utilisation_pack(table, keys, exclude_leave, filters) for name, keys in groupings.items()}
+
+    def capacity_pack(
+        self, table: str, group_keys: list[str], weeks_in_window: int, filters: dict | None = None
+    ) -> pd.DataFrame:
+        keys = _keys(group_keys)
+        return self.query(f"""
+            WITH base AS (
+                SELECT * FROM {self._source(table, filters)} WHERE NOT _is_leave
+            ),
+            cutoff AS (SELECT MAX(_month_ord) - 1 AS month_ord FROM base)
+            SELECT {keys}, utilisation_target, fte_hours_scaling,
+                38 * fte_hours_scaling AS weekly_capacity,
+                38 * fte_hours_scaling * {int(weeks_in_window)} AS period_capacity,
+                38 * fte_hours_scaling * {int(weeks_in_window)} * utilisation_target AS billable_capacity,
+                trailing_billable_load, trailing_total_load,
+                38 * fte_hours_scaling * {int(weeks_in_window)} * utilisation_target - trailing_billable_load AS headroom
+            FROM (
+                SELECT {keys},
+                    AVG(utilisation_target) AS utilisation_target,
+                    AVG(fte_hours_scaling) AS fte_hours_scaling,
+                    COALESCE(SUM(hours_raw) FILTER (WHERE is_billable AND _month_ord >= cutoff.month_ord), 0)
+                        AS trailing_billable_load,
+                    COALESCE(SUM(hours_raw) FILTER (WHERE _month_ord >= cutoff.month_ord), 0) AS trailing_total_load
+                FROM base, cutoff
+                GROUP BY ALL
+            )
+            ORDER BY {_order_by(group_keys)}
+        """)
+
+    def leakage_breakdown(
+        self, table: str, group_keys: list[str], breakdown_field: str = "breakdown", filters: dict | None = None
+    ) -> pd.DataFrame:
+        keys = group_keys + [breakdown_field]
+        return self.query(f"""
+            SELECT {_keys(keys)}, COALESCE(SUM(hours_raw), 0) AS hours_raw
+            FROM {self._source(table, filters)}
+            WHERE NOT _is_leave AND NOT is_billable
+            GROUP BY ALL
+            ORDER BY {_order_by(keys)}
+        """)
+
+    def active_projects_pack(self, table: str, recency_days: int, filters: dict | None = None) -> pd.DataFrame:
+        # active_jobs (not completed, dated within recency_days of the latest row), then the
+        # per-job rollup of active_projects_pack with quotes deduplicated over the active rows.
+        columns = self._columns(table)
+        if "job_completed_date" in columns:
+            not_completed = "job_completed_date IS NULL"
+        elif "job_status" in columns:
+            not_completed = "COALESCE(lower(CAST(job_status AS VARCHAR)) <> 'completed', true)"
+        else:
+            not_completed = "true"
+        if "date" in columns:
+            latest = "TRY_CAST(date AS TIMESTAMP)"
+        elif "work_date" in columns:
+            latest = "TRY_CAST(work_date AS TIMESTAMP)"
+        else:
+            latest = "CAST(make_date(CAST(_month_ord // 12 AS INTEGER), CAST(_month_ord % 12 + 1 AS INTEGER), 1) AS TIMESTAMP)"
+        group_keys = ["job_no", "department_final", "job_category"]
+        keys = _keys(group_keys)
+        extra = {}
+        if "job_due_date" in columns:
+            extra["job_due_date"] = "MIN(job_due_date)"
+        if "client" in columns:
+            extra["client"] = "arg_min(client, _row) FILTER (WHERE client IS NOT NULL)"
+        return self.query(f"""
+            WITH dated AS (SELECT *, {latest} AS _latest FROM {self._source(table, filters)}),
+            active AS (
+                SELECT * FROM dated
+                WHERE {not_completed}
+                    AND _latest >= (SELECT MAX(_latest) FROM dated) - INTERVAL {int(recency_days)} DAY
+            ),
+            actuals AS (
+                SELECT {keys},
+                    COALESCE(SUM(hours_raw), 0) AS actual_hours,
+                    COALESCE(SUM(rev_alloc), 0) AS revenue,
+                    CASE WHEN COUNT(*) FILTER (WHERE _scope_creep) > 0
+                        THEN COALESCE(SUM(hours_raw) FILTER (WHERE _scope_creep), 0) END AS scope_creep_hours
+                    {"".join(f", {expr} AS {name}" for name, expr in extra.items())}
+                FROM active
+                GROUP BY {keys}
+            ),
+            quote AS ({self._safe_quote_sql("active", group_keys)})
+            SELECT {_keys(group_keys, "a")}, a.actual_hours, a.revenue, q.quoted_hours, q.quoted_amount,
+                a.actual_hours / NULLIF(q.quoted_hours, 0) AS quote_consumed_pct,
+                a.scope_creep_hours,
+                a.scope_creep_hours / NULLIF(a.actual_hours, 0) AS scope_creep_share,
+                a.revenue / NULLIF(a.actual_hours, 0) AS realised_rate,
+                q.quoted_amount / NULLIF(q.quoted_hours, 0) AS quote_rate,
+                a.revenue / NULLIF(a.actual_hours, 0) - q.quoted_amount / NULLIF(q.quoted_hours, 0) AS rate_variance
+                {"".join(f", a.{name}" for name in extra)}
+            FROM actuals a
+            LEFT JOIN quote q ON {_join_on(group_keys, "a", "q")}
+            ORDER BY {_order_by(group_keys)}
+        """)
+
+    def job_mix_pack(
+        self,
+        table: str,
+        capacity_df: pd.DataFrame,
+        weeks_in_window: int,
+        util_target: float,
+        filters: dict | None = None,
+    ) -> pd.DataFrame:
+        # Over fact_job_task_month; job-level quotes come from the filtered rows, like
+        # job_mix_pack without job_quote.
+        source = self._source(table, filters)
+        mix_keys = ["month_key", "department_final", "job_category"]
+        mix = self.query(f"""
+            WITH job_quote AS (
+                SELECT job_no,
+                    COALESCE(SUM(quoted_amount_total), 0) AS quoted_amount,
+                    COALESCE(SUM(quoted_time_total), 0) AS quoted_hours
+                FROM {self._quote_rows(source)}
+                GROUP BY job_no
+            ),
+            bridge AS (SELECT DISTINCT {_keys(mix_keys)}, job_no FROM {source})
+            SELECT {_keys(mix_keys)}, job_count, total_quoted_amount, total_quoted_hours,
+                total_quoted_amount / NULLIF(job_count, 0) AS avg_quoted_amount_per_job,
+                total_quoted_hours / NULLIF(job_count, 0) AS avg_quoted_hours_per_job,
+                total_quoted_amount / NULLIF(total_quoted_hours, 0) AS value_per_quoted_hour,
+                total_quoted_hours / {38 * int(weeks_in_window) * float(util_target)} AS implied_fte_required
+            FROM (
+                SELECT {_keys(mix_keys, "b")},
+                    COUNT(DISTINCT b.job_no) AS job_count,
+                    COALESCE(SUM(q.quoted_amount), 0) AS total_quoted_amount,
+                    COALESCE(SUM(q.quoted_hours), 0) AS total_quoted_hours
+                FROM bridge b
+                LEFT JOIN job_quote q ON {_join_on(["job_no"], "b", "q")}
+                GROUP BY ALL
+            )
+            ORDER BY {_order_by(mix_keys)}
+        """)
+        return implied_capacity(mix, capacity_df)
+
+
+@lru_cache(maxsize=None)
+def _shared_engine(data_dir: str, threads: int, memory_limit: str) -> DuckDBEngine:
+    return DuckDBEngine(Path(data_dir), threads=threads or None, memory_limit=memory_limit or None)
+
+
+def engine_from_config(config: AppConfig) -> DuckDBEngine | None:
+    if config.query_engine != "duckdb":
+        return None
+    return _shared_engine(str(config.data_dir), config.duckdb_threads, config.duckdb_memory_limit)
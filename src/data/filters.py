@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable, Iterable
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.config import load_config
+from src.data.inverted_index import ColumnIndex, resolve_rows
+from src.data.loader import TableFilter, load_table, resolve_table_path
+from src.data.partitions import file_label, partition_files, partition_ord
+from src.data.semantic import get_month_ord, latest_month_ord, leave_exclusion_mask, month_ord_from_key
+from src.instrumentation import instrument, mark_cache
+
+# The global_filters keys that select rows; every other list-valued key is an isin filter.
+SCALAR_FILTER_KEYS = {
+    "time_window", "window_value", "start_month", "end_month", "active_only", "exclude_leave", "include_non_billable"
+}
+
+
+def dimension_filters(filters: dict) -> dict[str, list]:
+    return {
+        col: list(values) for col, values in filters.items()
+        if col not in SCALAR_FILTER_KEYS and isinstance(values, (list, tuple)) and values
+    }
+
+
+def canonical_filters(filters: dict) -> dict:
+    # Only what changes the selected rows, in a stable form: multiselect order and empty
+    # selections do not matter.
+    window = filters.get("window_value")
+    canonical: dict[str, Any] = {"window": window, "exclude_leave": bool(filters.get("exclude_leave"))}
+    if window == "Custom":
+        canonical["months"] = [filters.get("start_month") or None, filters.get("end_month") or None]
+    canonical["dims"] = {col: sorted(map(str, values)) for col, values in sorted(dimension_filters(filters).items())}
+    return canonical
+
+
+def filter_hash(filters: dict) -> str:
+    payload = json.dumps(canonical_filters(filters), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def time_window_bounds(ords: pd.Series, filters: dict) -> tuple[int | None, int | None]:
+    # Inclusive month_ord bounds of the time window (None = open); trailing windows and FYTD end
+    # at the latest month present, FYTD starting in July.
+    window = filters.get("window_value")
+    if isinstance(window, int) or window == "FYTD":
+        latest = latest_month_ord(ords)
+        if latest is None:
+            return None, None
+        if window == "FYTD":
+            return latest - (latest % 12 - 6) % 12, None
+        return latest - window + 1, None
+    if window == "Custom":
+        start, end = filters.get("start_month"), filters.get("end_month")
+        if start and end:
+            try:
+                return month_ord_from_key(start), month_ord_from_key(end)
+            except ValueError:
+                return None, None
+    return None, None
+
+
+def filter_predicates(
+    index_for: Callable[[str], ColumnIndex | None], filters: dict
+) -> list[tuple[ColumnIndex, np.ndarray]]:
+    # (column index, allowed codes) per filter that applies; index_for returns None for columns
+    # the table does not have, whose filters are ignored.
+    predicates = []
+    months = index_for("month_ord")
+    if months is not None:
+        ords = pd.Series(months.values.to_numpy(np.int64))
+        start, end = time_window_bounds(ords, filters)
+        if start is not None or end is not None:
+            keep = (ords >= (start if start is not None else ords.min())) & (ords <= (end if end is not None else ords.max()))
+            predicates.append((months, months.allowed(keep.to_numpy())))
+    if filters.get("exclude_leave"):
+        tasks = index_for("task_name")
+        if tasks is not None:
+            leave = leave_exclusion_mask(pd.DataFrame({"task_name": tasks.values}))
+            predicates.append((tasks, tasks.allowed(~leave.to_numpy(dtype=bool), missing=True)))
+    for col, values in dimension_filters(filters).items():
+        index = index_for(col)
+        if index is not None:
+            predicates.append((index, index.isin(values)))
+    return predicates
+
+
+def select_rows(df: pd.DataFrame, filters: dict) -> np.ndarray | None:
+    # Positions of the rows kept by the time window, leave exclusion and isin filters; None
+    # keeps every row.
+    def index_for(column: str) -> ColumnIndex | None:
+        if column == "month_ord" and ("month_key" in df.columns or "month_ord" in df.columns):
+            return ColumnIndex.from_series(get_month_ord(df))
+        return ColumnIndex.from_series(df[column]) if column in df.columns else None
+
+    return resolve_rows(filter_predicates(index_for, filters), len(df))
+
+
+def apply_filters(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    rows = select_rows(df, filters)
+    return df if rows is None else df.iloc[rows]
+
+
+def partition_window(path: Path, filters: dict) -> list[TableFilter]:
+    # month_ord bounds of the time window from a partitioned table's month labels alone, so a
+    # "Last 3 months" read opens three months of files.
+    parts = partition_files(path)
+    if not parts:
+        return []
+    ords = pd.Series(sorted({partition_ord(file_label(part)) for part in parts}))
+    start, end = time_window_bounds(ords, filters)
+    bounds = [] if start is None else [("month_ord", ">=", start)]
+    return bounds + ([] if end is None else [("month_ord", "<=", end)])
+
+
+def read_filtered(
+    path: Path,
+    filters: dict,
+    columns: Iterable[str] | None = None,
+    table_filters: Iterable[TableFilter] = (),
+) -> pd.DataFrame:
+    # The table under the filters, reading only the window's partitions and, through the
+    # multiselect filters, the matching partitions and row groups; the exact filters are then
+    # applied to that slice.
+    parts = partition_files(path)
+    schema_path = parts[0] if parts else path
+    available = set(pq.read_schema(schema_path).names) if schema_path.suffix == ".parquet" else set()
+    dims = dimension_filters(filters)
+    pushdown = [*table_filters, *partition_window(path, filters)]
+    pushdown += [(col, "in", values) for col, values in dims.items() if col in available]
+    read_columns = None
+    if columns is not None:
+        needed = [*dims, "month_key", *(["task_name"] if filters.get("exclude_leave") else [])]
+        read_columns = list(dict.fromkeys([*columns, *needed]))
+    df = apply_filters(load_table(path, read_columns, pushdown), filters).reset_index(drop=True)
+    if columns is None:
+        return df
+    # month_ord is derived from month_key, so it is kept with it as load_table does.
+    keep = [*columns, *(["month_ord"] if "month_key" in columns else [])]
+    return df[[col for col in dict.fromkeys(keep) if col in df.columns]]
+
+
+class ByteLRUCache:
+    # Thread-safe LRU bounded by the summed size of its values.
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, tuple[object, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> object | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: object, nbytes: int) -> None:
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def report(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_CACHE: ByteLRUCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def filter_cache() -> ByteLRUCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ByteLRUCache(load_config().filter_cache_mb * 1024 * 1024)
+        return _CACHE
+
+
+def _table_version(path: Path) -> tuple:
+    files = partition_files(path) or [path]
+    stats = [file.stat() for file in files]
+    return str(path.resolve()), max(s.st_mtime_ns for s in stats), sum(s.st_size for s in stats)
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def column_index(path: Path, column: str) -> ColumnIndex | None:
+    # Inverted index of one table column (month_ord from month_key), built once per table
+    # version and kept in the filter cache.
+    key = ("index", _table_version(path), column)
+    cached = filter_cache().get(key)
+    if cached is not None:
+        return cached if isinstance(cached, ColumnIndex) else None
+    df = load_table(path, ["month_key"] if column == "month_ord" else [column])
+    index = ColumnIndex.from_series(df[column]) if column in df.columns else None
+    filter_cache().put(key, index if index is not None else "missing", 0 if index is None else index.nbytes)
+    return index
+
+
+def selected_rows(path: Path, filters: dict) -> np.ndarray | None:
+    # Row positions of the table kept by the filters (None = all rows), resolved through the
+    # column indexes and memoized per table version and filter hash.
+    key = ("rows", _table_version(path), filter_hash(filters))
+    cached = filter_cache().get(key)
+    if cached is not None:
+        return None if isinstance(cached, str) else cached
+    predicates = filter_predicates(lambda column: column_index(path, column), filters)
+    rows = resolve_rows(predicates, predicates[0][0].n_rows) if predicates else None
+    filter_cache().put(key, "all" if rows is None else rows, 0 if rows is None else rows.nbytes)
+    return rows
+
+
+@instrument("filter", cached=True, detail=lambda data_dir, name, *args, **kwargs: name)
+def filtered_table(
+    data_dir: Path,
+    name: str,
+    filters: dict,
+    columns: Iterable[str] | None = None,
+    layer: str = "processed",
+) -> pd.DataFrame:
+    # The table under the global filters. Row selections and the filtered frames are shared by
+    # every page and session in the process, so unchanged filters cost a cache lookup.
+    path = resolve_table_path(data_dir, layer, name)
+    column_key = None if columns is None else tuple(columns)
+    key = ("frame", _table_version(path), column_key, filter_hash(filters))
+    cached = filter_cache().get(key)
+    if cached is not None:
+        return cached
+    mark_cache("miss")
+    if partition_window(path, filters):
+        df = read_filtered(path, filters, columns)
+        filter_cache().put(key, df, _frame_bytes(df))
+        return df
+    df = load_table(path, columns)
+    rows = selected_rows(path, filters)
+    if rows is None:
+        return df
+    df = df.take(rows).reset_index(drop=True)
+    filter_cache().put(key, df, _frame_bytes(df))
+    return df
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# A predicate at or above this share of the rows is evaluated as a dense mask over the code
+# array rather than by sorting its row ids.
+DENSE_SHARE = 0.125
+
+
+@dataclass(frozen=True)
+class ColumnIndex:
+    # Inverted index of one column: the rows holding value code c are rows[offsets[c]:offsets[c + 1]],
+    # ascending. Missing values get the last code, len(values).
+    values: pd.Index
+    codes: np.ndarray
+    rows: np.ndarray
+    offsets: np.ndarray
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> ColumnIndex:
+        codes, values = pd.factorize(series, sort=True)
+        n_values = len(values)
+        codes = np.where(codes < 0, n_values, codes).astype(np.min_scalar_type(n_values))
+        rows = np.argsort(codes, kind="stable").astype(np.int32 if len(codes) < 2**31 else np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=n_values + 1))])
+        return cls(pd.Index(values), codes, rows, offsets)
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.rows.nbytes + self.offsets.nbytes
+
+    def allowed(self, matched: np.ndarray, missing: bool = False) -> np.ndarray:
+        # Per-code lookup table from a boolean over `values` (plus the missing slot).
+        return np.append(np.asarray(matched, dtype=bool), missing)
+
+    def isin(self, values) -> np.ndarray:
+        # Matched on the string form, like the filter hash: option tables store values as text.
+        return self.allowed(self.values.astype(str).isin([str(value) for value in values]))
+
+    def count(self, allowed: np.ndarray) -> int:
+        return int(np.diff(self.offsets)[allowed].sum())
+
+    def postings(self, allowed: np.ndarray) -> np.ndarray:
+        # Row ids of the allowed codes, ascending. Runs of consecutive codes (month ranges) are
+        # one slice of `rows`.
+        codes = np.flatnonzero(allowed)
+        if len(codes) == 0:
+            return self.rows[:0]
+        breaks = np.flatnonzero(np.diff(codes) > 1) + 1
+        starts, ends = codes[np.r_[0, breaks]], codes[np.r_[breaks - 1, len(codes) - 1]] + 1
+        parts = [self.rows[self.offsets[s]:self.offsets[e]] for s, e in zip(starts, ends)]
+        rows = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        return rows if len(codes) == 1 else np.sort(rows)
+
+
+def resolve_rows(predicates: list[tuple[ColumnIndex, np.ndarray]], n_rows: int) -> np.ndarray | None:
+    # Rows satisfying every (index, allowed codes) predicate, ascending; None when that is all
+    # rows. The most selective predicate supplies the candidates (its posting lists, or a dense
+    # mask when it keeps a large share); the others are probed through their code arrays in
+    # order of selectivity.
+    counts = [index.count(allowed) for index, allowed in predicates]
+    if all(count == n_rows for count in counts):
+        return None
+    order = np.argsort(counts, kind="stable")
+    index, allowed = predicates[order[0]]
+    if counts[order[0]] >= DENSE_SHARE * n_rows:
+        rows = np.flatnonzero(allowed[index.codes])
+    else:
+        rows = index.postings(allowed)
+    for position in order[1:]:
+        if counts[position] == n_rows:
+            continue
+        index, allowed = predicates[position]
+        rows = rows[allowed[index.codes[rows]]]
+    return rows.astype(np.int32) if n_rows < 2**31 else rows
@@ -2,30 +2,30 @@ from __future__ import annotations
 
 import pandas as pd
 
-from src.data.semantic import month_key_to_period
+from src.data.semantic import MONTH_ORD_NA, get_month_ord, month_ord_to_period, string_mask
+
+
+def _first_month(ords: pd.Series, job_no: pd.Series) -> pd.DataFrame:
+    first = ords.where(ords >= 0).groupby(job_no, dropna=False, observed=True).min()
+    first = month_ord_to_period(first.fillna(MONTH_ORD_NA).astype("int32"))
+    return pd.DataFrame({"job_no": first.index, "month_period": first.array})
 
 
 def first_activity_month(df: pd.DataFrame) -> pd.DataFrame:
-    periods = month_key_to_period(df["month_key"])
-    df = df.copy()
-    df["month_period"] = periods
-    return df.groupby("job_no", dropna=False)["month_period"].min().reset_index()
+    return _first_month(get_month_ord(df), df["job_no"])
 
 
 def first_revenue_month(df: pd.DataFrame) -> pd.DataFrame:
-    periods = month_key_to_period(df["month_key"])
-    df = df.copy()
-    df["month_period"] = periods
-    revenue_month = df.loc[df["rev_alloc"] > 0]
-    return revenue_month.groupby("job_no", dropna=False)["month_period"].min().reset_index()
+    # fact_job_task_month carries rev_alloc_sum rather than rev_alloc.
+    revenue = (df["rev_alloc"] if "rev_alloc" in df.columns else df["rev_alloc_sum"]) > 0
+    return _first_month(get_month_ord(df)[revenue], df.loc[revenue, "job_no"])
 
 
 def active_jobs(df: pd.DataFrame, recency_days: int) -> pd.DataFrame:
-    df = df.copy()
     if "job_completed_date" in df.columns:
         not_completed = df["job_completed_date"].isna()
     elif "job_status" in df.columns:
-        not_completed = ~df["job_status"].astype(str).str.lower().eq("completed")
+        not_completed = ~string_mask(df["job_status"], lambda values: values.str.lower().eq("completed"))
     else:
         not_completed = pd.Series(True, index=df.index)
 
@@ -34,7 +34,7 @@ def active_jobs(df: pd.DataFrame, recency_days: int) -> pd.DataFrame:
     elif "work_date" in df.columns:
         latest = pd.to_datetime(df["work_date"], errors="coerce")
     else:
-        latest = pd.to_datetime(df["month_key"].astype(str).str[:7] + "-01", errors="coerce")
+        latest = month_ord_to_period(get_month_ord(df)).dt.to_timestamp()
 
     recent_cutoff = latest.max() - pd.Timedelta(days=recency_days)
     recent = latest >= recent_cutoff
@@ -1,9 +1,21 @@
 from __future__ import annotations
 
+import datetime as dt
+import operator
 from pathlib import Path
-from typing import Optional
+from typing import Any, Iterable, Optional
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.config import load_config
+from src.data.arrow_store import ARROW_EXTS, get_store
+from src.data.catalog import resolve_table
+from src.data.dtypes import apply_dtype_profile
+from src.data.partitions import file_label, partition_files, partition_ord, partition_values
+from src.data.semantic import month_key_to_ord, month_ord_to_label
+from src.instrumentation import instrument, mark_cache
 
 try:  # Streamlit optional for scripts/tests
     import streamlit as st
@@ -20,7 +32,21 @@ except Exception:  # pragma: no cover - used outside Streamlit
         return _decorator
 
 
-SUPPORTED_EXTS = (".parquet", ".csv")
+SUPPORTED_EXTS = (".parquet", ".csv") + ARROW_EXTS
+
+TableFilter = tuple[str, str, Any]
+
+_COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+FILTER_OPS = set(_COMPARISONS) | {"in", "not in"}
+
+_DTYPE_REPORTS: dict[str, pd.DataFrame] = {}
 
 
 def _resolve_table_path(base_dir: Path, name: str) -> Path:
@@ -28,64 +54,302 @@ def _resolve_table_path(base_dir: Path, name: str) -> Path:
         candidate = base_dir / f"{name}{ext}"
         if candidate.exists():
             return candidate
+    if partition_files(base_dir / name):
+        return base_dir / name
     raise FileNotFoundError(f"Missing {name} in {base_dir} (supported: {SUPPORTED_EXTS})")
 
 
+def _add_month_ord(df: pd.DataFrame) -> pd.DataFrame:
+    if "month_key" in df.columns and "month_ord" not in df.columns:
+        df["month_ord"] = month_key_to_ord(df["month_key"])
+    return df
+
+
+def _normalise_columns(columns: Iterable[str] | None) -> tuple[str, ...] | None:
+    if columns is None:
+        return None
+    return tuple(dict.fromkeys(columns))
+
+
+def _normalise_filters(filters: Iterable[TableFilter] | None) -> tuple[TableFilter, ...] | None:
+    if not filters:
+        return None
+    normalised = []
+    for column, op, value in filters:
+        if op not in FILTER_OPS:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if op in ("in", "not in"):
+            value = tuple(sorted(set(value), key=str))
+        normalised.append((column, op, value))
+    return tuple(sorted(normalised, key=lambda f: (f[0], f[1], str(f[2]))))
+
+
+def apply_table_filters(df: pd.DataFrame, filters: Iterable[TableFilter] | None) -> pd.DataFrame:
+    mask = None
+    for column, op, value in filters or ():
+        if op == "in":
+            current = df[column].isin(value)
+        elif op == "not in":
+            current = ~df[column].isin(value)
+        else:
+            current = _COMPARISONS[op](df[column], value)
+        if current.dtype != bool:
+            current = current.fillna(False).astype(bool)
+        mask = current if mask is None else mask & current
+    return df if mask is None else df.loc[mask]
+
+
+def _month_bounds(op: str, value: Any) -> tuple[int | None, int | None]:
+    # Inclusive lower / exclusive upper month_ord bounds implied by a month_ord predicate.
+    if op == ">=":
+        return int(value), None
+    if op == ">":
+        return int(value) + 1, None
+    if op == "<=":
+        return None, int(value) + 1
+    if op == "<":
+        return None, int(value)
+    if op == "==":
+        return int(value), int(value) + 1
+    if op == "in" and value:
+        return int(min(value)), int(max(value)) + 1
+    return None, None
+
+
+def _month_key_encoder(path: Path, schema: pa.Schema):
+    month_type = schema.field("month_key").type
+    if pa.types.is_integer(month_type):
+        return lambda ord_value: (ord_value // 12) * 100 + ord_value % 12 + 1
+    if pa.types.is_timestamp(month_type):
+        return lambda ord_value: pd.Timestamp(ord_value // 12, ord_value % 12 + 1, 1)
+    if pa.types.is_date(month_type):
+        return lambda ord_value: dt.date(ord_value // 12, ord_value % 12 + 1, 1)
+    if pa.types.is_string(month_type) or pa.types.is_large_string(month_type):
+        metadata = pq.ParquetFile(path).metadata
+        sample = None
+        if metadata.num_row_groups:
+            column_index = schema.get_field_index("month_key")
+            stats = metadata.row_group(0).column(column_index).statistics
+            sample = stats.min if stats is not None and stats.has_min_max else None
+        if sample is not None and len(str(sample)) == 6 and str(sample).isdigit():
+            return lambda ord_value: f"{ord_value // 12}{ord_value % 12 + 1:02d}"
+        return month_ord_to_label
+    return None
+
+
+def _month_pushdown(path: Path, schema: pa.Schema, month_filters: list[TableFilter]) -> list[TableFilter]:
+    # Translate month_ord predicates into month_key range predicates so pyarrow can skip
+    # row groups from their statistics; the exact month_ord filter is re-applied after the read.
+    if not month_filters or "month_key" not in schema.names:
+        return []
+    encode = _month_key_encoder(path, schema)
+    if encode is None:
+        return []
+    pushdown = []
+    for _, op, value in month_filters:
+        lower, upper = _month_bounds(op, value)
+        if lower is not None:
+            pushdown.append(("month_key", ">=", encode(lower)))
+        if upper is not None:
+            pushdown.append(("month_key", "<", encode(upper)))
+    return pushdown
+
+
+def _compact(df: pd.DataFrame, path: Path, dtype_profile: str | None) -> pd.DataFrame:
+    if dtype_profile is None:
+        return df
+    df, report = apply_dtype_profile(df, float32_measures=dtype_profile == "float32")
+    _DTYPE_REPORTS[path.stem] = report
+    return df
+
+
+def dtype_reports() -> dict[str, pd.DataFrame]:
+    return dict(_DTYPE_REPORTS)
+
+
+def _dtype_profile() -> str | None:
+    config = load_config()
+    if not config.dtype_profile:
+        return None
+    return "float32" if config.float32_measures else "compact"
+
+
+def _prune_partitions(
+    parts: list[Path], month_filters: list[TableFilter], column_filters: list[TableFilter] = ()
+) -> list[Path]:
+    # Month-partitioned tables skip whole files outside the requested month range, and files
+    # under a key=value directory whose value an == / in filter excludes (month_key values in
+    # the file may be formatted differently, so months only prune through month_ord).
+    kept = parts
+    for _, op, value in month_filters:
+        lower, upper = _month_bounds(op, value)
+        kept = [
+            part
+            for part in kept
+            if (lower is None or partition_ord(file_label(part)) >= lower)
+            and (upper is None or partition_ord(file_label(part)) < upper)
+        ]
+    for column, op, value in column_filters:
+        if op not in ("==", "in") or column == "month_key":
+            continue
+        wanted = list(value) if op == "in" else [value]
+        allowed = {str(item) for item in wanted if not pd.isna(item)}
+        keep_null = any(pd.isna(item) for item in wanted)
+        pruned = []
+        for part in kept:
+            values = partition_values(part)
+            if column not in values or (keep_null if values[column] is None else values[column] in allowed):
+                pruned.append(part)
+        kept = pruned
+    return kept
+
+
+def _read_parquet(files: list[Path], columns: list[str] | None, filters: list | None) -> pd.DataFrame:
+    frames = [pd.read_parquet(file, columns=columns, filters=filters) for file in files]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def _read_table(
+    path: Path,
+    columns: tuple[str, ...] | None,
+    filters: tuple[TableFilter, ...] | None,
+    dtype_profile: str | None = None,
+) -> pd.DataFrame:
+    filters = list(filters or ())
+    month_filters = [f for f in filters if f[0] == "month_ord"]
+    column_filters = [f for f in filters if f[0] != "month_ord"]
+
+    parts = partition_files(path)
+    files = _prune_partitions(parts, month_filters, column_filters) if parts else [path]
+    schema_path = parts[0] if parts else path
+    schema = pq.read_schema(schema_path) if parts or path.suffix == ".parquet" else None
+    available = schema.names if schema is not None else list(pd.read_csv(path, nrows=0).columns)
+
+    read_columns = None
+    if columns is not None:
+        wanted = [c for c in columns if c in available]
+        if ("month_ord" in columns or month_filters) and "month_key" in available:
+            wanted.append("month_key")
+        if schema is None:
+            wanted += [f[0] for f in column_filters]
+        read_columns = list(dict.fromkeys(wanted))
+
+    if schema is not None:
+        pushdown = [
+            (column, op, list(value) if isinstance(value, tuple) else value)
+            for column, op, value in column_filters + _month_pushdown(schema_path, schema, month_filters)
+        ]
+        if files:
+            df = _read_parquet(files, read_columns, pushdown or None)
+        else:
+            # Every partition was pruned: build the empty frame from the schema without any I/O.
+            empty = schema.empty_table()
+            df = (empty if read_columns is None else empty.select(read_columns)).to_pandas()
+        df = _compact(df, path, dtype_profile)
+    else:
+        df = _compact(pd.read_csv(path, usecols=read_columns), path, dtype_profile)
+        df = apply_table_filters(df, column_filters)
+
+    df = apply_table_filters(_add_month_ord(df), month_filters)
+    if columns is not None:
+        keep = set(columns) | ({"month_ord"} if "month_key" in columns else set())
+        extra = [c for c in df.columns if c not in keep]
+        if extra:
+            df = df.drop(columns=extra)
+    return df
+
+
 @_cache_data(ttl=3600)
-def load_table(path: str | Path) -> pd.DataFrame:
+def _load_table_cached(
+    path: str,
+    columns: tuple[str, ...] | None,
+    filters: tuple[TableFilter, ...] | None,
+    dtype_profile: str | None = None,
+) -> pd.DataFrame:
+    mark_cache("miss")
+    return _read_table(Path(path), columns, filters, dtype_profile)
+
+
+def _load_table_shared(
+    path: Path,
+    columns: tuple[str, ...] | None,
+    filters: tuple[TableFilter, ...] | None,
+) -> pd.DataFrame:
+    # Unfiltered reads are zero-copy ArrowDtype views over the process-wide memory-mapped
+    # store; only filtered selections materialise new buffers.
+    read_columns = None
+    if columns is not None:
+        read_columns = list(columns) + [f[0] for f in filters or () if f[0] not in columns]
+    df = get_store().frame(path, read_columns)
+    if not filters:
+        return df
+    df = apply_table_filters(df, filters)
+    if columns is not None:
+        keep = set(columns) | ({"month_ord"} if "month_key" in columns else set())
+        extra = [c for c in df.columns if c not in keep]
+        if extra:
+            df = df.drop(columns=extra)
+    return df
+
+
+@instrument("load", cached=True, detail=lambda path, *args, **kwargs: Path(path).stem)
+def load_table(
+    path: str | Path,
+    columns: Iterable[str] | None = None,
+    filters: Iterable[TableFilter] | None = None,
+) -> pd.DataFrame:
     path = Path(path)
-    if path.suffix == ".parquet":
-        return pd.read_parquet(path)
-    if path.suffix == ".csv":
-        return pd.read_csv(path)
-    raise ValueError(f"Unsupported file extension: {path.suffix}")
+    if path.suffix not in SUPPORTED_EXTS and not partition_files(path):
+        raise ValueError(f"Unsupported file extension: {path.suffix}")
+    columns, filters = _normalise_columns(columns), _normalise_filters(filters)
+    if path.suffix in ARROW_EXTS or load_config().arrow_store:
+        return _load_table_shared(path, columns, filters)
+    return _load_table_cached(str(path), columns, filters, _dtype_profile())
 
 
 def _repo_root() -> Path:
     return Path(__file__).resolve().parents[2]
 
 
-def _find_anywhere(name: str) -> Path | None:
-    root = _repo_root()
-    for ext in SUPPORTED_EXTS:
-        matches = list(root.rglob(f"{name}{ext}"))
-        if matches:
-            return matches[0]
-    return None
+def _data_dirs(data_dir: Path) -> list[Path]:
+    fallback_dir = _repo_root() / "data"
+    return [data_dir] if Path(data_dir).resolve() == fallback_dir.resolve() else [data_dir, fallback_dir]
 
 
-def load_processed_table(data_dir: Path, name: str) -> pd.DataFrame:
-    primary_dir = data_dir / "processed"
-    try:
-        path = _resolve_table_path(primary_dir, name)
-        return load_table(path)
-    except FileNotFoundError:
-        fallback_dir = _repo_root() / "data" / "processed"
-        if fallback_dir != primary_dir:
-            path = _resolve_table_path(fallback_dir, name)
-            return load_table(path)
-        found = _find_anywhere(name)
-        if found:
-            return load_table(found)
-        raise
+def resolve_table_path(data_dir: Path, layer: str, name: str) -> Path:
+    # Catalog lookup first (O(1)), then the conventional layer directories.
+    searched = []
+    for base_dir in _data_dirs(data_dir):
+        found = resolve_table(base_dir, layer, name)
+        if found is not None:
+            return found
+        try:
+            return _resolve_table_path(base_dir / layer, name)
+        except FileNotFoundError:
+            searched.append(str(base_dir / layer))
+    raise FileNotFoundError(f"Missing {name} in {', '.join(searched)} (supported: {SUPPORTED_EXTS})")
+
+
+def load_processed_table(
+    data_dir: Path,
+    name: str,
+    columns: Iterable[str] | None = None,
+    filters: Iterable[TableFilter] | None = None,
+) -> pd.DataFrame:
+    return load_table(resolve_table_path(data_dir, "processed", name), columns, filters)
 
 
-def load_mart_table(data_dir: Path, name: str, fallback_processed: Optional[str] = None) -> pd.DataFrame:
-    mart_dir = data_dir / "marts"
+def load_mart_table(
+    data_dir: Path,
+    name: str,
+    fallback_processed: Optional[str] = None,
+    columns: Iterable[str] | None = None,
+    filters: Iterable[TableFilter] | None = None,
+) -> pd.DataFrame:
     try:
-        path = _resolve_table_path(mart_dir, name)
-        return load_table(path)
+        path = resolve_table_path(data_dir, "marts", name)
     except FileNotFoundError:
-        fallback_dir = _repo_root() / "data" / "marts"
-        if fallback_dir != mart_dir:
-            try:
-                path = _resolve_table_path(fallback_dir, name)
-                return load_table(path)
-            except FileNotFoundError:
-                pass
-        found = _find_anywhere(name)
-        if found:
-            return load_table(found)
         if fallback_processed:
-            return load_processed_table(data_dir, fallback_processed)
+            return load_processed_table(data_dir, fallback_processed, columns, filters)
         raise
+    return load_table(path, columns, filters)
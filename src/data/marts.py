@@ -1,77 +1,317 @@
 from __future__ import annotations
 
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Iterable
 
 import pandas as pd
+import pyarrow as pa
 
+from src.data.aggregate import Ratio, aggregate
+from src.data.arrow_store import map_ipc_frame, write_ipc
+from src.data.build_manifest import (
+    changed_months,
+    load_manifest,
+    month_hashes,
+    watermark,
+    write_manifest,
+)
+from src.data.catalog import register_tables
+from src.data.options import build_department_categories, build_filter_options
+from src.data.partitions import normalise_for_write, partition_files, select_months, write_parquet, write_partitions
 from src.data.semantic import (
+    PROFITABILITY_MEASURES,
+    QUOTE_MEASURES,
     add_aus_fy,
+    build_quote_dim,
     ensure_company,
-    leave_exclusion_mask,
-    profitability_rollup,
-    rate_rollups,
-    safe_quote_rollup,
+    hierarchy_cube,
+    not_leave,
 )
-from src.metrics.quote_delivery import quote_delivery_pack
-from src.metrics.utilisation import utilisation_pack
-from src.metrics.capacity import capacity_pack
-from src.metrics.job_mix import job_mix_pack
+from src.metrics.quote_delivery import quote_delivery_measures
+from src.metrics.utilisation import utilisation_measures
+from src.metrics.job_mix import job_level_quotes, job_mix_bridge, job_mix_demand
+from src.metrics.margin_bridge import monthly_bridge
+from src.metrics.staffing import staff_task_capability
 from src.metrics.active_projects import active_projects_pack
+from src.metrics.quote_builder import quote_builder_scope, quote_builder_tasks, task_benchmarks
+from src.instrumentation import span
+
+
+MONTH_PARTITIONED_MARTS = (
+    "cube_dept_month",
+    "cube_dept_category_month",
+    "cube_hierarchy_month",
+    "cube_margin_bridge",
+    "job_mix_month",
+)
+# Columns of dim_job_task_quote that do not affect which month a quote is attributed to.
+QUOTE_DIM_STATS = ["actual_hours", "first_month_key", "last_month_key"]
+
+
+def prepare_base(df: pd.DataFrame) -> pd.DataFrame:
+    # Builders accept raw or prepared frames; build_all_marts prepares each fact table once.
+    if "company" in df.columns and "aus_fy" in df.columns:
+        return df
+    return ensure_company(add_aus_fy(df))
 
 
 def _write_mart(df: pd.DataFrame, path: Path) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
     if path.suffix == ".parquet":
-        df.to_parquet(path, index=False)
+        write_parquet(df, path)
     else:
-        df.to_csv(path, index=False)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        normalise_for_write(df).to_csv(path, index=False)
+
+
+CUBE_MEASURES = PROFITABILITY_MEASURES + QUOTE_MEASURES + [Ratio("quote_rate", "quoted_amount", "quoted_hours")]
 
 
-def build_cube_dept_month(df: pd.DataFrame) -> pd.DataFrame:
-    df = ensure_company(add_aus_fy(df))
-    group_keys = ["company", "department_final", "month_key"]
-    profit = profitability_rollup(df, group_keys)
-    rates = rate_rollups(df, group_keys)
-    quote = safe_quote_rollup(df, group_keys)
-    merged = profit.merge(rates, on=group_keys, how="left").merge(quote, on=group_keys, how="left")
-    return merged
+def build_cube_dept_month(df: pd.DataFrame, quote_df: pd.DataFrame | None = None) -> pd.DataFrame:
+    df = prepare_base(df)
+    return aggregate(df, ["company", "department_final", "month_key"], CUBE_MEASURES, dedup_rows=quote_df)
 
 
-def build_cube_dept_category_month(df: pd.DataFrame) -> pd.DataFrame:
-    df = ensure_company(add_aus_fy(df))
+def build_cube_dept_category_month(df: pd.DataFrame, quote_df: pd.DataFrame | None = None) -> pd.DataFrame:
+    df = prepare_base(df)
     group_keys = ["company", "department_final", "job_category", "month_key"]
-    profit = profitability_rollup(df, group_keys)
-    rates = rate_rollups(df, group_keys)
-    quote = safe_quote_rollup(df, group_keys)
-    return profit.merge(rates, on=group_keys, how="left").merge(quote, on=group_keys, how="left")
+    return aggregate(df, group_keys, CUBE_MEASURES, dedup_rows=quote_df)
+
+
+def build_cube_hierarchy_month(df: pd.DataFrame, quote_df: pd.DataFrame | None = None) -> pd.DataFrame:
+    df = prepare_base(df)
+    return hierarchy_cube(df, by=["month_key"], quote_df=quote_df)
 
 
-def build_cube_dept_category_task(df: pd.DataFrame) -> pd.DataFrame:
-    df = ensure_company(add_aus_fy(df))
+def build_cube_margin_bridge(df: pd.DataFrame, quote_df: pd.DataFrame | None = None) -> pd.DataFrame:
+    df = prepare_base(df)
+    return monthly_bridge(df, quote_df)
+
+
+def build_cube_dept_category_task(df: pd.DataFrame, quote_dim: pd.DataFrame | None = None) -> pd.DataFrame:
+    df = prepare_base(df)
     group_keys = ["company", "department_final", "job_category", "task_name"]
-    profit = profitability_rollup(df, group_keys)
-    quote = safe_quote_rollup(df, group_keys)
-    delivery = quote_delivery_pack(df, group_keys)
-    return profit.merge(quote, on=group_keys, how="left").merge(delivery, on=group_keys, how="left")
+    delivery = [m for m in quote_delivery_measures() if m.name not in {"hours", "quoted_hours", "quoted_amount"}]
+    return aggregate(df, group_keys, PROFITABILITY_MEASURES + QUOTE_MEASURES + delivery, dedup_rows=quote_dim)
 
 
-def build_cube_dept_category_staff(df: pd.DataFrame) -> pd.DataFrame:
-    df = ensure_company(add_aus_fy(df))
+def build_cube_dept_category_staff(df: pd.DataFrame, quote_dim: pd.DataFrame | None = None) -> pd.DataFrame:
+    df = prepare_base(df)
     group_keys = ["company", "department_final", "job_category", "staff_name"]
-    profit = profitability_rollup(df, group_keys)
-    quote = safe_quote_rollup(df, group_keys)
-    util = utilisation_pack(df, group_keys, exclude_leave=True)
-    return profit.merge(quote, on=group_keys, how="left").merge(util, on=group_keys, how="left")
+    measures = PROFITABILITY_MEASURES + QUOTE_MEASURES + utilisation_measures(where=not_leave)
+    return aggregate(df, group_keys, measures, dedup_rows=quote_dim)
+
+
+def build_active_jobs_snapshot(
+    df: pd.DataFrame, recency_days: int, quote_dim: pd.DataFrame | None = None
+) -> pd.DataFrame:
+    df = prepare_base(df)
+    return active_projects_pack(df, recency_days, quote_dim)
+
+
+def build_staff_task_capability(df: pd.DataFrame, half_life_months: int) -> pd.DataFrame:
+    df = prepare_base(df)
+    return staff_task_capability(df.loc[not_leave(df)], half_life_months)
+
+
+def build_benchmark_task_quantiles(df: pd.DataFrame, half_life_months: int) -> pd.DataFrame:
+    return task_benchmarks(prepare_base(df), half_life_months)
+
+
+def build_quote_builder_scope(df: pd.DataFrame, half_life_months: int, active_staff_months: int) -> pd.DataFrame:
+    return quote_builder_scope(prepare_base(df), half_life_months, active_staff_months)
+
+
+def build_quote_builder_tasks(df: pd.DataFrame) -> pd.DataFrame:
+    return quote_builder_tasks(prepare_base(df))
+
+
+def build_job_mix_month(
+    df: pd.DataFrame,
+    weeks_in_window: int,
+    util_target: float,
+    job_quote: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    # Without the capacity columns, which depend on every month; readers add them with
+    # implied_capacity().
+    df = prepare_base(df)
+    return job_mix_demand(df, weeks_in_window, util_target, job_quote)
+
+
+def _months(df: pd.DataFrame, labels: Iterable[str] | None) -> pd.DataFrame:
+    return df if labels is None else select_months(df, labels)
+
+
+def _month_slice(build: Callable[..., pd.DataFrame], df: pd.DataFrame, labels, *args) -> pd.DataFrame:
+    subset = _months(df, labels)
+    return build(subset, *args) if not subset.empty else subset.iloc[0:0]
+
+
+def _build_cube_dept_month(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    quote_df = _months(inputs["quote_dim"], labels)
+    return _month_slice(build_cube_dept_month, inputs["fact_timesheet"], labels, quote_df)
+
+
+def _build_cube_dept_category_month(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    quote_df = _months(inputs["quote_dim"], labels)
+    return _month_slice(build_cube_dept_category_month, inputs["fact_timesheet"], labels, quote_df)
+
+
+def _build_cube_hierarchy_month(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    quote_df = _months(inputs["quote_dim"], labels)
+    return _month_slice(build_cube_hierarchy_month, inputs["fact_timesheet"], labels, quote_df)
+
+
+def _build_cube_margin_bridge(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    quote_df = _months(inputs["quote_dim"], labels)
+    return _month_slice(build_cube_margin_bridge, inputs["fact_timesheet"], labels, quote_df)
+
 
+def _build_job_mix_month(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    return _month_slice(
+        build_job_mix_month,
+        inputs["fact_job_task_month"],
+        labels,
+        params["weeks_in_window"],
+        params["util_target"],
+        inputs["job_quote"],
+    )
 
-def build_active_jobs_snapshot(df: pd.DataFrame, recency_days: int) -> pd.DataFrame:
-    df = ensure_company(add_aus_fy(df))
-    return active_projects_pack(df, recency_days)
 
+def _build_cube_dept_category_task(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    return build_cube_dept_category_task(inputs["fact_timesheet"], inputs["quote_dim"])
 
-def build_job_mix_month(df: pd.DataFrame, capacity_df: pd.DataFrame, weeks_in_window: int, util_target: float) -> pd.DataFrame:
-    df = ensure_company(add_aus_fy(df))
-    return job_mix_pack(df, capacity_df, weeks_in_window, util_target)
+
+def _build_cube_dept_category_staff(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    return build_cube_dept_category_staff(inputs["fact_timesheet"], inputs["quote_dim"])
+
+
+def _build_active_jobs_snapshot(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    return build_active_jobs_snapshot(inputs["fact_timesheet"], params["recency_days"], inputs["quote_dim"])
+
+
+def _build_staff_task_capability(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    return build_staff_task_capability(inputs["fact_timesheet"], params["recency_half_life_months"])
+
+
+def _build_benchmark_task_quantiles(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    return build_benchmark_task_quantiles(inputs["fact_timesheet"], params["recency_half_life_months"])
+
+
+def _build_dim_filter_options(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    return build_filter_options(inputs["fact_timesheet"])
+
+
+def _build_dim_department_category(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    return build_department_categories(inputs["fact_timesheet"])
+
+
+def _build_quote_builder_scope(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    return build_quote_builder_scope(
+        inputs["fact_timesheet"], params["recency_half_life_months"], params["active_staff_months"]
+    )
+
+
+def _build_quote_builder_tasks(inputs: dict[str, pd.DataFrame], labels, params: dict) -> pd.DataFrame:
+    return build_quote_builder_tasks(inputs["fact_timesheet"])
+
+
+# name -> (builder, shared inputs it reads)
+MART_BUILDERS = {
+    "cube_dept_month": (_build_cube_dept_month, ("fact_timesheet", "quote_dim")),
+    "cube_dept_category_month": (_build_cube_dept_category_month, ("fact_timesheet", "quote_dim")),
+    "cube_hierarchy_month": (_build_cube_hierarchy_month, ("fact_timesheet", "quote_dim")),
+    "cube_margin_bridge": (_build_cube_margin_bridge, ("fact_timesheet", "quote_dim")),
+    "cube_dept_category_task": (_build_cube_dept_category_task, ("fact_timesheet", "quote_dim")),
+    "cube_dept_category_staff": (_build_cube_dept_category_staff, ("fact_timesheet", "quote_dim")),
+    "active_jobs_snapshot": (_build_active_jobs_snapshot, ("fact_timesheet", "quote_dim")),
+    "staff_task_capability": (_build_staff_task_capability, ("fact_timesheet",)),
+    "benchmark_task_quantiles": (_build_benchmark_task_quantiles, ("fact_timesheet",)),
+    "quote_builder_scope": (_build_quote_builder_scope, ("fact_timesheet",)),
+    "quote_builder_tasks": (_build_quote_builder_tasks, ("fact_timesheet",)),
+    "dim_filter_options": (_build_dim_filter_options, ("fact_timesheet",)),
+    "dim_department_category": (_build_dim_department_category, ("fact_timesheet",)),
+    "job_mix_month": (_build_job_mix_month, ("fact_job_task_month", "job_quote")),
+}
+
+
+@dataclass(frozen=True)
+class MartTask:
+    name: str
+    labels: tuple[str, ...] | None
+
+
+@dataclass(frozen=True)
+class MartResult:
+    # Workers return only timings; the frames stay on disk instead of being pickled back.
+    name: str
+    seconds: float
+
+
+def _run_mart(task: MartTask, inputs: dict[str, pd.DataFrame], params: dict, marts_dir: Path) -> MartResult:
+    start = time.perf_counter()
+    build, names = MART_BUILDERS[task.name]
+    with span(task.name, "mart", rows_in=len(inputs[names[0]])) as current:
+        mart = build(inputs, task.labels, params)
+        current.output(mart)
+    if task.name in MONTH_PARTITIONED_MARTS:
+        write_partitions(mart, marts_dir / task.name, task.labels)
+        stale = marts_dir / f"{task.name}.parquet"
+        if stale.exists():
+            stale.unlink()
+    else:
+        _write_mart(mart, marts_dir / f"{task.name}.parquet")
+    return MartResult(task.name, time.perf_counter() - start)
+
+
+_WORKER_INPUTS: dict[str, pd.DataFrame] = {}
+
+
+def _run_mart_in_worker(task: MartTask, shared: dict[str, str], params: dict, marts_dir: Path) -> MartResult:
+    # Inputs are memory-mapped from the Arrow IPC files written by the parent, once per worker.
+    _, names = MART_BUILDERS[task.name]
+    for name in names:
+        if shared[name] not in _WORKER_INPUTS:
+            _WORKER_INPUTS[shared[name]] = map_ipc_frame(Path(shared[name]))
+    inputs = {name: _WORKER_INPUTS[shared[name]] for name in names}
+    return _run_mart(task, inputs, params, marts_dir)
+
+
+def _run_tasks(
+    tasks: list[MartTask], inputs: dict[str, pd.DataFrame], params: dict, data_dir: Path, jobs: int
+) -> list[MartResult]:
+    marts_dir = data_dir / "marts"
+    if jobs <= 1 or len(tasks) <= 1:
+        return [_run_mart(task, inputs, params, marts_dir) for task in tasks]
+    needed = sorted({name for task in tasks for name in MART_BUILDERS[task.name][1]})
+    cache_dir = data_dir / "cache"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="build-", dir=cache_dir) as shared_dir:
+        shared = {}
+        for name in needed:
+            path = Path(shared_dir) / f"{name}.arrow"
+            write_ipc(pa.Table.from_pandas(inputs[name], preserve_index=False), path)
+            shared[name] = str(path)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks)), mp_context=context) as pool:
+            futures = [pool.submit(_run_mart_in_worker, task, shared, params, marts_dir) for task in tasks]
+            return [future.result() for future in futures]
+
+
+def _mart_path(marts_dir: Path, name: str) -> Path:
+    return marts_dir / name if name in MONTH_PARTITIONED_MARTS else marts_dir / f"{name}.parquet"
+
+
+def _is_built(marts_dir: Path, name: str, previous: dict) -> bool:
+    if name not in previous.get("marts", {}):
+        return False
+    if name in MONTH_PARTITIONED_MARTS:
+        return bool(partition_files(marts_dir / name))
+    return (marts_dir / f"{name}.parquet").exists()
 
 
 def build_all_marts(
@@ -81,20 +321,107 @@ def build_all_marts(
     recency_days: int,
     weeks_in_window: int,
     util_target: float,
-) -> dict[str, pd.DataFrame]:
-    marts = {
-        "cube_dept_month": build_cube_dept_month(fact_timesheet),
-        "cube_dept_category_month": build_cube_dept_category_month(fact_timesheet),
-        "cube_dept_category_task": build_cube_dept_category_task(fact_timesheet),
-        "cube_dept_category_staff": build_cube_dept_category_staff(fact_timesheet),
+    incremental: bool = False,
+    jobs: int = 1,
+    quote_dim: pd.DataFrame | None = None,
+    recency_half_life_months: int = 6,
+    active_staff_months: int = 6,
+) -> dict[str, Path]:
+    # Month-keyed marts are written as one parquet file per month. With incremental=True only
+    # months whose inputs changed since the last build manifest are recomputed, and the files
+    # match a full rebuild byte for byte. Marts that are not additive over months are rebuilt
+    # whenever any timesheet month changed. With jobs > 1 the marts run in a process pool that
+    # reads the prepared inputs from memory-mapped Arrow IPC files. quote_dim is the
+    # dim_job_task_quote table built at ingest (built here when not given). Returns the path of
+    # each mart written by this run; read them with load_mart_table.
+    marts_dir = data_dir / "marts"
+    params = {
+        "recency_days": recency_days,
+        "weeks_in_window": weeks_in_window,
+        "util_target": util_target,
+        "recency_half_life_months": recency_half_life_months,
+        "active_staff_months": active_staff_months,
     }
+    previous = load_manifest(data_dir) if incremental else {}
+    if previous.get("params") != params:
+        previous = {}
+    stored = previous.get("inputs", {})
+    timings = {}
 
-    marts["active_jobs_snapshot"] = build_active_jobs_snapshot(fact_timesheet, recency_days)
+    start = time.perf_counter()
+    fact_timesheet = prepare_base(fact_timesheet)
+    fact_job_task_month = prepare_base(fact_job_task_month)
+    timings["prepare"] = time.perf_counter() - start
 
-    capacity = capacity_pack(fact_timesheet, ["staff_name"], weeks_in_window)
-    marts["job_mix_month"] = build_job_mix_month(fact_job_task_month, capacity, weeks_in_window, util_target)
+    start = time.perf_counter()
+    # Quotes are attributed to the first row of each job-task over the full history, so a
+    # month's quote totals can change when rows in another month are added or removed.
+    if quote_dim is None:
+        quote_dim = build_quote_dim(fact_timesheet)
+    attribution = [col for col in quote_dim.columns if col not in QUOTE_DIM_STATS]
+    # A job_mix_month month also depends on the full-history quotes of the jobs in it, so its
+    # hash covers the month's job bridge with their job-level quotes.
+    job_quote = job_level_quotes(fact_job_task_month, quote_dim)
+    hashes = {
+        "fact_timesheet_day_enriched": month_hashes(fact_timesheet),
+        "fact_job_task_month": month_hashes(fact_job_task_month),
+        "quote_attribution": month_hashes(quote_dim[attribution]),
+        "job_mix_quotes": month_hashes(job_mix_bridge(fact_job_task_month, job_quote)),
+    }
+    timesheet_changed = changed_months(stored.get("fact_timesheet_day_enriched"), hashes["fact_timesheet_day_enriched"])
+    cube_months = timesheet_changed | changed_months(stored.get("quote_attribution"), hashes["quote_attribution"])
+    job_mix_months = changed_months(stored.get("fact_job_task_month"), hashes["fact_job_task_month"])
+    job_mix_months |= changed_months(stored.get("job_mix_quotes"), hashes["job_mix_quotes"])
+
+    wanted = {
+        "cube_dept_month": cube_months,
+        "cube_dept_category_month": cube_months,
+        "cube_hierarchy_month": cube_months,
+        "cube_margin_bridge": cube_months,
+        "job_mix_month": job_mix_months,
+        "cube_dept_category_task": None if timesheet_changed else set(),
+        "cube_dept_category_staff": None if timesheet_changed else set(),
+        "active_jobs_snapshot": None if timesheet_changed else set(),
+        "staff_task_capability": None if timesheet_changed else set(),
+        "benchmark_task_quantiles": None if timesheet_changed else set(),
+        "quote_builder_scope": None if timesheet_changed else set(),
+        "quote_builder_tasks": None if timesheet_changed else set(),
+        "dim_filter_options": None if timesheet_changed else set(),
+        "dim_department_category": None if timesheet_changed else set(),
+    }
+    tasks = []
+    rebuilt = {}
+    for name, labels in wanted.items():
+        if not _is_built(marts_dir, name, previous):
+            labels = None
+        if labels is not None and not labels:
+            rebuilt[name] = []
+            continue
+        tasks.append(MartTask(name, None if labels is None else tuple(sorted(labels))))
+        rebuilt[name] = "all" if labels is None else sorted(labels)
+    timings["plan"] = time.perf_counter() - start
+
+    inputs = {
+        "fact_timesheet": fact_timesheet,
+        "fact_job_task_month": fact_job_task_month,
+        "quote_dim": quote_dim,
+        "job_quote": job_quote,
+    }
+    start = time.perf_counter()
+    results = _run_tasks(tasks, inputs, params, data_dir, jobs)
+    timings.update({result.name: result.seconds for result in results})
+    timings["marts_wall"] = time.perf_counter() - start
 
-    for name, df in marts.items():
-        _write_mart(df, data_dir / "marts" / f"{name}.parquet")
+    paths = [_mart_path(marts_dir, name) for name in MART_BUILDERS]
+    register_tables(data_dir, "marts", [path for path in paths if path.exists()])
+    write_manifest(data_dir, {
+        "built_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "params": params,
+        "watermark": watermark(hashes["fact_timesheet_day_enriched"]),
+        "inputs": hashes,
+        "marts": rebuilt,
+        "jobs": jobs,
+        "timings": {name: round(seconds, 3) for name, seconds in timings.items()},
+    })
 
-    return marts
+    return {result.name: _mart_path(marts_dir, result.name) for result in results}
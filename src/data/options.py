@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data.aggregate import Count, Max, Min, aggregate
+from src.data.loader import load_table, resolve_table_path
+from src.data.schema import OPTIONAL_FILTER_COLUMNS
+from src.data.semantic import get_month_ord, month_ord_to_label
+
+HIERARCHY_OPTION_COLUMNS = ["department_final", "job_category"]
+OPTION_COLUMNS = HIERARCHY_OPTION_COLUMNS + OPTIONAL_FILTER_COLUMNS
+FILTER_OPTIONS_TABLE = "dim_filter_options"
+DEPARTMENT_CATEGORY_TABLE = "dim_department_category"
+
+OPTION_MEASURES = [
+    Count("row_count"),
+    Min("first_month_ord", "option_month_ord"),
+    Max("last_month_ord", "option_month_ord"),
+]
+
+
+def _with_option_months(df: pd.DataFrame) -> pd.DataFrame:
+    ords = get_month_ord(df).to_numpy(np.int64)
+    return df.assign(option_month_ord=np.where(ords >= 0, ords, np.nan))
+
+
+def _month_labels(frame: pd.DataFrame) -> pd.DataFrame:
+    for bound in ("first", "last"):
+        ords = frame.pop(f"{bound}_month_ord")
+        frame[f"{bound}_month_key"] = ords.map(lambda value: None if pd.isna(value) else month_ord_to_label(int(value)))
+    return frame
+
+
+def build_filter_options(df: pd.DataFrame) -> pd.DataFrame:
+    # One row per (dimension, value) of every filterable column: row count and first/last month.
+    df = _with_option_months(df)
+    frames = []
+    for column in [c for c in OPTION_COLUMNS if c in df.columns]:
+        counts = aggregate(df, [column], OPTION_MEASURES)
+        counts = counts.loc[counts[column].notna()]
+        frames.append(pd.DataFrame({
+            "dimension": column,
+            "value": counts[column].astype(str).to_numpy(),
+            **{name: counts[name].to_numpy() for name in ["row_count", "first_month_ord", "last_month_ord"]},
+        }))
+    columns = ["dimension", "value", "row_count", "first_month_ord", "last_month_ord"]
+    options = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    return _month_labels(options)
+
+
+def build_department_categories(df: pd.DataFrame) -> pd.DataFrame:
+    # The department -> category hierarchy with row counts and first/last month per pair.
+    pairs = aggregate(_with_option_months(df), HIERARCHY_OPTION_COLUMNS, OPTION_MEASURES)
+    pairs = pairs.loc[pairs["department_final"].notna() & pairs["job_category"].notna()]
+    for column in HIERARCHY_OPTION_COLUMNS:
+        pairs[column] = pairs[column].astype(str)
+    return _month_labels(pairs.reset_index(drop=True))
+
+
+def _source(data_dir: Path, name: str) -> tuple[Path, bool]:
+    # The option mart, or the fact table when the marts have not been built.
+    try:
+        return resolve_table_path(data_dir, "marts", name), True
+    except FileNotFoundError:
+        return resolve_table_path(data_dir, "processed", "fact_timesheet_day_enriched"), False
+
+
+@lru_cache(maxsize=16)
+def _load_options(path: str, mtime_ns: int, from_mart: bool, name: str) -> pd.DataFrame:
+    if from_mart:
+        return load_table(Path(path))
+    columns = OPTION_COLUMNS if name == FILTER_OPTIONS_TABLE else HIERARCHY_OPTION_COLUMNS
+    fact = load_table(Path(path), columns + ["month_key"])
+    return build_filter_options(fact) if name == FILTER_OPTIONS_TABLE else build_department_categories(fact)
+
+
+def option_table(data_dir: Path, name: str) -> pd.DataFrame:
+    # Cached for the process lifetime (per source file version); callers must not mutate it.
+    path, from_mart = _source(Path(data_dir), name)
+    return _load_options(str(path), path.stat().st_mtime_ns, from_mart, name)
+
+
+def filter_options(data_dir: Path) -> dict[str, list[str]]:
+    options = option_table(data_dir, FILTER_OPTIONS_TABLE)
+    return {
+        column: sorted(options.loc[options["dimension"] == column, "value"].tolist())
+        for column in options["dimension"].drop_duplicates().tolist()
+    }
+
+
+def department_options(data_dir: Path) -> list[str]:
+    return sorted(option_table(data_dir, DEPARTMENT_CATEGORY_TABLE)["department_final"].drop_duplicates().tolist())
+
+
+def category_options(data_dir: Path, department: str | None = None) -> list[str]:
+    pairs = option_table(data_dir, DEPARTMENT_CATEGORY_TABLE)
+    if department is not None:
+        pairs = pairs.loc[pairs["department_final"] == department]
+    return sorted(pairs["job_category"].drop_duplicates().tolist())
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Iterable, Sequence
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.config import load_config
+from src.data.semantic import CANONICAL_HIERARCHY, MONTH_ORD_NA, get_month_ord, month_ord_from_key, month_ord_to_label
+
+# Month-keyed tables are hive-partitioned directories:
+#   <table>/aus_fy=FY2025/month_key=2024-09[/department_final=Design]/part-0.parquet
+# The partition columns are also kept inside the files, so every file reads on its own.
+# Flat <table>/part-YYYY-MM.parquet files from older builds are still read.
+PARTITION_PREFIX = "part-"
+PARTITION_FILE = f"{PARTITION_PREFIX}0.parquet"
+UNKNOWN_MONTH_LABEL = "none"
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+# Rows are sorted on the hierarchy down to the task inside each partition so row-group
+# statistics skip departments and categories. Staff is left out: rows of a job-task keep their
+# relative order, which the quote dedupe (first row per job-task) relies on.
+STORAGE_SORT_KEYS = CANONICAL_HIERARCHY[:4]
+
+
+def partition_label(ord_value: int) -> str:
+    return month_ord_to_label(ord_value) if ord_value > MONTH_ORD_NA else UNKNOWN_MONTH_LABEL
+
+
+def partition_ord(label: str) -> int:
+    return MONTH_ORD_NA if label == UNKNOWN_MONTH_LABEL else month_ord_from_key(label)
+
+
+def fy_label(label: str) -> str:
+    # Australian financial year (July-June) of a month label, as in semantic.add_aus_fy.
+    ord_value = partition_ord(label)
+    return f"FY{ord_value // 12 + (ord_value % 12 >= 6)}" if ord_value > MONTH_ORD_NA else UNKNOWN_MONTH_LABEL
+
+
+def month_dir(table_dir: Path, label: str) -> Path:
+    return Path(table_dir) / f"aus_fy={fy_label(label)}" / f"month_key={label}"
+
+
+def partition_path(table_dir: Path, label: str) -> Path:
+    return month_dir(table_dir, label) / PARTITION_FILE
+
+
+def _legacy_path(table_dir: Path, label: str) -> Path:
+    return Path(table_dir) / f"{PARTITION_PREFIX}{label}.parquet"
+
+
+def partition_files(table_dir: Path) -> list[Path]:
+    # Data files in month order (labels are YYYY-MM and FY labels sort the same way), unknown
+    # month last.
+    table_dir = Path(table_dir)
+    if not table_dir.is_dir():
+        return []
+    files = list(table_dir.glob(f"aus_fy=*/month_key=*/{PARTITION_PREFIX}*.parquet"))
+    files += table_dir.glob(f"aus_fy=*/month_key=*/*=*/{PARTITION_PREFIX}*.parquet")
+    files += table_dir.glob(f"{PARTITION_PREFIX}*.parquet")
+    return sorted(files, key=lambda path: (file_label(path), str(path)))
+
+
+def is_partitioned(path: Path) -> bool:
+    return bool(partition_files(path))
+
+
+def partition_values(path: Path) -> dict[str, str | None]:
+    # Hive key=value directory segments of a data file; None for the null partition.
+    values = {}
+    for segment in Path(path).parent.parts:
+        key, sep, value = segment.partition("=")
+        if sep:
+            value = unquote(value)
+            values[key] = None if value == NULL_PARTITION else value
+    return values
+
+
+def file_label(path: Path) -> str:
+    label = partition_values(path).get("month_key")
+    return label if label is not None else Path(path).stem[len(PARTITION_PREFIX):]
+
+
+def partition_name(column: str, value: object) -> str:
+    text = NULL_PARTITION if pd.isna(value) else str(value)
+    return f"{column}={quote(text, safe='')}"
+
+
+def month_labels(df: pd.DataFrame) -> pd.Series:
+    ords = get_month_ord(df)
+    uniques, codes = np.unique(ords.to_numpy(), return_inverse=True)
+    labels = np.array([partition_label(int(value)) for value in uniques], dtype=object)
+    return pd.Series(labels[codes.reshape(-1)], index=df.index)
+
+
+def select_months(df: pd.DataFrame, labels: Iterable[str]) -> pd.DataFrame:
+    wanted = [partition_ord(label) for label in labels]
+    return df.loc[get_month_ord(df).isin(wanted).to_numpy()]
+
+
+def split_by_month(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    # Stable split: rows keep their relative order inside each partition.
+    ords = get_month_ord(df).to_numpy()
+    order = np.argsort(ords, kind="stable")
+    uniques, starts = np.unique(ords[order], return_index=True)
+    bounds = list(starts[1:]) + [len(order)]
+    return {
+        partition_label(int(value)): df.iloc[order[start:end]].reset_index(drop=True)
+        for value, start, end in zip(uniques, starts, bounds)
+    }
+
+
+def normalise_for_write(df: pd.DataFrame) -> pd.DataFrame:
+    # File bytes must depend only on the rows written, not on the frame they were sliced from:
+    # categoricals carry the parent's full category list, and object columns holding numbers
+    # come from divisions that produced pd.NA somewhere in the parent.
+    df = df.copy()
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            df[column] = series.astype(series.cat.categories.dtype)
+        elif series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in {
+            "floating",
+            "integer",
+            "mixed-integer-float",
+            "empty",
+        }:
+            df[column] = pd.to_numeric(series)
+    return df
+
+
+def _write_table(df: pd.DataFrame, path: Path, metadata: dict[str, str] | None = None) -> None:
+    # Row groups of PARQUET_ROW_GROUP_ROWS rows with min/max statistics, dictionary encoding
+    # for the string columns only (measures rarely repeat). metadata is added to the schema's
+    # key-value metadata.
+    table = pa.Table.from_pandas(normalise_for_write(df), preserve_index=False)
+    if metadata:
+        encoded = {key.encode(): value.encode() for key, value in metadata.items()}
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **encoded})
+    dictionary = [
+        field.name for field in table.schema
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)
+    ]
+    row_group_rows = max(load_config().parquet_row_group_rows, 1)
+    pq.write_table(table, path, row_group_size=row_group_rows, use_dictionary=dictionary, write_statistics=True)
+
+
+def write_parquet(df: pd.DataFrame, path: Path, metadata: dict[str, str] | None = None) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    _write_table(df, tmp_path, metadata)
+    os.replace(tmp_path, path)
+    return path
+
+
+def sort_for_storage(df: pd.DataFrame) -> pd.DataFrame:
+    keys = [key for key in STORAGE_SORT_KEYS if key in df.columns]
+    if not keys or len(df) < 2:
+        return df
+    order = np.lexsort([pd.factorize(df[key].astype(str), sort=True)[0] for key in reversed(keys)])
+    return df.iloc[order].reset_index(drop=True)
+
+
+def _write_month(df: pd.DataFrame, target: Path, by: Sequence[str]) -> list[Path]:
+    # Builds the month directory beside the old one and swaps it in, so readers see either
+    # the old month or the new one.
+    tmp_dir = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    df = sort_for_storage(df)
+    groups = [((), df)] if not by else df.groupby(list(by), dropna=False, observed=True, sort=True)
+    written = []
+    for values, group in groups:
+        values = values if isinstance(values, tuple) else (values,)
+        sub_dir = tmp_dir.joinpath(*(partition_name(col, value) for col, value in zip(by, values)))
+        sub_dir.mkdir(parents=True, exist_ok=True)
+        _write_table(group, sub_dir / PARTITION_FILE)
+        written.append(target.joinpath(*sub_dir.relative_to(tmp_dir).parts, PARTITION_FILE))
+    old_dir = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.old")
+    if target.exists():
+        os.replace(target, old_dir)
+    os.replace(tmp_dir, target)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return written
+
+
+def write_partitions(
+    df: pd.DataFrame,
+    table_dir: Path,
+    labels: Iterable[str] | None = None,
+    by: Sequence[str] = (),
+) -> list[Path]:
+    # labels=None rewrites the whole table; otherwise only the listed months are replaced,
+    # and listed months with no rows left are removed. `by` adds partition columns below the
+    # month (e.g. department_final).
+    table_dir = Path(table_dir)
+    parts = split_by_month(df)
+    if labels is None:
+        labels = set(parts) | {file_label(path) for path in partition_files(table_dir)}
+    written = []
+    for label in sorted(labels):
+        target = month_dir(table_dir, label)
+        if label in parts:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            written += _write_month(parts[label], target, by)
+        elif target.exists():
+            shutil.rmtree(target)
+        _legacy_path(table_dir, label).unlink(missing_ok=True)
+        if target.parent.exists() and not any(target.parent.iterdir()):
+            target.parent.rmdir()
+    return written
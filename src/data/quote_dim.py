@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.data.catalog import content_hash
+from src.data.loader import load_table, resolve_table_path
+from src.data.partitions import write_parquet
+from src.data.semantic import QUOTE_DIM_TABLE, build_quote_dim
+
+FACT_TABLE = "fact_timesheet_day_enriched"
+# Key-value metadata of dim_job_task_quote: content hash of the fact table it was built from.
+SOURCE_HASH_KEY = "source_content_hash"
+
+
+def write_quote_dim(data_dir: Path, fact: pd.DataFrame) -> Path:
+    # fact is the processed fact table as currently stored; its content hash goes with the dim.
+    source = content_hash(resolve_table_path(data_dir, "processed", FACT_TABLE))
+    path = Path(data_dir) / "processed" / f"{QUOTE_DIM_TABLE}.parquet"
+    return write_parquet(build_quote_dim(fact), path, metadata={SOURCE_HASH_KEY: source})
+
+
+def quote_dim_source(path: Path) -> str | None:
+    if Path(path).suffix != ".parquet":
+        return None
+    value = (pq.read_schema(path).metadata or {}).get(SOURCE_HASH_KEY.encode())
+    return value.decode() if value else None
+
+
+def load_quote_dim(data_dir: Path) -> pd.DataFrame | None:
+    # dim_job_task_quote if it was built from the current fact table; None when it is missing
+    # or the fact has been rewritten since ingest, so callers derive it from the fact instead.
+    try:
+        path = resolve_table_path(data_dir, "processed", QUOTE_DIM_TABLE)
+        fact_path = resolve_table_path(data_dir, "processed", FACT_TABLE)
+    except FileNotFoundError:
+        return None
+    if quote_dim_source(path) != content_hash(fact_path):
+        return None
+    return load_table(path)
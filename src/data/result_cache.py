@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Iterable, Mapping
+
+import pandas as pd
+
+from src.config import load_config
+from src.data.filters import filter_hash
+from src.data.loader import resolve_table_path
+from src.data.partitions import partition_files, write_parquet
+from src.instrumentation import instrument, mark_cache
+
+RESULTS_DIRNAME = "results"
+PARTS_SUFFIX = ".parts"
+PackResult = pd.DataFrame | Mapping[str, pd.DataFrame]
+
+_SRC_DIR = Path(__file__).resolve().parents[1]
+_FOOTER_HASHES: dict[tuple[str, int, int], str] = {}
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    # Hash of every source file under src/: a deploy that changes any metric logic gets
+    # fresh cache keys instead of serving results computed by the old code.
+    digest = hashlib.sha256()
+    for path in sorted(_SRC_DIR.rglob("*.py")):
+        digest.update(str(path.relative_to(_SRC_DIR)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _file_hash(path: Path) -> str:
+    # Parquet files are identified by their footer (schema, row groups and column statistics),
+    # read from the end of the file; other formats by size and mtime.
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+    cached = _FOOTER_HASHES.get(key)
+    if cached is not None:
+        return cached
+    digest = hashlib.sha256(str(stat.st_size).encode())
+    if path.suffix == ".parquet" and stat.st_size > 12:
+        with path.open("rb") as handle:
+            handle.seek(-8, os.SEEK_END)
+            tail = handle.read(8)
+            footer_length = int.from_bytes(tail[:4], "little")
+            if tail[4:] == b"PAR1" and footer_length + 8 <= stat.st_size:
+                handle.seek(-(footer_length + 8), os.SEEK_END)
+                digest.update(handle.read(footer_length))
+            else:
+                digest.update(str(stat.st_mtime_ns).encode())
+    else:
+        digest.update(str(stat.st_mtime_ns).encode())
+    _FOOTER_HASHES[key] = digest.hexdigest()
+    return _FOOTER_HASHES[key]
+
+
+def table_content_hash(path: Path) -> str:
+    # One hash over every file of a (possibly month-partitioned) table.
+    path = Path(path)
+    files = partition_files(path) or [path]
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(str(file.relative_to(path) if file != path else file.name).encode())
+        digest.update(_file_hash(file).encode())
+    return digest.hexdigest()[:32]
+
+
+def result_key(
+    pack: str,
+    input_hashes: Mapping[str, str],
+    params: Mapping | None = None,
+    group_keys: Iterable[str] | None = None,
+    filters: dict | None = None,
+) -> str:
+    payload = json.dumps({
+        "pack": pack,
+        "params": dict(params or {}),
+        "group_keys": list(group_keys or []),
+        "filters": None if filters is None else filter_hash(filters),
+        "inputs": dict(sorted(input_hashes.items())),
+        "code": code_version(),
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _entry_bytes(path: Path) -> int:
+    if path.is_dir():
+        return sum(file.stat().st_size for file in path.iterdir() if file.is_file())
+    return path.stat().st_size
+
+
+class ResultCache:
+    # Pack results as parquet files under root, shared by every process on the machine. Writes
+    # are atomic renames; reads refresh the entry's mtime, which orders the LRU eviction that
+    # keeps the directory under max_bytes.
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        base = self.root / key[:2] / key
+        return base.with_suffix(".parquet"), base.with_suffix(PARTS_SUFFIX)
+
+    def get(self, key: str) -> PackResult | None:
+        frame_path, parts_path = self._paths(key)
+        try:
+            if frame_path.exists():
+                result: PackResult = pd.read_parquet(frame_path)
+                os.utime(frame_path)
+            elif parts_path.exists():
+                result = {file.stem: pd.read_parquet(file) for file in sorted(parts_path.glob("*.parquet"))}
+                os.utime(parts_path)
+            else:
+                result = None
+        except (FileNotFoundError, OSError, ValueError):
+            # Evicted or replaced by another process mid-read.
+            result = None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def put(self, key: str, result: PackResult) -> None:
+        frame_path, parts_path = self._paths(key)
+        if isinstance(result, pd.DataFrame):
+            write_parquet(result, frame_path)
+        else:
+            tmp_dir = parts_path.with_name(f".{parts_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            for name, frame in result.items():
+                write_parquet(frame, tmp_dir / f"{name}.parquet")
+            try:
+                os.replace(tmp_dir, parts_path)
+            except OSError:
+                # Another process stored the same result first.
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        # (last use, bytes, path) per stored result.
+        found = []
+        if not self.root.exists():
+            return found
+        for shard in self.root.iterdir():
+            if not shard.is_dir():
+                continue
+            for path in shard.iterdir():
+                if path.name.startswith("."):
+                    continue
+                try:
+                    found.append((path.stat().st_mtime, _entry_bytes(path), path))
+                except FileNotFoundError:
+                    continue
+        return found
+
+    def evict(self) -> None:
+        entries = sorted(self.entries(), key=lambda entry: entry[0])
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def report(self) -> dict[str, int]:
+        entries = self.entries()
+        with self._lock:
+            return {
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_CACHES: dict[str, ResultCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def result_cache(data_dir: Path) -> ResultCache:
+    root = Path(data_dir) / "cache" / RESULTS_DIRNAME
+    with _CACHES_LOCK:
+        cache = _CACHES.get(str(root))
+        if cache is None:
+            cache = _CACHES[str(root)] = ResultCache(root, load_config().result_cache_mb * 1024 * 1024)
+        return cache
+
+
+@instrument("result", cached=True, detail=lambda data_dir, pack, *args, **kwargs: pack)
+def cached_pack(
+    data_dir: Path,
+    pack: str,
+    compute: Callable[[], PackResult],
+    tables: Iterable[str],
+    params: Mapping | None = None,
+    group_keys: Iterable[str] | None = None,
+    filters: dict | None = None,
+    layer: str = "processed",
+) -> PackResult:
+    # The pack result for these inputs from the disk cache, or compute() stored for the next
+    # caller. tables are the input tables (in layer) compute() reads, so rewriting any of them
+    # changes the key. RESULT_CACHE_MB=0 disables the cache.
+    cache = result_cache(data_dir)
+    if cache.max_bytes <= 0:
+        return compute()
+    hashes = {name: table_content_hash(resolve_table_path(data_dir, layer, name)) for name in tables}
+    key = result_key(pack, hashes, params, group_keys, filters)
+    result = cache.get(key)
+    if result is not None:
+        return result
+    mark_cache("miss")
+    result = compute()
+    cache.put(key, result)
+    return result
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from src.data.aggregate import Count, Difference, Measure, Ratio, Sum, aggregate
+from src.data.catalog import catalog_key, load_catalog
+from src.data.filters import dimension_filters, filtered_table, read_filtered
+from src.data.loader import resolve_table_path
+from src.data.semantic import HIERARCHY_LEVELS, HIERARCHY_MEASURES, ensure_company
+from src.instrumentation import span
+
+# Aggregate navigation: a query (measures, group keys, global filters) is answered from the
+# coarsest mart whose grain holds the group keys and every filtered column, re-aggregated from
+# its additive columns, and from the filtered fact table only when no mart covers it.
+
+logger = logging.getLogger(__name__)
+
+FACT_TABLE = "fact_timesheet_day_enriched"
+FACT_SOURCE = "fact"
+
+# Columns the cube marts store that stay correct when summed over any of their keys. Quotes are
+# attributed to one row per job-task when the marts are built, so they sum like the rest, but
+# only without a time window (see covering_marts).
+ADDITIVE_MEASURES = ("hours", "cost", "revenue", "quoted_hours", "quoted_amount")
+# Empty for groups without quotes (DedupSum), so their sums stay NaN when nothing was quoted.
+NULLABLE_MEASURES = {"quoted_hours", "quoted_amount"}
+DERIVED_MEASURES = {
+    measure.name: measure
+    for measure in [
+        Difference("margin", "revenue", "cost"),
+        Ratio("margin_pct", "margin", "revenue"),
+        Ratio("realised_rate", "revenue", "hours"),
+        Ratio("cost_rate", "cost", "hours"),
+        Ratio("quote_rate", "quoted_amount", "quoted_hours"),
+    ]
+}
+# Fact-table definitions for the fallback; distinct counts are only answered there.
+FACT_MEASURES = {
+    **{measure.name: measure for measure in HIERARCHY_MEASURES},
+    "cost_rate": DERIVED_MEASURES["cost_rate"],
+}
+
+_HIERARCHY_KEYS = ("company", "department_final", "job_category")
+
+
+@dataclass(frozen=True)
+class MartGrain:
+    name: str
+    keys: tuple[str, ...]
+    measures: tuple[str, ...] = ADDITIVE_MEASURES
+    level: str | None = None  # the rows of a cube_hierarchy_month level
+
+    @property
+    def source(self) -> str:
+        return self.name if self.level is None else f"{self.name}[{self.level}]"
+
+
+MART_GRAINS = [
+    MartGrain("cube_dept_month", ("company", "department_final", "month_key")),
+    MartGrain("cube_dept_category_month", (*_HIERARCHY_KEYS, "month_key")),
+    MartGrain("cube_dept_category_task", (*_HIERARCHY_KEYS, "task_name")),
+    MartGrain("cube_dept_category_staff", (*_HIERARCHY_KEYS, "staff_name")),
+    *[
+        MartGrain("cube_hierarchy_month", (*keys, "month_key"), level=level)
+        for level, keys in HIERARCHY_LEVELS.items()
+    ],
+]
+
+
+def _windowed(filters: dict) -> bool:
+    window = filters.get("window_value")
+    if window == "Custom":
+        return bool(filters.get("start_month") and filters.get("end_month"))
+    return isinstance(window, int) or window == "FYTD"
+
+
+def required_columns(group_keys: Iterable[str], filters: dict) -> set[str]:
+    # Columns a source must keep to group and filter the query: the time window needs months
+    # and the leave exclusion needs task names.
+    needed = set(group_keys) | set(dimension_filters(filters))
+    if _windowed(filters):
+        needed.add("month_key")
+    if filters.get("exclude_leave"):
+        needed.add("task_name")
+    return needed
+
+
+def base_measures(measures: Iterable[str]) -> list[str] | None:
+    # The additive columns the measures are derived from; None when one is not derivable.
+    found: list[str] = []
+
+    def visit(name: str) -> bool:
+        if name in ADDITIVE_MEASURES:
+            if name not in found:
+                found.append(name)
+            return True
+        derived = DERIVED_MEASURES.get(name)
+        if derived is None:
+            return False
+        parts = (derived.left, derived.right) if isinstance(derived, Difference) else (derived.numerator, derived.denominator)
+        return all(visit(part) for part in parts)
+
+    return found if all(visit(name) for name in measures) else None
+
+
+def _mart_rows(data_dir: Path, name: str) -> int:
+    entry = load_catalog(data_dir).get(catalog_key("marts", name))
+    return entry.row_count if entry is not None else 0
+
+
+def covering_marts(data_dir: Path, measures: Iterable[str], group_keys: Iterable[str], filters: dict) -> list[MartGrain]:
+    # Built marts that can answer the query, coarsest (fewest keys, then fewest rows) first.
+    bases = base_measures(measures)
+    if bases is None:
+        return []
+    if _windowed(filters) and NULLABLE_MEASURES & set(bases):
+        # Marts attribute each quote to the job-task's first month; under a time window the fact
+        # table dedupes to the first row inside the window, so quotes come from the fact.
+        return []
+    needed = required_columns(group_keys, filters)
+    candidates = []
+    for grain in MART_GRAINS:
+        if not needed <= set(grain.keys) or not set(bases) <= set(grain.measures):
+            continue
+        try:
+            resolve_table_path(data_dir, "marts", grain.name)
+        except FileNotFoundError:
+            continue
+        candidates.append(grain)
+    return sorted(candidates, key=lambda grain: (len(grain.keys), _mart_rows(data_dir, grain.name)))
+
+
+def _measure_plan(measures: list[str], bases: list[str]) -> list[Measure]:
+    # Sums of the base columns, then each derived measure after the measures it reads.
+    plan: list[Measure] = [Sum(name, name) for name in bases]
+    plan += [Count(f"_{name}_rows", where=lambda df, name=name: df[name].notna()) for name in bases if name in NULLABLE_MEASURES]
+    done = set(bases)
+
+    def add(name: str) -> None:
+        if name in done:
+            return
+        derived = DERIVED_MEASURES[name]
+        parts = (derived.left, derived.right) if isinstance(derived, Difference) else (derived.numerator, derived.denominator)
+        for part in parts:
+            add(part)
+        plan.append(derived)
+        done.add(name)
+
+    for name in measures:
+        add(name)
+    return plan
+
+
+def _from_mart(data_dir: Path, grain: MartGrain, measures: list[str], group_keys: list[str], filters: dict) -> pd.DataFrame:
+    bases = base_measures(measures)
+    level = [] if grain.level is None else [("level", "==", grain.level)]
+    path = resolve_table_path(data_dir, "marts", grain.name)
+    mart = read_filtered(path, filters, columns=[*grain.keys, *bases], table_filters=level)
+    result = aggregate(mart, group_keys, _measure_plan(measures, bases))
+    for name in bases:
+        if name in NULLABLE_MEASURES:
+            result[name] = result[name].where(result.pop(f"_{name}_rows") > 0, np.nan)
+    return result[[*group_keys, *measures]]
+
+
+def _fact_plan(measures: list[str]) -> list[Measure]:
+    plan: list[Measure] = []
+
+    def add(name: str) -> None:
+        if any(measure.name == name for measure in plan):
+            return
+        measure = FACT_MEASURES[name]
+        if isinstance(measure, Difference):
+            add(measure.left), add(measure.right)
+        elif isinstance(measure, Ratio):
+            add(measure.numerator), add(measure.denominator)
+        plan.append(measure)
+
+    for name in measures:
+        add(name)
+    return plan
+
+
+def _from_fact(data_dir: Path, measures: list[str], group_keys: list[str], filters: dict) -> pd.DataFrame:
+    fact = ensure_company(filtered_table(data_dir, FACT_TABLE, filters))
+    return aggregate(fact, group_keys, _fact_plan(measures))[[*group_keys, *measures]]
+
+
+def route(data_dir: Path, measures: Iterable[str], group_keys: Iterable[str], filters: dict) -> MartGrain | None:
+    # The mart that serves the query, or None for the fact table.
+    candidates = covering_marts(data_dir, measures, group_keys, filters)
+    return candidates[0] if candidates else None
+
+
+def query(
+    data_dir: Path,
+    measures: Iterable[str],
+    group_keys: Iterable[str],
+    filters: dict | None = None,
+    **selection,
+) -> pd.DataFrame:
+    # measures (names from FACT_MEASURES) by group_keys under the global filters; selection
+    # (e.g. department_final="Design") narrows to drilled-into parents. Additive measures and
+    # ratios of them come from the coarsest covering mart, anything else from the fact table.
+    measures, group_keys = list(measures), list(group_keys)
+    filters = {**(filters or {}), **{col: [value] for col, value in selection.items()}}
+    grain = route(data_dir, measures, group_keys, filters)
+    source = FACT_SOURCE if grain is None else grain.source
+    logger.info("query %s by %s served by %s", measures, group_keys, source)
+    with span(f"query:{source}", "route") as current:
+        if grain is None:
+            result = _from_fact(data_dir, measures, group_keys, filters)
+        else:
+            result = _from_mart(data_dir, grain, measures, group_keys, filters)
+        current.output(result)
+    return result
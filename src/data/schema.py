@@ -52,6 +52,43 @@ SOFT_FACT_JOB_TASK_MONTH_COLUMNS = {
     "quote_match_flag",
 }
 
+# Sidebar multiselect filters, in display order.
+OPTIONAL_FILTER_COLUMNS = ["client", "business_unit", "role", "function", "onshore_flag", "job_status", "state"]
+
+# Dtype profile applied at load (see src/data/dtypes.py).
+CATEGORY_COLUMNS = {
+    "department_final",
+    "job_category",
+    "task_name",
+    "staff_name",
+    "client",
+    "breakdown",
+    "quote_match_flag",
+    "job_status",
+    "business_unit",
+    "role",
+    "function",
+    "onshore_flag",
+    "state",
+}
+
+FLAG_COLUMNS = {
+    "is_billable",
+}
+
+MEASURE_COLUMNS = {
+    "hours_raw",
+    "base_cost",
+    "rev_alloc",
+    "quoted_time_total",
+    "quoted_amount_total",
+    "utilisation_target",
+    "fte_hours_scaling",
+    "hours_raw_sum",
+    "base_cost_sum",
+    "rev_alloc_sum",
+}
+
 REQUIRED_AUDIT_REVENUE_COLUMNS = {
     "job_no",
     "month_key",
@@ -1,10 +1,74 @@
 from __future__ import annotations
 
+from typing import Sequence
+
+import numpy as np
 import pandas as pd
 
+from src.data.aggregate import (
+    DEDUP_KEYS,
+    CountDistinct,
+    DedupSum,
+    Difference,
+    Max,
+    Measure,
+    Min,
+    Ratio,
+    Sum,
+    aggregate,
+    grouping_sets,
+    isin_keys,
+)
+
 
 CANONICAL_HIERARCHY = ["company", "department_final", "job_category", "task_name", "staff_name"]
 
+# Drill levels of the hierarchy cube: each prefix of the hierarchy, plus staff within a category.
+HIERARCHY_LEVELS = {
+    "company": CANONICAL_HIERARCHY[:1],
+    "department": CANONICAL_HIERARCHY[:2],
+    "category": CANONICAL_HIERARCHY[:3],
+    "task": CANONICAL_HIERARCHY[:4],
+    "task_staff": CANONICAL_HIERARCHY[:5],
+    "staff": CANONICAL_HIERARCHY[:3] + ["staff_name"],
+}
+
+PROFITABILITY_MEASURES = [
+    Sum("hours", "hours_raw"),
+    Sum("cost", "base_cost"),
+    Sum("revenue", "rev_alloc"),
+    Difference("margin", "revenue", "cost"),
+    Ratio("margin_pct", "margin", "revenue"),
+    Ratio("realised_rate", "revenue", "hours"),
+]
+
+QUOTE_MEASURES = [
+    DedupSum("quoted_hours", "quoted_time_total"),
+    DedupSum("quoted_amount", "quoted_amount_total"),
+]
+
+QUOTE_SUM_MEASURES = [
+    Sum("quoted_hours", "quoted_time_total"),
+    Sum("quoted_amount", "quoted_amount_total"),
+]
+
+RATE_MEASURES = [
+    Sum("rev_alloc", "rev_alloc"),
+    Sum("hours_raw", "hours_raw"),
+    Ratio("realised_rate", "rev_alloc", "hours_raw"),
+    *QUOTE_MEASURES,
+    Ratio("quote_rate", "quoted_amount", "quoted_hours"),
+]
+
+
+HIERARCHY_MEASURES = [
+    *PROFITABILITY_MEASURES,
+    *QUOTE_MEASURES,
+    Ratio("quote_rate", "quoted_amount", "quoted_hours"),
+    CountDistinct("job_count", "job_no"),
+    CountDistinct("staff_count", "staff_name"),
+]
+
 
 def ensure_company(df: pd.DataFrame, company_label: str = "SG") -> pd.DataFrame:
     if "company" not in df.columns:
@@ -13,37 +77,98 @@ def ensure_company(df: pd.DataFrame, company_label: str = "SG") -> pd.DataFrame:
     return df
 
 
-def month_key_to_period(series: pd.Series) -> pd.Series:
-    def _parse(value) -> pd.Period:
-        if pd.isna(value):
-            return pd.NaT
-        if isinstance(value, pd.Period):
-            return value
-        text = str(value)
-        if len(text) == 6 and text.isdigit():
-            return pd.Period(f"{text[:4]}-{text[4:]}", freq="M")
-        if len(text) >= 7:
-            return pd.Period(text[:7], freq="M")
-        raise ValueError(f"Unsupported month_key format: {value}")
+MONTH_ORD_NA = -1
+_PERIOD_EPOCH_ORD = 1970 * 12
+
+
+def month_ord_from_key(value) -> int:
+    if isinstance(value, (pd.Period, pd.Timestamp)):
+        return value.year * 12 + value.month - 1
+    text = str(value)
+    if len(text) == 6 and text.isdigit():
+        return int(text[:4]) * 12 + int(text[4:]) - 1
+    if len(text) >= 7:
+        period = pd.Period(text[:7], freq="M")
+        return period.year * 12 + period.month - 1
+    raise ValueError(f"Unsupported month_key format: {value}")
+
+
+def month_key_to_ord(series: pd.Series) -> pd.Series:
+    missing = series.isna().to_numpy()
+    dtype = series.dtype
+    if isinstance(dtype, pd.PeriodDtype):
+        ords = series.array.asi8 + _PERIOD_EPOCH_ORD
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        ords = series.dt.year.fillna(0).to_numpy(np.int64) * 12 + series.dt.month.fillna(1).to_numpy(np.int64) - 1
+    elif pd.api.types.is_integer_dtype(dtype):
+        values = series.fillna(0).to_numpy(np.int64)
+        ords = (values // 100) * 12 + values % 100 - 1
+    else:
+        # Month keys have tiny cardinality: parse each distinct value once and broadcast.
+        codes, uniques = pd.factorize(series)
+        parsed = np.fromiter((month_ord_from_key(v) for v in uniques), dtype=np.int64, count=len(uniques))
+        ords = parsed[np.maximum(codes, 0)] if len(parsed) else np.zeros(len(codes), dtype=np.int64)
+    ords = np.where(missing, MONTH_ORD_NA, ords).astype(np.int32)
+    return pd.Series(ords, index=series.index, name="month_ord")
+
+
+def get_month_ord(df: pd.DataFrame) -> pd.Series:
+    if "month_ord" in df.columns:
+        return df["month_ord"]
+    return month_key_to_ord(df["month_key"])
+
+
+def latest_month_ord(ords: pd.Series) -> int | None:
+    valid = ords[ords > MONTH_ORD_NA]
+    if valid.empty:
+        return None
+    return int(valid.max())
+
+
+def month_ord_to_period(ords: pd.Series) -> pd.Series:
+    values = ords.to_numpy(np.int64)
+    ordinals = np.where(values > MONTH_ORD_NA, values - _PERIOD_EPOCH_ORD, pd.NaT.value)
+    return pd.Series(pd.arrays.PeriodArray(ordinals, dtype=pd.PeriodDtype("M")), index=ords.index)
+
+
+def month_ord_to_label(ord_value: int) -> str:
+    return f"{ord_value // 12}-{ord_value % 12 + 1:02d}"
 
-    return series.apply(_parse)
+
+def month_key_to_period(series: pd.Series) -> pd.Series:
+    return month_ord_to_period(month_key_to_ord(series))
 
 
 def add_aus_fy(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
-    periods = month_key_to_period(df["month_key"])
-    years = periods.dt.year
-    months = periods.dt.month
-    fy_year = years.where(months <= 6, years + 1)
-    df["aus_fy"] = "FY" + fy_year.astype("Int64").astype(str)
+    ords = get_month_ord(df).to_numpy()
+    fy_year = np.where(ords > MONTH_ORD_NA, ords // 12 + (ords % 12 >= 6), -1)
+    years, codes = np.unique(fy_year, return_inverse=True)
+    labels = np.array([f"FY{year}" if year >= 0 else "FY<NA>" for year in years], dtype=object)
+    df["aus_fy"] = labels[codes.reshape(-1)]
     return df
 
 
+def string_mask(series: pd.Series, predicate) -> pd.Series:
+    # Categorical columns evaluate the predicate once per category and broadcast via codes.
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = pd.Series(series.cat.categories.astype(str))
+        matched = np.append(np.asarray(predicate(categories), dtype=bool), predicate(pd.Series(["nan"])).iloc[0])
+        return pd.Series(matched[series.cat.codes.to_numpy()], index=series.index)
+    return predicate(series.astype(str))
+
+
+def not_leave(df: pd.DataFrame) -> pd.Series:
+    return ~leave_exclusion_mask(df)
+
+
 def leave_exclusion_mask(df: pd.DataFrame) -> pd.Series:
-    return df["task_name"].astype(str).str.contains("leave", case=False, na=False)
+    return string_mask(df["task_name"], lambda values: values.str.contains("leave", case=False, na=False))
 
 
-def safe_quote_job_task(df: pd.DataFrame, include_cols: list[str] | None = None) -> pd.DataFrame:
+def safe_quote_job_task(
+    df: pd.DataFrame, include_cols: list[str] | None = None, keys: Sequence[str] = DEDUP_KEYS
+) -> pd.DataFrame:
     if "job_no" not in df.columns:
         raise ValueError("safe_quote_job_task requires job_no column")
     cols = [
@@ -56,54 +181,81 @@ def safe_quote_job_task(df: pd.DataFrame, include_cols: list[str] | None = None)
         cols.append("quote_match_flag")
     if include_cols:
         cols = list(dict.fromkeys(cols + include_cols))
-    return df[cols].drop_duplicates(subset=["job_no", "task_name"]).copy()
-
-
-def safe_quote_rollup(df: pd.DataFrame, group_keys: list[str]) -> pd.DataFrame:
-    quote_df = safe_quote_job_task(df, include_cols=group_keys)
-    rollup = (
-        quote_df.groupby(group_keys, dropna=False)[
-            ["quoted_time_total", "quoted_amount_total"]
-        ]
-        .sum()
-        .rename(columns={
-            "quoted_time_total": "quoted_hours",
-            "quoted_amount_total": "quoted_amount",
-        })
-        .reset_index()
-    )
-    return rollup
+    cols = list(dict.fromkeys([*keys, *cols]))
+    return df[cols].drop_duplicates(subset=list(keys)).copy()
 
 
-def profitability_rollup(df: pd.DataFrame, group_keys: list[str]) -> pd.DataFrame:
-    grouped = df.groupby(group_keys, dropna=False).agg(
-        hours=("hours_raw", "sum"),
-        cost=("base_cost", "sum"),
-        revenue=("rev_alloc", "sum"),
-    )
-    grouped["margin"] = grouped["revenue"] - grouped["cost"]
-    grouped["margin_pct"] = grouped["margin"] / grouped["revenue"].replace({0: pd.NA})
-    grouped["realised_rate"] = grouped["revenue"] / grouped["hours"].replace({0: pd.NA})
-    return grouped.reset_index()
+QUOTE_DIM_TABLE = "dim_job_task_quote"
 
 
-def rate_rollups(df: pd.DataFrame, group_keys: list[str]) -> pd.DataFrame:
-    realised = (
-        df.groupby(group_keys, dropna=False)[["rev_alloc", "hours_raw"]]
-        .sum()
-        .reset_index()
-    )
-    realised["realised_rate"] = realised["rev_alloc"] / realised["hours_raw"].replace({0: pd.NA})
+def build_quote_dim(df: pd.DataFrame, keys: Sequence[str] = DEDUP_KEYS) -> pd.DataFrame:
+    # One row per (job_no, task_name) in first-occurrence order: quote fields, match flag and
+    # hierarchy keys / month of the first row (where quote rollups attribute the quote), plus
+    # the first and last active month and total actual hours of the job-task. Wider keys (e.g.
+    # with department and category) give one row per job-task within each of their values.
+    df = ensure_company(df)
+    include = [col for col in CANONICAL_HIERARCHY + ["month_key"] if col in df.columns]
+    dim = safe_quote_job_task(df, include_cols=include, keys=keys)
+    ords = get_month_ord(df)
+    stats = aggregate(df.assign(month_ord=ords.where(ords > MONTH_ORD_NA)), list(keys), [
+        Sum("actual_hours", "hours_raw"),
+        Min("first_month_ord", "month_ord"),
+        Max("last_month_ord", "month_ord"),
+    ])
+    for bound in ("first", "last"):
+        values = stats.pop(f"{bound}_month_ord")
+        labels = {value: month_ord_to_label(int(value)) for value in values.dropna().unique()}
+        stats[f"{bound}_month_key"] = values.map(labels)
+    return dim.merge(stats, on=list(keys), how="left")
+
 
-    quote = safe_quote_rollup(df, group_keys)
-    quote["quote_rate"] = quote["quoted_amount"] / quote["quoted_hours"].replace({0: pd.NA})
+def restrict_quote_dim(quote_dim: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    # Job-task quote rows for the job-tasks present in df (e.g. a subset of whole jobs).
+    return quote_dim.loc[isin_keys(quote_dim, df, DEDUP_KEYS)]
 
-    merged = realised.merge(quote, on=group_keys, how="left")
-    return merged
+
+def safe_quote_rollup(
+    df: pd.DataFrame, group_keys: list[str], quote_df: pd.DataFrame | None = None
+) -> pd.DataFrame:
+    # quote_df lets callers pass job-task quote rows deduplicated over a wider frame than df.
+    if quote_df is None:
+        quote_df = safe_quote_job_task(df, include_cols=group_keys)
+    return aggregate(quote_df, group_keys, QUOTE_SUM_MEASURES)
+
+
+def profitability_rollup(df: pd.DataFrame, group_keys: list[str]) -> pd.DataFrame:
+    return aggregate(df, group_keys, PROFITABILITY_MEASURES)
+
+
+def rate_rollups(
+    df: pd.DataFrame, group_keys: list[str], quote_df: pd.DataFrame | None = None
+) -> pd.DataFrame:
+    return aggregate(df, group_keys, RATE_MEASURES, dedup_rows=quote_df)
 
 
 def scope_creep(df: pd.DataFrame) -> pd.Series:
     if "quote_match_flag" not in df.columns:
         return pd.Series(0, index=df.index)
-    flags = df["quote_match_flag"].astype(str).str.lower()
-    return flags.isin({"no_match", "no match", "false", "0"})
+    return string_mask(
+        df["quote_match_flag"], lambda values: values.str.lower().isin({"no_match", "no match", "false", "0"})
+    )
+
+
+def hierarchy_cube(
+    df: pd.DataFrame,
+    measures: list[Measure] | None = None,
+    by: list[str] | None = None,
+    quote_df: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    # All HIERARCHY_LEVELS (optionally crossed with e.g. month_key) from one scan, tagged by `level`.
+    return grouping_sets(df, HIERARCHY_LEVELS, measures or HIERARCHY_MEASURES, by=by or (), dedup_rows=quote_df)
+
+
+def drill_level(cube: pd.DataFrame, level: str, measures: list[str], **selection) -> pd.DataFrame:
+    # One level of a hierarchy cube under the selected parents, summed over any extra keys
+    # (e.g. months), so only additive measures should be requested.
+    rows = cube.loc[cube["level"] == level]
+    for key, value in selection.items():
+        rows = rows.loc[rows[key] == value]
+    key = HIERARCHY_LEVELS[level][-1]
+    return rows.groupby(key, dropna=False, observed=True)[measures].sum().reset_index()
@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.data.aggregate import First, Sum, aggregate
+from src.data.semantic import month_ord_from_key, month_ord_to_label, month_ord_to_period
+
+# Seeded, schema-valid stand-ins for the processed tables, for benchmarks and tests. Job sizes,
+# clients, tasks and staff workloads are heavy-tailed, volume grows over the months with a
+# December/January dip, and about 4% of rows are leave.
+
+DEPARTMENTS = ("Creative", "Digital", "Strategy", "Media", "Production", "Data", "Social", "PR")
+CATEGORIES = ("Retainer", "Project", "Campaign", "Pitch", "Support", "Content", "Research", "Events")
+TASKS = (
+    "Account Management", "Project Management", "Strategy", "Concept", "Design", "Copywriting",
+    "Development", "QA", "Production", "Editing", "Media Planning", "Reporting", "Client Meeting",
+    "Internal Meeting", "Admin", "Training",
+)
+NON_BILLABLE_TASKS = ("Internal Meeting", "Admin", "Training")
+LEAVE_TASKS = ("Annual Leave", "Sick Leave", "Public Holiday")
+ROLES = ("Intern", "Junior", "Mid", "Senior", "Lead", "Director")
+FUNCTIONS = ("Delivery", "Creative", "Technology", "Client Service", "Operations")
+STATES = ("NSW", "VIC", "QLD", "WA", "SA")
+BUSINESS_UNITS = ("Agency", "Consulting", "Studio")
+JOB_STATUSES = ("Active", "On Hold", "Completed")
+BREAKDOWNS = ("Billable", "Admin", "Training", "Internal", "Leave")
+QUOTE_FLAGS = ("matched", "no_match")
+LEAVE_JOB = "INTERNAL"
+LEAVE_CATEGORY = "Internal"
+LEAVE_SHARE = 0.04
+
+ROLE_COST = np.array([35.0, 50.0, 70.0, 90.0, 110.0, 140.0])
+ROLE_TARGET = np.array([0.85, 0.85, 0.8, 0.75, 0.65, 0.45])
+
+
+def _zipf(n: int, exponent: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _categorical(codes: np.ndarray, categories) -> pd.Categorical:
+    return pd.Categorical.from_codes(codes, categories=pd.Index(list(categories), dtype="str"))
+
+
+@dataclass(frozen=True)
+class SyntheticWorld:
+    # Fixed attributes of the jobs and staff the rows are drawn from (per-entity arrays).
+    seed: int
+    first_ord: int
+    month_rows: np.ndarray
+    job_names: pd.Index
+    job_department: np.ndarray
+    job_category: np.ndarray
+    job_client: np.ndarray
+    job_status: np.ndarray
+    job_start: np.ndarray
+    job_end: np.ndarray
+    job_due_date: np.ndarray
+    job_completed_date: np.ndarray
+    job_weight: np.ndarray
+    job_rate: np.ndarray
+    job_task_offset: np.ndarray
+    quoted_hours: np.ndarray
+    quoted_amount: np.ndarray
+    client_names: pd.Index
+    category_names: pd.Index
+    staff_names: pd.Index
+    staff_department: np.ndarray
+    staff_order: np.ndarray
+    staff_offsets: np.ndarray
+    staff_role: np.ndarray
+    staff_function: np.ndarray
+    staff_state: np.ndarray
+    staff_unit: np.ndarray
+    staff_onshore: np.ndarray
+    staff_fte: np.ndarray
+
+    @property
+    def months(self) -> int:
+        return len(self.month_rows)
+
+
+def synthetic_world(rows: int, seed: int = 0, months: int = 36, end_month: str = "2025-06") -> SyntheticWorld:
+    rng = np.random.default_rng([seed, 0])
+    first_ord = month_ord_from_key(end_month) - months + 1
+    calendar = (first_ord + np.arange(months)) % 12
+    volume = (1 + 0.5 * np.arange(months) / max(months - 1, 1)) * np.where(np.isin(calendar, [0, 11]), 0.7, 1.0)
+    month_rows = np.floor(rows * volume / volume.sum()).astype(np.int64)
+    month_rows[-1] += rows - month_rows.sum()
+
+    n_jobs = max(rows // 250, 12)
+    department_weights = _zipf(len(DEPARTMENTS), 0.8)
+    job_department = rng.choice(len(DEPARTMENTS), n_jobs, p=department_weights)
+    # Each department uses its own skewed subset of categories.
+    category_ranks = np.argsort(rng.random((len(DEPARTMENTS), len(CATEGORIES))), axis=1)
+    n_categories = rng.integers(3, len(CATEGORIES) + 1, len(DEPARTMENTS))
+    rank = np.minimum(rng.zipf(1.6, n_jobs) - 1, n_categories[job_department] - 1)
+    job_category = category_ranks[job_department, rank]
+    n_clients = max(n_jobs // 8, 3)
+    job_client = rng.choice(n_clients, n_jobs, p=_zipf(n_clients, 1.1))
+
+    job_start = rng.integers(-6, months, n_jobs)
+    job_end = job_start + np.minimum(rng.geometric(0.15, n_jobs), 24) - 1
+    retainer = rng.random(n_jobs) < 0.05
+    job_start[retainer], job_end[retainer] = -6, months + 6
+    job_weight = np.minimum(rng.pareto(1.2, n_jobs) + 1, 500.0)
+    job_status = np.where(job_end < months - 2, 2, np.where(rng.random(n_jobs) < 0.05, 1, 0))
+    job_rate = rng.uniform(120, 220, n_jobs)
+    # Due on the 28th of the job's last month; completed jobs finish a few days after it.
+    end_months = month_ord_to_period(pd.Series(first_ord + job_end)).dt.to_timestamp().to_numpy()
+    job_due_date = end_months + np.timedelta64(27, "D")
+    job_completed_date = np.where(
+        job_status == 2, job_due_date + rng.integers(-10, 20, n_jobs).astype("timedelta64[D]"), np.datetime64("NaT")
+    )
+
+    # Expected rows per job (its weight share of every month it is active) sizes its quotes.
+    expected = np.zeros(n_jobs)
+    for month in range(months):
+        active = (job_start <= month) & (job_end >= month)
+        expected[active] += month_rows[month] * (1 - LEAVE_SHARE) * job_weight[active] / job_weight[active].sum()
+    task_weights = _zipf(len(TASKS), 1.0)
+    job_task_offset = rng.integers(0, len(TASKS), n_jobs)
+    shares = task_weights[(np.arange(len(TASKS))[None, :] - job_task_offset[:, None]) % len(TASKS)]
+    quoted_hours = np.round(expected[:, None] * shares * 3.5 * rng.lognormal(0, 0.35, shares.shape), 1)
+    quoted_hours[rng.random(shares.shape) < 0.15] = np.nan
+    quoted_hours[:, [TASKS.index(task) for task in NON_BILLABLE_TASKS]] = np.nan
+    quoted_amount = np.round(quoted_hours * job_rate[:, None] * rng.uniform(0.9, 1.2, n_jobs)[:, None], 2)
+
+    n_staff = int(np.clip(rows // 2000, 12, 5000))
+    staff_department = rng.choice(len(DEPARTMENTS), n_staff, p=department_weights)
+    staff_order = np.argsort(staff_department, kind="stable")
+    staff_offsets = np.concatenate([[0], np.cumsum(np.bincount(staff_department, minlength=len(DEPARTMENTS)))])
+    staff_role = rng.choice(len(ROLES), n_staff, p=[0.05, 0.25, 0.3, 0.22, 0.12, 0.06])
+
+    return SyntheticWorld(
+        seed=seed,
+        first_ord=first_ord,
+        month_rows=month_rows,
+        job_names=pd.Index([f"J{number:06d}" for number in range(n_jobs)], dtype="str"),
+        job_department=job_department,
+        job_category=job_category,
+        job_client=job_client,
+        job_status=job_status,
+        job_start=job_start,
+        job_end=job_end,
+        job_due_date=job_due_date,
+        job_completed_date=job_completed_date,
+        job_weight=job_weight,
+        job_rate=job_rate,
+        job_task_offset=job_task_offset,
+        quoted_hours=quoted_hours,
+        quoted_amount=quoted_amount,
+        client_names=pd.Index([f"Client {number:04d}" for number in range(n_clients)], dtype="str"),
+        category_names=pd.Index([*CATEGORIES, LEAVE_CATEGORY], dtype="str"),
+        staff_names=pd.Index([f"Staff {number:05d}" for number in range(n_staff)], dtype="str"),
+        staff_department=staff_department,
+        staff_order=staff_order,
+        staff_offsets=staff_offsets,
+        staff_role=staff_role,
+        staff_function=rng.choice(len(FUNCTIONS), n_staff, p=_zipf(len(FUNCTIONS), 0.7)),
+        staff_state=rng.choice(len(STATES), n_staff, p=_zipf(len(STATES), 1.0)),
+        staff_unit=rng.choice(len(BUSINESS_UNITS), n_staff, p=[0.6, 0.25, 0.15]),
+        staff_onshore=rng.random(n_staff) < 0.85,
+        staff_fte=rng.choice([1.0, 0.8, 0.6], n_staff, p=[0.8, 0.12, 0.08]),
+    )
+
+
+def _month_timesheet(world: SyntheticWorld, month: int) -> pd.DataFrame:
+    # One month of timesheet rows; seeded per month, so the output does not depend on how the
+    # months are chunked.
+    rng = np.random.default_rng([world.seed, 1, month])
+    n = int(world.month_rows[month])
+    n_jobs, n_tasks = len(world.job_names), len(TASKS)
+    month_ord = world.first_ord + month
+
+    active = np.flatnonzero((world.job_start <= month) & (world.job_end >= month))
+    weights = world.job_weight[active]
+    job = active[rng.choice(len(active), n, p=weights / weights.sum())]
+    task = (world.job_task_offset[job] + np.minimum(rng.zipf(1.4, n) - 1, n_tasks - 1)) % n_tasks
+    department = world.job_department[job]
+
+    # Staff mostly work in their own department, the busiest ones far more than the rest.
+    counts = np.diff(world.staff_offsets)[department]
+    own = (rng.random(n) < 0.85) & (counts > 0)
+    pick = world.staff_offsets[department] + np.floor(rng.random(n) ** 2 * np.maximum(counts, 1)).astype(np.int64)
+    staff = np.where(own, world.staff_order[np.minimum(pick, len(world.staff_order) - 1)], rng.integers(0, len(world.staff_names), n))
+
+    leave = rng.random(n) < LEAVE_SHARE
+    department = np.where(leave, world.staff_department[staff], department)
+    hours = np.maximum(np.round(rng.gamma(1.6, 2.2, n) * 4) / 4, 0.25)
+    hours[rng.random(n) < 0.01] = 0.0
+    hours[leave] = 7.6
+    billable = ~leave & ~np.isin(task, [TASKS.index(name) for name in NON_BILLABLE_TASKS])
+    cost = np.round(hours * ROLE_COST[world.staff_role[staff]] * rng.uniform(0.9, 1.1, n), 2)
+    revenue = np.where(billable, np.round(hours * world.job_rate[job] * rng.lognormal(0, 0.15, n), 2), 0.0)
+    quoted_hours = np.where(leave, np.nan, world.quoted_hours[job, task])
+    quoted_amount = np.where(leave, np.nan, world.quoted_amount[job, task])
+
+    breakdown = np.where(billable, 0, np.where(leave, 4, np.searchsorted([0.5, 0.8], rng.random(n), side="right") + 1))
+    task_names = pd.Index([*TASKS, *LEAVE_TASKS], dtype="str")
+    task_codes = np.where(leave, n_tasks + rng.choice(len(LEAVE_TASKS), n, p=[0.7, 0.2, 0.1]), task)
+    year, month_of_year = divmod(month_ord, 12)
+    days = pd.Timestamp(year=year, month=month_of_year + 1, day=1).days_in_month
+    dates = pd.Timestamp(year=year, month=month_of_year + 1, day=1) + pd.to_timedelta(rng.integers(0, days, n), unit="D")
+    job_codes = np.where(leave, n_jobs, job)
+    status = world.job_status[job]
+
+    df = pd.DataFrame({
+        "job_no": _categorical(job_codes, [*world.job_names, LEAVE_JOB]),
+        "department_final": _categorical(department, DEPARTMENTS),
+        "job_category": _categorical(np.where(leave, len(CATEGORIES), world.job_category[job]), world.category_names),
+        "task_name": _categorical(task_codes, task_names),
+        "staff_name": _categorical(staff, world.staff_names),
+        "month_key": month_ord_to_label(month_ord),
+        "date": dates.sort_values(),
+        "hours_raw": hours,
+        "base_cost": cost,
+        "rev_alloc": revenue,
+        "quoted_time_total": quoted_hours,
+        "quoted_amount_total": quoted_amount,
+        "quote_match_flag": _categorical(np.isnan(quoted_hours).astype(np.int8), QUOTE_FLAGS),
+        "is_billable": billable,
+        "utilisation_target": ROLE_TARGET[world.staff_role[staff]],
+        "fte_hours_scaling": world.staff_fte[staff],
+        "breakdown": _categorical(breakdown, BREAKDOWNS),
+        "job_status": _categorical(np.where(leave, 0, status), JOB_STATUSES),
+        "job_due_date": np.where(leave, np.datetime64("NaT"), world.job_due_date[job]),
+        "job_completed_date": np.where(leave, np.datetime64("NaT"), world.job_completed_date[job]),
+        "client": _categorical(np.where(leave, -1, world.job_client[job]), world.client_names),
+        "business_unit": _categorical(world.staff_unit[staff], BUSINESS_UNITS),
+        "role": _categorical(world.staff_role[staff], ROLES),
+        "function": _categorical(world.staff_function[staff], FUNCTIONS),
+        "onshore_flag": _categorical(np.where(world.staff_onshore[staff], 0, 1), ("Onshore", "Offshore")),
+        "state": _categorical(world.staff_state[staff], STATES),
+    })
+    return df
+
+
+def iter_synthetic_timesheet(world: SyntheticWorld) -> Iterator[pd.DataFrame]:
+    for month in range(world.months):
+        yield _month_timesheet(world, month)
+
+
+def synthetic_timesheet(rows: int, seed: int = 0, months: int = 36, end_month: str = "2025-06") -> pd.DataFrame:
+    world = synthetic_world(rows, seed, months, end_month)
+    return pd.concat(list(iter_synthetic_timesheet(world)), ignore_index=True)
+
+
+JOB_TASK_MONTH_KEYS = ["job_no", "task_name", "month_key", "department_final", "job_category"]
+JOB_TASK_MONTH_MEASURES = [
+    Sum("hours_raw_sum", "hours_raw"),
+    Sum("base_cost_sum", "base_cost"),
+    Sum("rev_alloc_sum", "rev_alloc"),
+    First("quoted_time_total", "quoted_time_total"),
+    First("quoted_amount_total", "quoted_amount_total"),
+    First("quote_match_flag", "quote_match_flag"),
+]
+
+
+def synthetic_job_task_month(timesheet: pd.DataFrame) -> pd.DataFrame:
+    # fact_job_task_month rolled up from (a month chunk of) the synthetic timesheet.
+    return aggregate(timesheet, JOB_TASK_MONTH_KEYS, JOB_TASK_MONTH_MEASURES)
+
+
+def synthetic_audit_tables(timesheet: pd.DataFrame, seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # (audit_revenue_reconciliation_job_month, audit_unallocated_revenue): about 3% of job-months
+    # have a revenue pool that differs from the allocated revenue.
+    revenue = aggregate(timesheet, ["job_no", "month_key"], [Sum("rev_alloc_total", "rev_alloc")])
+    rng = np.random.default_rng([seed, 2, len(revenue)])
+    off = rng.random(len(revenue)) < 0.03
+    allocated = revenue["rev_alloc_total"].to_numpy(dtype=np.float64)
+    revenue["revenue_pool_total"] = np.round(np.where(off, allocated * rng.uniform(1.0, 1.1, len(revenue)), allocated), 2)
+    revenue["diff"] = revenue["revenue_pool_total"] - revenue["rev_alloc_total"]
+    unallocated = aggregate(revenue, ["month_key"], [Sum("unallocated_revenue", "diff")])
+    return revenue, unallocated
+
+
+SYNTHETIC_TABLES = (
+    "fact_timesheet_day_enriched",
+    "fact_job_task_month",
+    "audit_revenue_reconciliation_job_month",
+    "audit_unallocated_revenue",
+)
+
+
+def _plain(df: pd.DataFrame) -> pa.Table:
+    # Categories differ per month chunk, so the files hold plain strings (dictionary-encoded by parquet).
+    df = df.copy()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("str")
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_synthetic_tables(
+    processed_dir: Path, rows: int, seed: int = 0, months: int = 36, end_month: str = "2025-06"
+) -> dict[str, Path]:
+    # Streams the tables month by month into parquet files under processed_dir, so memory stays
+    # at one month of rows whatever the total size.
+    processed_dir = Path(processed_dir)
+    processed_dir.mkdir(parents=True, exist_ok=True)
+    world = synthetic_world(rows, seed, months, end_month)
+    paths = {name: processed_dir / f"{name}.parquet" for name in SYNTHETIC_TABLES}
+    writers: dict[str, pq.ParquetWriter] = {}
+    try:
+        for month, timesheet in enumerate(iter_synthetic_timesheet(world)):
+            revenue, unallocated = synthetic_audit_tables(timesheet, seed)
+            chunks = dict(zip(SYNTHETIC_TABLES, (timesheet, synthetic_job_task_month(timesheet), revenue, unallocated)))
+            for name, chunk in chunks.items():
+                table = _plain(chunk)
+                if name not in writers:
+                    writers[name] = pq.ParquetWriter(paths[name], table.schema)
+                writers[name].write_table(table.cast(writers[name].schema))
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return paths
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Iterable
+
+import pandas as pd
+
+from src.config import load_config
+
+# Opt-in spans over the hot paths (table loads, filtered frames, packs, mart builders and page
+# sections), kept in a process-wide ring buffer. Disabled, a wrapped call costs one global
+# check. INSTRUMENTATION=memory also records the tracemalloc peak of each span, which slows
+# every allocation down and is shared by concurrent sessions.
+
+
+@dataclass(frozen=True)
+class Span:
+    name: str
+    kind: str
+    started_at: float
+    seconds: float
+    rows_in: int | None
+    rows_out: int | None
+    bytes_out: int | None
+    alloc_bytes: int | None
+    cache: str | None
+    error: str | None
+    depth: int
+    thread: int
+
+
+_ENABLED = False
+_MEMORY = False
+_STARTED_TRACEMALLOC = False
+_BUFFER: deque[Span] = deque(maxlen=5000)
+_LOCAL = threading.local()
+
+
+def configure(mode: str, buffer_size: int | None = None) -> None:
+    global _ENABLED, _MEMORY, _STARTED_TRACEMALLOC, _BUFFER
+    _ENABLED = mode in {"timing", "memory"}
+    _MEMORY = mode == "memory"
+    if _MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _STARTED_TRACEMALLOC = True
+    elif not _MEMORY and _STARTED_TRACEMALLOC:
+        tracemalloc.stop()
+        _STARTED_TRACEMALLOC = False
+    if buffer_size is not None and buffer_size != _BUFFER.maxlen:
+        _BUFFER = deque(_BUFFER, maxlen=buffer_size)
+
+
+def mode() -> str:
+    return "memory" if _MEMORY else "timing" if _ENABLED else "off"
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+def _stack() -> list[_OpenSpan]:
+    stack = getattr(_LOCAL, "stack", None)
+    if stack is None:
+        stack = _LOCAL.stack = []
+    return stack
+
+
+def _frame_size(value: Any) -> tuple[int | None, int | None]:
+    # (rows, shallow bytes) of a frame or a dict of frames.
+    if isinstance(value, pd.DataFrame):
+        return len(value), int(value.memory_usage(index=False, deep=False).sum())
+    if isinstance(value, dict) and value and all(isinstance(item, pd.DataFrame) for item in value.values()):
+        sizes = [_frame_size(item) for item in value.values()]
+        return sum(rows for rows, _ in sizes), sum(nbytes for _, nbytes in sizes)
+    return None, None
+
+
+class _OpenSpan:
+    __slots__ = ("name", "kind", "rows_in", "rows_out", "bytes_out", "cache", "depth", "wall", "start", "base", "peak")
+
+    def __init__(self, name: str, kind: str, rows_in: int | None = None) -> None:
+        self.name, self.kind, self.rows_in = name, kind, rows_in
+        self.rows_out = self.bytes_out = self.cache = self.base = None
+        self.peak = 0
+
+    def output(self, value: Any) -> None:
+        self.rows_out, self.bytes_out = _frame_size(value)
+
+    def __enter__(self) -> _OpenSpan:
+        stack = _stack()
+        self.depth = len(stack)
+        if _MEMORY and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # reset_peak() is global: fold the running peak into the enclosing span first.
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.base = self.peak = current
+        stack.append(self)
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        seconds = time.perf_counter() - self.start
+        stack = _stack()
+        stack.pop()
+        alloc = None
+        if self.base is not None and tracemalloc.is_tracing():
+            peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            alloc = peak - self.base
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+        _BUFFER.append(Span(
+            name=self.name,
+            kind=self.kind,
+            started_at=self.wall,
+            seconds=seconds,
+            rows_in=self.rows_in,
+            rows_out=self.rows_out,
+            bytes_out=self.bytes_out,
+            alloc_bytes=alloc,
+            cache=self.cache,
+            error=None if exc_type is None else exc_type.__name__,
+            depth=self.depth,
+            thread=threading.get_ident(),
+        ))
+        return False
+
+
+class _NullSpan:
+    cache = None
+
+    def output(self, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> _NullSpan:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, kind: str = "page", rows_in: int | None = None) -> _OpenSpan | _NullSpan:
+    # `with span("KPIs"):` around a page section; call .output(frame) to record its result.
+    return _OpenSpan(name, kind, rows_in) if _ENABLED else _NULL_SPAN
+
+
+def instrument(
+    kind: str, name: str | None = None, cached: bool = False, detail: Callable[..., str] | None = None
+) -> Callable:
+    # Records each call as a span: rows of the first frame argument in, rows and bytes of the
+    # returned frame(s) out. detail(*args, **kwargs) is appended to the span name (e.g. the
+    # table loaded). With cached=True a call whose body did not mark_cache("miss") is counted
+    # as a cache hit.
+    def decorate(fn: Callable) -> Callable:
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return fn(*args, **kwargs)
+            rows_in = next((len(arg) for arg in args if isinstance(arg, pd.DataFrame)), None)
+            full_name = label if detail is None else f"{label}:{detail(*args, **kwargs)}"
+            with _OpenSpan(full_name, kind, rows_in) as current:
+                result = fn(*args, **kwargs)
+                current.output(result)
+                if cached and current.cache is None:
+                    current.cache = "hit"
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def mark_cache(status: str) -> None:
+    # Sets the cache outcome ("hit" / "miss") of the innermost open span on this thread.
+    if _ENABLED:
+        stack = _stack()
+        if stack:
+            stack[-1].cache = status
+
+
+def spans() -> list[Span]:
+    return list(_BUFFER)
+
+
+def clear() -> None:
+    _BUFFER.clear()
+
+
+def spans_frame(items: Iterable[Span] | None = None) -> pd.DataFrame:
+    items = spans() if items is None else list(items)
+    columns = list(Span.__dataclass_fields__)
+    return pd.DataFrame([asdict(item) for item in items], columns=columns)
+
+
+def span_summary(frame: pd.DataFrame) -> pd.DataFrame:
+    # Calls, total / mean / max seconds, rows and cache hit rate per (kind, name), slowest first.
+    if frame.empty:
+        return pd.DataFrame(columns=["kind", "name", "calls", "total_seconds", "mean_seconds", "max_seconds"])
+    frame = frame.assign(
+        hit=(frame["cache"] == "hit").astype(float).where(frame["cache"].notna())
+    )
+    summary = frame.groupby(["kind", "name"], sort=False).agg(
+        calls=("seconds", "size"),
+        total_seconds=("seconds", "sum"),
+        mean_seconds=("seconds", "mean"),
+        max_seconds=("seconds", "max"),
+        rows_in=("rows_in", lambda values: values.sum(min_count=1)),
+        rows_out=("rows_out", lambda values: values.sum(min_count=1)),
+        max_alloc_bytes=("alloc_bytes", "max"),
+        cache_hit_rate=("hit", "mean"),
+    )
+    return summary.sort_values("total_seconds", ascending=False).reset_index()
+
+
+def to_jsonl(items: Iterable[Span]) -> str:
+    return "".join(json.dumps(asdict(item)) + "\n" for item in items)
+
+
+def to_chrome_trace(items: Iterable[Span]) -> str:
+    # Complete ("X") events for chrome://tracing or Perfetto.
+    pid = os.getpid()
+    events = [
+        {
+            "name": item.name,
+            "cat": item.kind,
+            "ph": "X",
+            "ts": item.started_at * 1e6,
+            "dur": item.seconds * 1e6,
+            "pid": pid,
+            "tid": item.thread,
+            "args": {
+                key: value for key, value in asdict(item).items()
+                if key in {"rows_in", "rows_out", "bytes_out", "alloc_bytes", "cache", "error"} and value is not None
+            },
+        }
+        for item in items
+    ]
+    return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+
+
+_config = load_config()
+configure(_config.instrumentation, _config.instrumentation_buffer)
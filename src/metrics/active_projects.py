@@ -2,34 +2,56 @@ from __future__ import annotations
 
 import pandas as pd
 
+from src.data.aggregate import Difference, First, Min, Ratio, Sum, aggregate
 from src.data.job_lifecycle import active_jobs
-from src.data.semantic import safe_quote_rollup, rate_rollups, scope_creep
-
-
-def active_projects_pack(df: pd.DataFrame, recency_days: int) -> pd.DataFrame:
+from src.data.semantic import DEDUP_KEYS, QUOTE_MEASURES, scope_creep
+from src.instrumentation import instrument
+
+ACTIVE_PROJECTS_COLUMNS = [
+    "job_no",
+    "task_name",
+    "department_final",
+    "job_category",
+    "month_key",
+    "hours_raw",
+    "rev_alloc",
+    "quoted_time_total",
+    "quoted_amount_total",
+    "quote_match_flag",
+    "job_status",
+    "job_due_date",
+    "job_completed_date",
+    "client",
+    "date",
+    "work_date",
+]
+
+
+@instrument("pack")
+def active_projects_pack(
+    df: pd.DataFrame, recency_days: int, quote_dim: pd.DataFrame | None = None
+) -> pd.DataFrame:
     active_df = active_jobs(df, recency_days)
     group_keys = ["job_no", "department_final", "job_category"]
-    quote = safe_quote_rollup(active_df, group_keys)
-    actual = active_df.groupby(group_keys, dropna=False).agg(
-        actual_hours=("hours_raw", "sum"),
-        revenue=("rev_alloc", "sum"),
-    )
-    creep_hours = active_df.loc[scope_creep(active_df)].groupby(group_keys, dropna=False)["hours_raw"].sum()
-
-    merged = actual.join(quote.set_index(group_keys), how="left")
-    merged["quote_consumed_pct"] = merged["actual_hours"] / merged["quoted_hours"].replace({0: pd.NA})
-    merged["scope_creep_hours"] = creep_hours
-    merged["scope_creep_share"] = merged["scope_creep_hours"] / merged["actual_hours"].replace({0: pd.NA})
-
-    rates = rate_rollups(active_df, group_keys)
-    merged = merged.reset_index().merge(rates, on=group_keys, how="left")
-    merged["rate_variance"] = merged["realised_rate"] - merged["quote_rate"]
-
+    if quote_dim is not None:
+        # active_df keeps only the recent rows of each job-task: attribute its quote to the first
+        # recent row, as the in-frame dedup does, not to the job-task's first row overall.
+        first = active_df.drop_duplicates(DEDUP_KEYS)[list(dict.fromkeys([*DEDUP_KEYS, *group_keys]))]
+        quotes = quote_dim.drop(columns=[col for col in group_keys if col not in DEDUP_KEYS])
+        quote_dim = first.merge(quotes, on=list(DEDUP_KEYS), how="left")
+    measures = [
+        Sum("actual_hours", "hours_raw"),
+        Sum("revenue", "rev_alloc"),
+        *QUOTE_MEASURES,
+        Ratio("quote_consumed_pct", "actual_hours", "quoted_hours"),
+        Sum("scope_creep_hours", "hours_raw", where=scope_creep, min_count=1),
+        Ratio("scope_creep_share", "scope_creep_hours", "actual_hours"),
+        Ratio("realised_rate", "revenue", "actual_hours"),
+        Ratio("quote_rate", "quoted_amount", "quoted_hours"),
+        Difference("rate_variance", "realised_rate", "quote_rate"),
+    ]
     if "job_due_date" in active_df.columns:
-        due_dates = active_df.groupby(group_keys, dropna=False)["job_due_date"].min().reset_index()
-        merged = merged.merge(due_dates, on=group_keys, how="left")
+        measures.append(Min("job_due_date", "job_due_date"))
     if "client" in active_df.columns:
-        clients = active_df.groupby(group_keys, dropna=False)["client"].first().reset_index()
-        merged = merged.merge(clients, on=group_keys, how="left")
-
-    return merged
+        measures.append(First("client", "client"))
+    return aggregate(active_df, group_keys, measures, dedup_rows=quote_dim)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from src.data.aggregate import CountDistinct, WeightedQuantile, aggregate
+from src.data.cohorts import recency_weights
+from src.data.semantic import month_key_to_ord
+
+BENCHMARK_KEYS = ["company", "department_final", "job_category", "task_name"]
+BENCHMARK_QUANTILES = {"p25": 0.25, "p50": 0.5, "p75": 0.75, "p90": 0.9}
+# benchmark name -> dim_job_task_quote column
+BENCHMARK_VALUES = {
+    "actual_hours": "actual_hours",
+    "quoted_hours": "quoted_time_total",
+    "quoted_amount": "quoted_amount_total",
+}
+WEIGHTINGS = ("recency", "uniform")
+
+
+def task_quantile_benchmarks(
+    quote_dim: pd.DataFrame, half_life_months: int, group_keys: list[str] | None = None
+) -> pd.DataFrame:
+    # Quantiles of job-task actual and quoted hours/amounts per task, one row per weighting:
+    # "recency" weights each job-task by its last active month, "uniform" counts them equally.
+    group_keys = group_keys or BENCHMARK_KEYS
+    dim = quote_dim.assign(
+        recency_weight=recency_weights(month_key_to_ord(quote_dim["last_month_key"]), half_life_months)
+    )
+    # One scan for both weightings: the per-column sorts and the job counts are shared.
+    weights = {"recency": "recency_weight", "uniform": None}
+    measures = [CountDistinct("job_count", "job_no")] + [
+        WeightedQuantile(f"{weighting}:{name}_{label}", column, q, weights[weighting])
+        for weighting in WEIGHTINGS
+        for name, column in BENCHMARK_VALUES.items()
+        for label, q in BENCHMARK_QUANTILES.items()
+    ]
+    result = aggregate(dim, group_keys, measures)
+    frames = []
+    for weighting in WEIGHTINGS:
+        prefix = f"{weighting}:"
+        columns = {c: c[len(prefix):] for c in result.columns if c.startswith(prefix)}
+        frame = result[group_keys + ["job_count"] + list(columns)].rename(columns=columns)
+        frame.insert(len(group_keys), "weighting", weighting)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
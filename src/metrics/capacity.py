@@ -1,37 +1,39 @@
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 
-from src.data.semantic import leave_exclusion_mask, month_key_to_period
+from src.data.aggregate import Mean, Sum, aggregate
+from src.data.semantic import get_month_ord, latest_month_ord, leave_exclusion_mask
+from src.instrumentation import instrument
 
+CAPACITY_COLUMNS = [
+    "staff_name",
+    "task_name",
+    "month_key",
+    "is_billable",
+    "hours_raw",
+    "utilisation_target",
+    "fte_hours_scaling",
+]
 
+
+@instrument("pack")
 def capacity_pack(df: pd.DataFrame, group_keys: list[str], weeks_in_window: int) -> pd.DataFrame:
-    df = df.copy()
     df = df.loc[~leave_exclusion_mask(df)]
 
-    staff = df.groupby(group_keys, dropna=False).agg(
-        utilisation_target=("utilisation_target", "mean"),
-        fte_hours_scaling=("fte_hours_scaling", "mean"),
-    )
-    staff["weekly_capacity"] = 38 * staff["fte_hours_scaling"]
-    staff["period_capacity"] = staff["weekly_capacity"] * weeks_in_window
-    staff["billable_capacity"] = staff["period_capacity"] * staff["utilisation_target"]
-
-    periods = month_key_to_period(df["month_key"])
-    df["month_period"] = periods
-    latest = periods.max()
-    if latest is pd.NaT:
-        trailing = df.iloc[0:0]
-    else:
-        cutoff = latest - 1
-        trailing = df.loc[periods >= cutoff]
-
-    trailing_billable = trailing.loc[trailing["is_billable"]].groupby(group_keys, dropna=False)["hours_raw"].sum()
-    trailing_total = trailing.groupby(group_keys, dropna=False)["hours_raw"].sum()
-
-    staff["trailing_billable_load"] = trailing_billable
-    staff["trailing_total_load"] = trailing_total
-    staff = staff.fillna({"trailing_billable_load": 0, "trailing_total_load": 0})
+    ords = get_month_ord(df)
+    latest = latest_month_ord(ords)
+    trailing = (ords >= latest - 1).to_numpy() if latest is not None else np.zeros(len(df), dtype=bool)
+
+    staff = aggregate(df, group_keys, [
+        Mean("utilisation_target", "utilisation_target"),
+        Mean("fte_hours_scaling", "fte_hours_scaling"),
+        Sum("trailing_billable_load", "hours_raw", where=("is_billable", lambda _: trailing)),
+        Sum("trailing_total_load", "hours_raw", where=lambda _: trailing),
+    ])
+    staff.insert(len(group_keys) + 2, "weekly_capacity", 38 * staff["fte_hours_scaling"])
+    staff.insert(len(group_keys) + 3, "period_capacity", staff["weekly_capacity"] * weeks_in_window)
+    staff.insert(len(group_keys) + 4, "billable_capacity", staff["period_capacity"] * staff["utilisation_target"])
     staff["headroom"] = staff["billable_capacity"] - staff["trailing_billable_load"]
-
-    return staff.reset_index()
+    return staff
@@ -3,46 +3,71 @@ from __future__ import annotations
 import pandas as pd
 
 from src.data.job_lifecycle import first_activity_month, first_revenue_month
-from src.data.semantic import month_key_to_period, safe_quote_job_task
+from src.data.aggregate import CountDistinct, Sum, aggregate
+from src.data.semantic import QUOTE_MEASURES
+from src.instrumentation import instrument
 
 
-def _job_level_quotes(df: pd.DataFrame) -> pd.DataFrame:
-    job_task = safe_quote_job_task(df)
-    job_quote = job_task.groupby("job_no", dropna=False).agg(
-        quoted_hours=("quoted_time_total", "sum"),
-        quoted_amount=("quoted_amount_total", "sum"),
-    )
-    return job_quote.reset_index()
+def _job_level_quotes(df: pd.DataFrame, quote_dim: pd.DataFrame | None = None) -> pd.DataFrame:
+    return aggregate(df, ["job_no"], QUOTE_MEASURES, dedup_rows=quote_dim)
 
 
-def job_mix_pack(df: pd.DataFrame, capacity_df: pd.DataFrame, weeks_in_window: int, util_target: float) -> pd.DataFrame:
-    df = df.copy()
-    periods = month_key_to_period(df["month_key"])
-    df["month_period"] = periods
-
-    job_quote = _job_level_quotes(df)
+def job_level_quotes(df: pd.DataFrame, quote_dim: pd.DataFrame | None = None) -> pd.DataFrame:
+    job_quote = _job_level_quotes(df, quote_dim)
     job_quote = job_quote.merge(first_activity_month(df), on="job_no", how="left", suffixes=("", "_activity"))
-    job_quote = job_quote.merge(first_revenue_month(df), on="job_no", how="left", suffixes=("", "_revenue"))
-
-    df_month = df.groupby(["month_key", "department_final", "job_category"], dropna=False).agg(
-        job_count=("job_no", "nunique"),
-    )
-    quotes_month = df.groupby(["month_key", "department_final", "job_category"], dropna=False).apply(
-        lambda g: pd.Series({
-            "total_quoted_amount": job_quote.loc[job_quote["job_no"].isin(g["job_no"].unique()), "quoted_amount"].sum(),
-            "total_quoted_hours": job_quote.loc[job_quote["job_no"].isin(g["job_no"].unique()), "quoted_hours"].sum(),
-        })
-    )
-    mix = df_month.join(quotes_month)
+    return job_quote.merge(first_revenue_month(df), on="job_no", how="left", suffixes=("", "_revenue"))
+
+
+# Quoted demand per (month, department, category) of job_mix_demand.
+MIX_KEYS = ["month_key", "department_final", "job_category"]
+
+
+def job_mix_bridge(df: pd.DataFrame, job_quote: pd.DataFrame) -> pd.DataFrame:
+    # Distinct (month, department, category, job) bridge joined once to the job-level quotes:
+    # each job's quote counts once in every group it appears in.
+    bridge = df[MIX_KEYS + ["job_no"]].drop_duplicates()
+    return bridge.merge(job_quote[["job_no", "quoted_amount", "quoted_hours"]], on="job_no", how="left")
+
+
+def job_mix_demand(
+    df: pd.DataFrame,
+    weeks_in_window: int,
+    util_target: float,
+    job_quote: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    # The job mix without the capacity columns; each month depends only on its own rows and
+    # the quotes of the jobs in it, so the job_mix_month mart stores this.
+    if job_quote is None:
+        job_quote = job_level_quotes(df)
+    mix = aggregate(job_mix_bridge(df, job_quote), MIX_KEYS, [
+        CountDistinct("job_count", "job_no"),
+        Sum("total_quoted_amount", "quoted_amount"),
+        Sum("total_quoted_hours", "quoted_hours"),
+    ]).set_index(MIX_KEYS)
 
     mix["avg_quoted_amount_per_job"] = mix["total_quoted_amount"] / mix["job_count"].replace({0: pd.NA})
     mix["avg_quoted_hours_per_job"] = mix["total_quoted_hours"] / mix["job_count"].replace({0: pd.NA})
     mix["value_per_quoted_hour"] = mix["total_quoted_amount"] / mix["total_quoted_hours"].replace({0: pd.NA})
+    mix["implied_fte_required"] = mix["total_quoted_hours"] / (38 * weeks_in_window * util_target)
+    return mix.reset_index()
+
 
-    demand_hours = mix["total_quoted_hours"]
+def implied_capacity(mix: pd.DataFrame, capacity_df: pd.DataFrame) -> pd.DataFrame:
+    # Quoted demand against the total billable capacity of capacity_df (a capacity_pack).
     capacity_supply = capacity_df["billable_capacity"].sum() if "billable_capacity" in capacity_df.columns else 0
-    mix["implied_fte_required"] = demand_hours / (38 * weeks_in_window * util_target)
-    mix["implied_utilisation"] = demand_hours / capacity_supply if capacity_supply else pd.NA
+    mix = mix.copy()
+    mix["implied_utilisation"] = mix["total_quoted_hours"] / capacity_supply if capacity_supply else pd.NA
     mix["implied_slack"] = 1 - mix["implied_utilisation"]
+    return mix
 
-    return mix.reset_index()
+
+@instrument("pack")
+def job_mix_pack(
+    df: pd.DataFrame,
+    capacity_df: pd.DataFrame,
+    weeks_in_window: int,
+    util_target: float,
+    job_quote: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    # job_quote lets incremental builds pass job-level quotes computed over the full history.
+    return implied_capacity(job_mix_demand(df, weeks_in_window, util_target, job_quote), capacity_df)
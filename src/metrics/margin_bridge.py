@@ -1,48 +1,85 @@
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 
-from src.data.semantic import safe_quote_rollup
-
-
-def margin_bridge_pack(df: pd.DataFrame, group_keys: list[str]) -> pd.DataFrame:
-    quote = safe_quote_rollup(df, group_keys)
-    actual = df.groupby(group_keys, dropna=False).agg(
-        actual_revenue=("rev_alloc", "sum"),
-        actual_cost=("base_cost", "sum"),
-        hours=("hours_raw", "sum"),
-        billable_hours=("hours_raw", lambda s: s[df.loc[s.index, "is_billable"]].sum()),
-    )
-    actual["actual_margin"] = actual["actual_revenue"] - actual["actual_cost"]
-
-    df = df.copy()
-    df["cost_per_hour"] = df["base_cost"] / df["hours_raw"].replace({0: pd.NA})
-    expected_cost_rate = df.groupby(group_keys, dropna=False)["cost_per_hour"].median()
-    expected = quote.set_index(group_keys)
-    expected_cost = expected["quoted_hours"] * expected_cost_rate
-    expected_margin = expected["quoted_amount"] - expected_cost
-
-    bridge = actual.copy()
-    bridge = bridge.join(expected_cost_rate.rename("expected_cost_rate"), how="left")
-    bridge = bridge.join(expected_cost.rename("expected_cost"), how="left")
-    bridge = bridge.join(expected_margin.rename("expected_margin"), how="left")
-
-    bridge["hours_variance_effect"] = (
-        (bridge["hours"] - expected["quoted_hours"]) * bridge["expected_cost_rate"]
-    )
-    bridge["rate_variance_effect"] = bridge["actual_revenue"] - expected["quoted_amount"]
-    bridge["cost_variance_effect"] = bridge["actual_cost"] - bridge["expected_cost"]
+from src.data.aggregate import Difference, Median, Sum, aggregate
+from src.data.semantic import QUOTE_MEASURES, ensure_company, restrict_quote_dim
+from src.instrumentation import instrument
+
+EFFECT_COLUMNS = [
+    "hours_variance_effect",
+    "rate_variance_effect",
+    "cost_variance_effect",
+    "non_billable_leakage_effect",
+]
+# The grain of the cube_margin_bridge mart; coarser bridges are sums of it (see summarise_bridge).
+BRIDGE_KEYS = ["company", "department_final", "job_category", "month_key"]
+ADDITIVE_COLUMNS = [
+    "actual_revenue",
+    "actual_cost",
+    "hours",
+    "billable_hours",
+    "actual_margin",
+    "expected_cost",
+    "expected_margin",
+    *EFFECT_COLUMNS,
+    "total_variance",
+]
+
+
+def _divide(numerator: pd.Series, denominator: pd.Series) -> pd.Series:
+    return numerator / denominator.where(denominator != 0)
+
+
+@instrument("pack")
+def margin_bridge_pack(
+    df: pd.DataFrame, group_keys: list[str], quote_df: pd.DataFrame | None = None
+) -> pd.DataFrame:
+    # quote_df: job-task quote rows deduplicated over a wider frame than df (see aggregate()).
+    hours = df["hours_raw"].to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cost_per_hour = np.where(hours != 0, df["base_cost"].to_numpy(dtype=np.float64, na_value=np.nan) / hours, np.nan)
+    bridge = aggregate(df.assign(cost_per_hour=cost_per_hour), group_keys, [
+        Sum("actual_revenue", "rev_alloc"),
+        Sum("actual_cost", "base_cost"),
+        Sum("hours", "hours_raw"),
+        Sum("billable_hours", "hours_raw", where="is_billable"),
+        Difference("actual_margin", "actual_revenue", "actual_cost"),
+        *QUOTE_MEASURES,
+        Median("expected_cost_rate", "cost_per_hour"),
+    ], dedup_rows=quote_df)
+    quoted_hours = bridge.pop("quoted_hours")
+    quoted_amount = bridge.pop("quoted_amount")
 
-    billable_share = bridge["billable_hours"] / bridge["hours"].replace({0: pd.NA})
+    bridge["expected_cost"] = quoted_hours * bridge["expected_cost_rate"]
+    bridge["expected_margin"] = quoted_amount - bridge["expected_cost"]
+    bridge["hours_variance_effect"] = (bridge["hours"] - quoted_hours) * bridge["expected_cost_rate"]
+    bridge["rate_variance_effect"] = bridge["actual_revenue"] - quoted_amount
+    bridge["cost_variance_effect"] = bridge["actual_cost"] - bridge["expected_cost"]
+    billable_share = _divide(bridge["billable_hours"], bridge["hours"])
     bridge["non_billable_leakage_effect"] = (1 - billable_share.fillna(0)) * bridge["actual_cost"]
 
     bridge["total_variance"] = bridge["actual_margin"] - bridge["expected_margin"]
-    for col in [
-        "hours_variance_effect",
-        "rate_variance_effect",
-        "cost_variance_effect",
-        "non_billable_leakage_effect",
-    ]:
-        bridge[f"{col}_pct"] = bridge[col] / bridge["total_variance"].replace({0: pd.NA})
-
-    return bridge.reset_index()
+    for col in EFFECT_COLUMNS:
+        bridge[f"{col}_pct"] = _divide(bridge[col], bridge["total_variance"])
+    return bridge
+
+
+def monthly_bridge(df: pd.DataFrame, quote_dim: pd.DataFrame | None = None) -> pd.DataFrame:
+    # The bridge at the cube_margin_bridge grain, so the mart and a filtered fact table give the
+    # same numbers: the median cost rate is taken per category and month, and each quote of a
+    # job-task in df counts in the job-task's first month (as dim_job_task_quote records it).
+    quote_df = None if quote_dim is None else restrict_quote_dim(quote_dim, df)
+    return margin_bridge_pack(ensure_company(df), BRIDGE_KEYS, quote_df)
+
+
+def summarise_bridge(bridge: pd.DataFrame, group_keys: list[str]) -> pd.DataFrame:
+    # Roll a monthly bridge (cube_margin_bridge or monthly_bridge) up to group_keys by summing
+    # ADDITIVE_COLUMNS; a column stays NaN for groups where it is NaN in every row (e.g. the
+    # expected cost of groups without quotes).
+    additive = [col for col in ADDITIVE_COLUMNS if col in bridge.columns]
+    summary = bridge.groupby(group_keys, dropna=False, observed=True)[additive].sum(min_count=1).reset_index()
+    for col in EFFECT_COLUMNS:
+        summary[f"{col}_pct"] = _divide(summary[col], summary["total_variance"])
+    return summary
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from src.data.aggregate import (
+    DEDUP_KEYS,
+    CountDistinct,
+    DedupSum,
+    Max,
+    Min,
+    OverrunRate,
+    Ratio,
+    Sum,
+    aggregate,
+    isin_keys,
+)
+from src.data.semantic import build_quote_dim, get_month_ord, month_ord_to_label
+from src.metrics.benchmarks import BENCHMARK_KEYS, task_quantile_benchmarks
+
+SCOPE_KEYS = ["department_final", "job_category"]
+BENCHMARK_WINDOWS = (3, 6, 12, 24)
+# Columns that key one Quote Builder selection in the quote_builder_scope mart.
+STORE_KEYS = SCOPE_KEYS + ["window", "recency_weighted", "active_only"]
+
+SCOPE_MEASURES = [
+    Sum("hours", "hours_raw"),
+    Sum("cost", "base_cost"),
+    Sum("revenue", "rev_alloc"),
+    Ratio("cost_rate", "cost", "hours"),
+    Ratio("realised_rate", "revenue", "hours"),
+    Sum("weighted_hours", "weighted_hours"),
+    Sum("weighted_cost", "weighted_cost"),
+    Sum("weighted_revenue", "weighted_revenue"),
+    Ratio("weighted_cost_rate", "weighted_cost", "weighted_hours"),
+    Ratio("weighted_realised_rate", "weighted_revenue", "weighted_hours"),
+    CountDistinct("n_jobs", "job_no"),
+    Min("first_month_ord", "month_ord"),
+    Max("last_month_ord", "month_ord"),
+]
+# Quotes are deduplicated per job-task within each department/category, as for a single selection.
+SCOPE_DEDUP_KEYS = (*SCOPE_KEYS, *DEDUP_KEYS)
+TASK_MEASURES = [
+    Sum("hours", "hours_raw"),
+    DedupSum("quoted_hours", "quoted_time_total", SCOPE_DEDUP_KEYS),
+    DedupSum("quoted_amount", "quoted_amount_total", SCOPE_DEDUP_KEYS),
+    OverrunRate("overrun_rate", "hours_raw", "quoted_time_total", keys=SCOPE_DEDUP_KEYS),
+    CountDistinct("job_count", "job_no"),
+]
+
+
+def with_scope_age(df: pd.DataFrame) -> pd.DataFrame:
+    # Months before the latest month of the row's department/category (-1 without a month).
+    ords = get_month_ord(df).to_numpy(np.int64)
+    valid = np.where(ords >= 0, ords, -1)
+    latest = pd.Series(valid, index=df.index).groupby(
+        [df[key] for key in SCOPE_KEYS], observed=True, dropna=False
+    ).transform("max").to_numpy()
+    return df.assign(month_ord=ords, scope_age=np.where(ords >= 0, latest - ords, -1))
+
+
+def window_frame(df: pd.DataFrame, window: int, active_only: bool) -> pd.DataFrame:
+    # Rows in the last `window` months of their department/category; with active_only, only
+    # staff with positive hours in that window. Expects with_scope_age() output.
+    age = df["scope_age"].to_numpy()
+    frame = df.loc[(age >= 0) & (age < window)]
+    if active_only:
+        keys = SCOPE_KEYS + ["staff_name"]
+        staff = aggregate(frame, keys, [Sum("hours", "hours_raw")])
+        frame = frame.loc[isin_keys(frame, staff.loc[staff["hours"] > 0], keys)]
+    return frame
+
+
+def quote_builder_scope(
+    df: pd.DataFrame,
+    half_life_months: int,
+    active_staff_months: int,
+    windows: tuple[int, ...] = BENCHMARK_WINDOWS,
+) -> pd.DataFrame:
+    # Rates and cohort stats for every (department, category, window, recency, active_only):
+    # the Quote Builder reads one row per selection instead of filtering the fact table.
+    df = with_scope_age(df)
+    decay = 0.5 ** (df["scope_age"].to_numpy() / max(half_life_months, 1))
+    hours = df["hours_raw"].to_numpy(dtype=np.float64, na_value=np.nan)
+    df = df.assign(
+        weighted_hours=decay * hours,
+        weighted_cost=decay * df["base_cost"].to_numpy(dtype=np.float64, na_value=np.nan),
+        weighted_revenue=decay * df["rev_alloc"].to_numpy(dtype=np.float64, na_value=np.nan),
+        recent_hours=np.where(df["scope_age"].to_numpy() < active_staff_months, hours, 0.0),
+    )
+    frames = []
+    for window in windows:
+        for active_only in (False, True):
+            frame = window_frame(df, window, active_only)
+            stats = aggregate(frame, SCOPE_KEYS, SCOPE_MEASURES)
+            # Staff with positive hours in the last active_staff_months of the window (cohorts.active_staff).
+            staff = aggregate(frame, SCOPE_KEYS + ["staff_name"], [Sum("recent_hours", "recent_hours")])
+            active = staff.loc[staff["recent_hours"] > 0].groupby(SCOPE_KEYS, observed=True).size()
+            stats = stats.merge(active.rename("n_active_staff").reset_index(), on=SCOPE_KEYS, how="left")
+            stats["n_active_staff"] = stats["n_active_staff"].fillna(0).astype(np.int64)
+            for recency_weighted in (False, True):
+                prefix = "weighted_" if recency_weighted else ""
+                frames.append(stats.assign(
+                    window=window,
+                    recency_weighted=recency_weighted,
+                    active_only=active_only,
+                    cost_rate=stats[f"{prefix}cost_rate"],
+                    realised_rate=stats[f"{prefix}realised_rate"],
+                ))
+    scope = pd.concat(frames, ignore_index=True)
+    scope["first_month_key"] = scope["first_month_ord"].map(month_ord_to_label)
+    scope["last_month_key"] = scope["last_month_ord"].map(month_ord_to_label)
+    return scope[STORE_KEYS + [
+        "hours", "cost_rate", "realised_rate", "n_jobs", "n_active_staff", "first_month_key", "last_month_key"
+    ]]
+
+
+def quote_builder_tasks(df: pd.DataFrame, windows: tuple[int, ...] = BENCHMARK_WINDOWS) -> pd.DataFrame:
+    # Task templates (quoted and delivered hours per task) for every (department, category,
+    # window, active_only); quotes are deduplicated per job-task within the window.
+    df = with_scope_age(df)
+    frames = []
+    for window in windows:
+        for active_only in (False, True):
+            tasks = aggregate(window_frame(df, window, active_only), SCOPE_KEYS + ["task_name"], TASK_MEASURES)
+            tasks.insert(len(SCOPE_KEYS), "window", window)
+            tasks.insert(len(SCOPE_KEYS) + 1, "active_only", active_only)
+            frames.append(tasks)
+    return pd.concat(frames, ignore_index=True)
+
+
+def task_benchmarks(
+    df: pd.DataFrame, half_life_months: int, windows: tuple[int, ...] = BENCHMARK_WINDOWS
+) -> pd.DataFrame:
+    # benchmark_task_quantiles for every (department, category, window, active_only): the
+    # job-task quotes and actual hours are taken from the window's rows of each department and
+    # category, as the page derives them for a single selection.
+    df = with_scope_age(df)
+    frames = []
+    for window in windows:
+        for active_only in (False, True):
+            frame = window_frame(df, window, active_only)
+            dim = build_quote_dim(frame, keys=SCOPE_DEDUP_KEYS)
+            benchmarks = task_quantile_benchmarks(dim, half_life_months, BENCHMARK_KEYS)
+            at = BENCHMARK_KEYS.index("job_category") + 1
+            benchmarks.insert(at, "window", window)
+            benchmarks.insert(at + 1, "active_only", active_only)
+            frames.append(benchmarks)
+    return pd.concat(frames, ignore_index=True)
+
+
+def select_store(store: pd.DataFrame, **key) -> pd.DataFrame:
+    # Rows of a store frame matching every given key column.
+    mask = np.ones(len(store), dtype=bool)
+    for column, value in key.items():
+        mask &= (store[column] == value).to_numpy(dtype=bool, na_value=False)
+    return store.loc[mask]
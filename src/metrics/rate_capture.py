@@ -3,10 +3,14 @@ from __future__ import annotations
 import pandas as pd
 
 from src.data.semantic import rate_rollups
+from src.instrumentation import instrument
 
 
-def rate_capture_pack(df: pd.DataFrame, group_keys: list[str]) -> pd.DataFrame:
-    rates = rate_rollups(df, group_keys)
+@instrument("pack")
+def rate_capture_pack(
+    df: pd.DataFrame, group_keys: list[str], quote_dim: pd.DataFrame | None = None
+) -> pd.DataFrame:
+    rates = rate_rollups(df, group_keys, quote_dim)
     rates["rate_variance"] = rates["realised_rate"] - rates["quote_rate"]
 
     weighted = rates.copy()
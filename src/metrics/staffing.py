@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.data.aggregate import Sum, aggregate
+from src.data.cohorts import recency_weights
+from src.data.semantic import get_month_ord
+
+CAPABILITY_COLUMNS = ["task_name", "staff_name", "capability_score", "hours"]
+
+
+def staff_task_capability(df: pd.DataFrame, half_life_months: int) -> pd.DataFrame:
+    # Recency-weighted hours per (task, staff), sorted by task then descending score: the
+    # stored form of the capability index (only pairs with hours are kept).
+    weights = recency_weights(get_month_ord(df), half_life_months).to_numpy()
+    hours = df["hours_raw"].to_numpy(dtype=np.float64, na_value=np.nan)
+    skill = aggregate(df.assign(weighted_hours=weights * hours), ["task_name", "staff_name"], [
+        Sum("capability_score", "weighted_hours"),
+        Sum("hours", "hours_raw"),
+    ])
+    skill = skill.loc[(skill["capability_score"] > 0) & skill["task_name"].notna() & skill["staff_name"].notna()]
+    order = np.lexsort((-skill["capability_score"].to_numpy(), pd.factorize(skill["task_name"], sort=True)[0]))
+    return skill.iloc[order].reset_index(drop=True)
+
+
+@dataclass(frozen=True)
+class CapabilityIndex:
+    # Task-major CSR: the staff codes of task t are staff_codes[indptr[t]:indptr[t + 1]], best first.
+    tasks: pd.Index
+    staff: pd.Index
+    indptr: np.ndarray
+    staff_codes: np.ndarray
+    scores: np.ndarray
+
+    @classmethod
+    def from_frame(cls, skill: pd.DataFrame) -> CapabilityIndex:
+        # Expects staff_task_capability() output (or the staff_task_capability mart).
+        task_codes, tasks = pd.factorize(skill["task_name"], sort=True)
+        staff_codes, staff = pd.factorize(skill["staff_name"], sort=True)
+        scores = skill["capability_score"].to_numpy(dtype=np.float64)
+        order = np.lexsort((-scores, task_codes))
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(task_codes, minlength=len(tasks)))])
+        return cls(
+            pd.Index(np.asarray(tasks, dtype=object), name="task_name"),
+            pd.Index(np.asarray(staff, dtype=object), name="staff_name"),
+            indptr,
+            staff_codes[order].astype(np.int64),
+            scores[order],
+        )
+
+    def top_k(self, tasks, k: int = 3) -> pd.DataFrame:
+        # Best k staff for every task in one gather; unknown tasks get no rows.
+        tasks = pd.Index(tasks)
+        codes = self.tasks.get_indexer(tasks)
+        known = codes >= 0
+        starts = np.where(known, self.indptr[np.maximum(codes, 0)], 0)
+        counts = np.where(known, np.minimum(self.indptr[np.maximum(codes, 0) + 1] - starts, k), 0)
+        query = np.repeat(np.arange(len(tasks)), counts)
+        rank = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        positions = np.repeat(starts, counts) + rank
+        return pd.DataFrame({
+            "task_name": tasks.take(query),
+            "rank": rank + 1,
+            "staff_name": self.staff.take(self.staff_codes[positions]),
+            "capability_score": self.scores[positions],
+        })
+
+
+def assign_staff(
+    index: CapabilityIndex, plan: pd.DataFrame, headroom: pd.Series, candidates: int = 10
+) -> pd.DataFrame:
+    # Greedy allocation of plan (task_name, planned_hours) across each task's top candidates:
+    # (task, staff) pairs are taken in descending capability order and each gets as many hours
+    # as both the task's remaining hours and the staff member's remaining headroom allow.
+    demand = plan.groupby("task_name", sort=False, observed=True)["planned_hours"].sum()
+    pairs = index.top_k(demand.index, candidates)
+    pairs = pairs.iloc[np.argsort(-pairs["capability_score"].to_numpy(), kind="stable")]
+
+    remaining_task = demand.clip(lower=0).astype(float).to_dict()
+    remaining_staff = headroom.clip(lower=0).astype(float).to_dict()
+    assigned = []
+    for task, staff in zip(pairs["task_name"].tolist(), pairs["staff_name"].tolist()):
+        hours = min(remaining_task[task], remaining_staff.get(staff, 0.0))
+        if hours > 0:
+            remaining_task[task] -= hours
+            remaining_staff[staff] -= hours
+        assigned.append(hours)
+    pairs = pairs.assign(assigned_hours=assigned)
+    allocation = pairs.loc[pairs["assigned_hours"] > 0].sort_values(["task_name", "rank"]).reset_index(drop=True)
+    allocation["planned_hours"] = allocation["task_name"].map(demand)
+    allocation["unassigned_hours"] = allocation["task_name"].map(remaining_task)
+    return allocation[["task_name", "planned_hours", "staff_name", "rank", "capability_score", "assigned_hours", "unassigned_hours"]]
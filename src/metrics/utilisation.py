@@ -2,37 +2,51 @@ from __future__ import annotations
 
 import pandas as pd
 
+from src.data.aggregate import Difference, Mask, Measure, Ratio, Sum, WeightedMean, aggregate, grouping_sets
 from src.data.semantic import leave_exclusion_mask
+from src.instrumentation import instrument
 
+UTILISATION_COLUMNS = ["staff_name", "department_final", "task_name", "is_billable", "hours_raw", "utilisation_target"]
 
+
+def utilisation_measures(where: Mask = None) -> list[Measure]:
+    # `where` restricts the rows counted (e.g. not_leave in marts that keep leave rows for cost).
+    return [
+        # NaN without billable rows, like the DuckDB engine's FILTER (WHERE is_billable) sum.
+        Sum("billable_hours", "hours_raw", where="is_billable" if where is None else ("is_billable", where), min_count=1),
+        Sum("total_hours", "hours_raw", where=where),
+        Ratio("utilisation", "billable_hours", "total_hours"),
+        WeightedMean("target", "utilisation_target", "hours_raw", where=where),
+        Difference("util_gap", "target", "utilisation"),
+    ]
+
+
+UTILISATION_MEASURES = utilisation_measures()
+
+
+@instrument("pack")
 def utilisation_pack(df: pd.DataFrame, group_keys: list[str], exclude_leave: bool = True) -> pd.DataFrame:
-    df = df.copy()
     if exclude_leave:
         df = df.loc[~leave_exclusion_mask(df)]
+    return aggregate(df, group_keys, UTILISATION_MEASURES)
 
-    billable = df.loc[df["is_billable"]]
-    billable_hours = billable.groupby(group_keys, dropna=False)["hours_raw"].sum()
-    total_hours = df.groupby(group_keys, dropna=False)["hours_raw"].sum()
 
-    util = pd.DataFrame({
-        "billable_hours": billable_hours,
-        "total_hours": total_hours,
-    })
-    util["utilisation"] = util["billable_hours"] / util["total_hours"].replace({0: pd.NA})
-
-    target = df.groupby(group_keys, dropna=False).apply(
-        lambda g: (g["utilisation_target"] * g["hours_raw"]).sum() / g["hours_raw"].sum()
-        if g["hours_raw"].sum() else pd.NA
-    )
-    util["target"] = target
-    util["util_gap"] = util["target"] - util["utilisation"]
-
-    return util.reset_index()
+@instrument("pack")
+def utilisation_packs(
+    df: pd.DataFrame, groupings: dict[str, list[str]], exclude_leave: bool = True
+) -> dict[str, pd.DataFrame]:
+    # Several groupings (e.g. staff, department, company) from one filtered scan; each frame
+    # equals utilisation_pack(df, keys, exclude_leave).
+    if exclude_leave:
+        df = df.loc[~leave_exclusion_mask(df)]
+    cube = grouping_sets(df, groupings, UTILISATION_MEASURES)
+    names = [measure.name for measure in UTILISATION_MEASURES]
+    return {
+        name: cube.loc[cube["level"] == name, keys + names].reset_index(drop=True)
+        for name, keys in groupings.items()
+    }
 
 
 def leakage_breakdown(df: pd.DataFrame, group_keys: list[str], breakdown_field: str = "breakdown") -> pd.DataFrame:
-    df = df.copy()
-    df = df.loc[~leave_exclusion_mask(df)]
-    non_billable = df.loc[~df["is_billable"]]
-    grouped = non_billable.groupby(group_keys + [breakdown_field], dropna=False)["hours_raw"].sum().reset_index()
-    return grouped
+    non_billable = df.loc[~leave_exclusion_mask(df) & ~df["is_billable"]]
+    return aggregate(non_billable, group_keys + [breakdown_field], [Sum("hours_raw", "hours_raw")])
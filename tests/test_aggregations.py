@@ -1,6 +1,20 @@
+import numpy as np
 import pandas as pd
 
-from src.data.semantic import safe_quote_rollup
+from src.data.aggregate import (
+    CountDistinct,
+    DedupSum,
+    First,
+    Mean,
+    Median,
+    Min,
+    Ratio,
+    Sum,
+    WeightedMean,
+    WeightedQuantile,
+    aggregate,
+)
+from src.data.semantic import HIERARCHY_LEVELS, HIERARCHY_MEASURES, drill_level, hierarchy_cube, safe_quote_rollup
 
 
 def test_quote_dedupe_rollup():
@@ -14,3 +28,107 @@ def test_quote_dedupe_rollup():
     rollup = safe_quote_rollup(df, ["department_final"])
     assert rollup.loc[0, "quoted_hours"] == 15
     assert rollup.loc[0, "quoted_amount"] == 150
+
+
+def test_aggregate_matches_groupby():
+    rng = np.random.default_rng(3)
+    n = 200
+    df = pd.DataFrame({
+        "dept": pd.Categorical(rng.choice(["D1", "D2", "D3"], n), categories=["D3", "D1", "D2", "D4"]),
+        "month": rng.choice(["2024-01", "2024-02", None], n),
+        "job_no": [f"J{j}" for j in rng.integers(0, 12, n)],
+        "task_name": rng.choice(["T1", "T2"], n),
+        "staff": rng.choice(["S1", "S2", "S3"], n),
+        "hours": rng.integers(1, 9, n).astype(float),
+        "target": rng.random(n),
+        "billable": rng.random(n) > 0.4,
+    })
+    df.loc[::7, "target"] = np.nan
+    df["quoted"] = df["job_no"].str[1:].astype(float) * 10
+
+    out = aggregate(df, ["dept", "month"], [
+        Sum("hours", "hours"),
+        Sum("billable_hours", "hours", where="billable"),
+        Ratio("billable_share", "billable_hours", "hours"),
+        Mean("target", "target"),
+        Median("median_target", "target"),
+        WeightedMean("weighted_target", "target", "hours"),
+        DedupSum("quoted", "quoted"),
+        CountDistinct("staff", "staff"),
+        Min("first_job", "job_no"),
+        First("first_task", "task_name"),
+    ])
+
+    keys = ["dept", "month"]
+    grouped = df.groupby(keys, dropna=False, observed=True)
+    expected = grouped.agg(
+        hours=("hours", "sum"), target=("target", "mean"), median_target=("target", "median"), staff=("staff", "nunique"),
+        first_job=("job_no", "min"), first_task=("task_name", "first"),
+    ).reset_index()
+    billable = df[df["billable"]].groupby(keys, dropna=False, observed=True)["hours"].sum()
+    expected["billable_hours"] = billable.reindex(pd.MultiIndex.from_frame(expected[keys]), fill_value=0).to_numpy()
+    weighted = df.assign(weighted=df["target"] * df["hours"]).groupby(keys, dropna=False, observed=True)["weighted"].sum()
+    expected["weighted_target"] = weighted.to_numpy() / expected["hours"]
+    quotes = df.drop_duplicates(["job_no", "task_name"]).groupby(keys, dropna=False, observed=True)["quoted"].sum()
+    expected["quoted"] = quotes.reindex(pd.MultiIndex.from_frame(expected[keys])).to_numpy()
+
+    assert out["dept"].tolist() == expected["dept"].tolist()
+    assert out["month"].isna().tolist() == expected["month"].isna().tolist()
+    for column in ["hours", "billable_hours", "target", "median_target", "weighted_target", "quoted"]:
+        np.testing.assert_allclose(out[column], expected[column], equal_nan=True, err_msg=column)
+    np.testing.assert_allclose(out["billable_share"], expected["billable_hours"] / expected["hours"])
+    assert out["staff"].tolist() == expected["staff"].tolist()
+    assert out["first_job"].tolist() == expected["first_job"].tolist()
+    assert out["first_task"].tolist() == expected["first_task"].tolist()
+
+
+def test_dedup_rows_are_attributed_to_groups():
+    df = pd.DataFrame({"dept": ["D1", "D2"], "job_no": ["J1", "J2"], "task_name": ["T", "T"], "quoted": [1.0, 2.0]})
+    quotes = pd.DataFrame({"dept": ["D1", "D1", "D9"], "quoted": [5.0, 7.0, 100.0]})
+    out = aggregate(df, ["dept"], [DedupSum("quoted", "quoted")], dedup_rows=quotes)
+    assert out["quoted"].iloc[0] == 12.0
+    assert np.isnan(out["quoted"].iloc[1])
+
+
+def test_hierarchy_cube_levels_match_direct_aggregates():
+    rng = np.random.default_rng(5)
+    n = 300
+    df = pd.DataFrame({
+        "company": "SG",
+        "department_final": rng.choice(["D1", "D2"], n),
+        "job_category": rng.choice(["C1", "C2", "C3"], n),
+        "task_name": rng.choice(["Design", "Build", "Review"], n),
+        "staff_name": rng.choice(["S1", "S2", "S3", "S4"], n),
+        "month_key": rng.choice(["2024-01", "2024-02"], n),
+        "job_no": [f"J{j}" for j in rng.integers(0, 20, n)],
+        "hours_raw": rng.integers(1, 8, n).astype(float),
+        "base_cost": rng.integers(50, 400, n).astype(float),
+        "rev_alloc": rng.integers(0, 900, n).astype(float),
+    })
+    df["quoted_time_total"] = df["job_no"].str[1:].astype(float)
+    df["quoted_amount_total"] = df["quoted_time_total"] * 120
+
+    cube = hierarchy_cube(df, by=["month_key"])
+    for level, keys in HIERARCHY_LEVELS.items():
+        group_keys = keys + ["month_key"]
+        expected = aggregate(df, group_keys, HIERARCHY_MEASURES)
+        rows = cube.loc[cube["level"] == level].reset_index(drop=True)
+        pd.testing.assert_frame_equal(rows[expected.columns], expected, check_exact=False, obj=level)
+
+    departments = drill_level(cube, "department", ["revenue"])
+    assert departments["revenue"].sum() == df["rev_alloc"].sum()
+
+
+def test_weighted_quantiles_match_inverted_cdf():
+    rng = np.random.default_rng(9)
+    df = pd.DataFrame({"task": rng.choice(["A", "B", "C"], 600), "hours": rng.random(600).round(3)})
+    df["weight"] = rng.integers(1, 4, 600).astype(float)
+    out = aggregate(df, ["task"], [
+        WeightedQuantile(f"p{int(q * 100)}", "hours", q, "weight") for q in (0.25, 0.5, 0.75, 0.9)
+    ])
+    for task, group in df.groupby("task"):
+        # Integer weights are equivalent to repeating each row weight times.
+        repeated = np.repeat(group["hours"].to_numpy(), group["weight"].astype(int).to_numpy())
+        row = out.loc[out["task"] == task].iloc[0]
+        for q in (0.25, 0.5, 0.75, 0.9):
+            assert row[f"p{int(q * 100)}"] == np.quantile(repeated, q, method="inverted_cdf")
@@ -0,0 +1,63 @@
+import gc
+
+import pandas as pd
+
+from src.data.arrow_store import ArrowTableStore, ipc_path_for
+
+
+def test_store_shares_memory_mapped_views(tmp_path):
+    source = tmp_path / "fact.parquet"
+    pd.DataFrame({
+        "department_final": ["D1", "D2", "D1"],
+        "month_key": ["2024-01", "2024-02", "2024-03"],
+        "hours_raw": [1.0, 2.0, 3.0],
+    }).to_parquet(source, index=False)
+
+    store = ArrowTableStore()
+    first = store.frame(source, ["hours_raw", "month_key"])
+    second = store.frame(source)
+    assert ipc_path_for(source).exists()
+    assert list(first.columns) == ["hours_raw", "month_key", "month_ord"]
+    assert isinstance(first["hours_raw"].dtype, pd.ArrowDtype)
+    assert second["month_ord"].tolist() == [2024 * 12, 2024 * 12 + 1, 2024 * 12 + 2]
+
+    report = store.memory_report()
+    assert report.loc[0, "live_views"] == 2
+    assert report.loc[0, "hits"] == 1
+    assert report.loc[0, "mapped_bytes"] > 0
+
+    del first, second
+    gc.collect()
+    assert store.memory_report().loc[0, "live_views"] == 0
+    store.evict(source)
+    assert store.memory_report().empty
+
+
+def test_loader_serves_from_store_when_enabled(tmp_path, monkeypatch):
+    from src.data.loader import load_processed_table
+
+    monkeypatch.setenv("ARROW_STORE", "1")
+    (tmp_path / "processed").mkdir()
+    pd.DataFrame({"department_final": ["D1", "D2"], "month_key": ["2024-01", "2024-02"], "hours_raw": [1.0, 2.0]}).to_parquet(
+        tmp_path / "processed" / "fact.parquet", index=False
+    )
+    df = load_processed_table(
+        tmp_path, "fact", columns=["hours_raw"], filters=[("month_ord", ">=", 2024 * 12 + 1)]
+    )
+    assert list(df.columns) == ["hours_raw"]
+    assert df["hours_raw"].tolist() == [2.0]
+
+
+def test_month_filtered_read_through_store_keeps_one_month_ord(tmp_path, monkeypatch):
+    from src.data.loader import load_processed_table
+
+    monkeypatch.setenv("ARROW_STORE", "1")
+    (tmp_path / "processed").mkdir()
+    pd.DataFrame({"month_key": ["2024-01", "2024-02", "2024-03"], "hours_raw": [1.0, 2.0, 3.0]}).to_parquet(
+        tmp_path / "processed" / "fact.parquet", index=False
+    )
+    df = load_processed_table(
+        tmp_path, "fact", columns=["month_key", "hours_raw"], filters=[("month_ord", ">=", 2024 * 12 + 1)]
+    )
+    assert list(df.columns) == ["month_key", "hours_raw", "month_ord"]
+    assert df["hours_raw"].tolist() == [2.0, 3.0]
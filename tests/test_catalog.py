@@ -0,0 +1,41 @@
+import pandas as pd
+
+from src.data.catalog import load_catalog, register_layer, register_tables
+from src.data.loader import load_mart_table, load_processed_table
+
+
+def test_register_layer_records_table_metadata(tmp_path):
+    (tmp_path / "processed").mkdir()
+    pd.DataFrame({"job_no": ["J1", "J2"], "hours_raw": [1.0, 2.0]}).to_parquet(
+        tmp_path / "processed" / "fact.parquet", index=False
+    )
+    pd.DataFrame({"month_key": ["2024-01"], "unallocated_revenue": [5.0]}).to_csv(
+        tmp_path / "processed" / "audit.csv", index=False
+    )
+    entries = register_layer(tmp_path, "processed")
+    fact = entries["processed/fact"]
+    assert fact.format == "parquet"
+    assert fact.row_count == 2
+    assert fact.path == "processed/fact.parquet"
+    assert set(fact.schema) == {"job_no", "hours_raw"}
+    assert entries["processed/audit"].row_count == 1
+
+    first_hash = fact.content_hash
+    pd.DataFrame({"job_no": ["J1", "J2"], "hours_raw": [1.0, 3.0]}).to_parquet(
+        tmp_path / "processed" / "fact.parquet", index=False
+    )
+    assert load_catalog(tmp_path)["processed/fact"].content_hash == first_hash
+    assert register_layer(tmp_path, "processed")["processed/fact"].content_hash != first_hash
+
+
+def test_loader_resolves_through_catalog(tmp_path):
+    elsewhere = tmp_path / "mounted" / "volume"
+    elsewhere.mkdir(parents=True)
+    pd.DataFrame({"department_final": ["D1"], "hours": [4.0]}).to_parquet(elsewhere / "cube.parquet", index=False)
+    register_tables(tmp_path, "marts", [elsewhere / "cube.parquet"])
+    assert load_mart_table(tmp_path, "cube")["hours"].tolist() == [4.0]
+
+    pd.DataFrame({"department_final": ["D2"]}).to_parquet(elsewhere / "fact.parquet", index=False)
+    register_tables(tmp_path, "processed", [elsewhere / "fact.parquet"])
+    assert load_mart_table(tmp_path, "missing", fallback_processed="fact")["department_final"].tolist() == ["D2"]
+    assert load_processed_table(tmp_path, "fact")["department_final"].tolist() == ["D2"]
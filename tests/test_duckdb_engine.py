@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.semantic import ensure_company, profitability_rollup, rate_rollups, safe_quote_rollup
+from src.data.synthetic import synthetic_job_task_month, synthetic_timesheet
+from src.metrics.active_projects import active_projects_pack
+from src.metrics.capacity import capacity_pack
+from src.metrics.job_mix import job_mix_pack
+from src.metrics.margin_bridge import margin_bridge_pack
+from src.metrics.quote_delivery import quote_delivery_pack
+from src.metrics.rate_capture import rate_capture_pack
+from src.metrics.utilisation import utilisation_pack
+
+pytest.importorskip("duckdb")
+
+from src.data.duckdb_engine import DuckDBEngine  # noqa: E402
+
+NON_BILLABLE_STAFF = "Staff 00003"
+
+
+def _fact() -> pd.DataFrame:
+    # Plain strings, so both engines order the groups alphabetically.
+    df = synthetic_timesheet(2_000, seed=7, months=4, end_month="2024-02")
+    df = df.astype({col: "str" for col in df.select_dtypes("category").columns})
+    df.loc[df.index % 23 == 0, "job_no"] = None
+    df.loc[df.index % 29 == 0, "department_final"] = None
+    df.loc[df.index % 31 == 0, "quote_match_flag"] = None
+    # A staff member with only non-billable hours: billable hours and utilisation are missing.
+    df.loc[df["staff_name"] == NON_BILLABLE_STAFF, "is_billable"] = False
+    return df
+
+
+def _normalise(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]) or df[col].dtype == object:
+            converted = pd.to_numeric(df[col], errors="coerce")
+            if converted.notna().sum() == df[col].notna().sum():
+                df[col] = converted.astype(float)
+                continue
+        df[col] = df[col].astype(object).where(df[col].notna(), None)
+    return df
+
+
+def _assert_parity(pandas_result: pd.DataFrame, duckdb_result: pd.DataFrame) -> None:
+    assert list(pandas_result.columns) == list(duckdb_result.columns)
+    pd.testing.assert_frame_equal(_normalise(pandas_result), _normalise(duckdb_result), check_dtype=False)
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    (tmp_path / "processed").mkdir()
+    _fact().to_parquet(tmp_path / "processed" / "fact_timesheet_day_enriched.parquet", index=False, row_group_size=64)
+    eng = DuckDBEngine(tmp_path, threads=2)
+    yield eng
+    eng.close()
+
+
+GROUPINGS = [
+    ["department_final"],
+    ["company", "department_final", "month_key"],
+    ["company", "department_final", "job_category", "staff_name"],
+]
+
+
+@pytest.mark.parametrize("group_keys", GROUPINGS)
+def test_rollup_parity(engine, group_keys):
+    df = ensure_company(_fact())
+    table = "fact_timesheet_day_enriched"
+    _assert_parity(profitability_rollup(df, group_keys), engine.profitability_rollup(table, group_keys))
+    _assert_parity(safe_quote_rollup(df, group_keys), engine.safe_quote_rollup(table, group_keys))
+    _assert_parity(rate_rollups(df, group_keys), engine.rate_rollups(table, group_keys))
+
+
+@pytest.mark.parametrize("group_keys", GROUPINGS)
+def test_pack_parity(engine, group_keys):
+    df = ensure_company(_fact())
+    table = "fact_timesheet_day_enriched"
+    _assert_parity(quote_delivery_pack(df, group_keys), engine.quote_delivery_pack(table, group_keys))
+    _assert_parity(utilisation_pack(df, group_keys), engine.utilisation_pack(table, group_keys))
+    _assert_parity(
+        utilisation_pack(df, group_keys, exclude_leave=False),
+        engine.utilisation_pack(table, group_keys, exclude_leave=False),
+    )
+    _assert_parity(capacity_pack(df, group_keys, 4), engine.capacity_pack(table, group_keys, 4))
+
+
+@pytest.mark.parametrize("group_keys", GROUPINGS)
+def test_rate_capture_and_margin_bridge_parity(engine, group_keys):
+    df = ensure_company(_fact())
+    table = "fact_timesheet_day_enriched"
+    _assert_parity(rate_capture_pack(df, group_keys), engine.rate_capture_pack(table, group_keys))
+    _assert_parity(margin_bridge_pack(df, group_keys), engine.margin_bridge_pack(table, group_keys))
+
+
+@pytest.mark.parametrize("recency_days", [21, 90])
+def test_active_projects_parity(engine, recency_days):
+    _assert_parity(
+        active_projects_pack(_fact(), recency_days),
+        engine.active_projects_pack("fact_timesheet_day_enriched", recency_days),
+    )
+
+
+def test_job_mix_parity(engine):
+    df = synthetic_job_task_month(_fact())
+    df.to_parquet(engine.data_dir / "processed" / "fact_job_task_month.parquet", index=False)
+    capacity = pd.DataFrame({"billable_capacity": [500.0]})
+    _assert_parity(job_mix_pack(df, capacity, 4, 0.75), engine.job_mix_pack("fact_job_task_month", capacity, 4, 0.75))
+
+
+def test_utilisation_packs_parity(engine):
+    from src.metrics.utilisation import utilisation_packs
+
+    df = ensure_company(_fact())
+    groupings = {str(i): keys for i, keys in enumerate(GROUPINGS)}
+    packs = utilisation_packs(df, groupings)
+    engine_packs = engine.utilisation_packs("fact_timesheet_day_enriched", groupings)
+    for name, keys in groupings.items():
+        _assert_parity(utilisation_pack(df, keys), packs[name])
+        _assert_parity(packs[name], engine_packs[name])
+
+
+def test_leakage_parity(engine):
+    from src.metrics.utilisation import leakage_breakdown
+
+    df = _fact().assign(breakdown=lambda d: np.where(d["hours_raw"] > 2, "Admin", "Training"))
+    df.to_parquet(engine.data_dir / "processed" / "fact_with_breakdown.parquet", index=False)
+    _assert_parity(
+        leakage_breakdown(df, ["department_final"]),
+        engine.leakage_breakdown("fact_with_breakdown", ["department_final"]),
+    )
+
+
+FILTERS = [
+    {"window_value": 2, "exclude_leave": True},
+    {"window_value": "FYTD", "department_final": ["Creative"]},
+    {"window_value": "Custom", "start_month": "2023-12", "end_month": "2024-01", "staff_name": ["Staff 00001", NON_BILLABLE_STAFF]},
+]
+
+
+@pytest.mark.parametrize("partitioned", [False, True])
+@pytest.mark.parametrize("filters", FILTERS)
+def test_global_filters_parity(engine, filters, partitioned):
+    from src.data.filters import filtered_table
+    from src.data.partitions import write_partitions
+    from src.metrics.utilisation import leakage_breakdown
+
+    table = "fact_partitioned" if partitioned else "fact_with_breakdown"
+    df = _fact().assign(breakdown=lambda d: np.where(d["hours_raw"] > 2, "Admin", "Training"))
+    if partitioned:
+        write_partitions(df, engine.data_dir / "processed" / table)
+    else:
+        df.to_parquet(engine.data_dir / "processed" / f"{table}.parquet", index=False)
+    selected = ensure_company(filtered_table(engine.data_dir, table, filters))
+    assert 0 < len(selected) < len(df)
+    keys = ["department_final", "staff_name"]
+    _assert_parity(utilisation_pack(selected, keys), engine.utilisation_pack(table, keys, filters=filters))
+    _assert_parity(rate_rollups(selected, keys), engine.rate_rollups(table, keys, filters=filters))
+    _assert_parity(margin_bridge_pack(selected, keys), engine.margin_bridge_pack(table, keys, filters=filters))
+    _assert_parity(active_projects_pack(selected, 30), engine.active_projects_pack(table, 30, filters=filters))
+    _assert_parity(
+        leakage_breakdown(selected, ["department_final"]),
+        engine.leakage_breakdown(table, ["department_final"], filters=filters),
+    )
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.data.filters import ByteLRUCache, filter_cache, filter_hash, filtered_table, select_rows
+
+
+def _fact() -> pd.DataFrame:
+    return pd.DataFrame({
+        "department_final": ["D1", "D2", "D1", "D2", "D1", "D2"],
+        "task_name": ["Design", "Annual Leave", "Build", "Build", "Sick leave", "Design"],
+        "month_key": ["2023-06", "2023-07", "2024-01", "2024-02", "2024-03", "2024-03"],
+        "hours_raw": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+    })
+
+
+def test_filter_hash_ignores_order_and_empty_selections():
+    base = {"window_value": 3, "exclude_leave": True, "client": ["B", "A"], "role": []}
+    same = {"role": [], "client": ["A", "B"], "exclude_leave": True, "window_value": 3, "active_only": False}
+    assert filter_hash(base) == filter_hash(same)
+    assert filter_hash(base) != filter_hash({**base, "window_value": 6})
+
+
+def test_select_rows_resolves_window_leave_and_isin():
+    df = _fact()
+    rows = select_rows(df, {"window_value": 3, "exclude_leave": True, "department_final": ["D2"]})
+    assert df["hours_raw"].iloc[rows].tolist() == [4.0, 6.0]
+    # FYTD starts in July; the custom window is inclusive.
+    assert df["hours_raw"].iloc[select_rows(df, {"window_value": "FYTD"})].tolist() == [2.0, 3.0, 4.0, 5.0, 6.0]
+    custom = {"window_value": "Custom", "start_month": "2023-07", "end_month": "2024-01"}
+    assert df["hours_raw"].iloc[select_rows(df, custom)].tolist() == [2.0, 3.0]
+    assert select_rows(df, {"window_value": "Custom", "start_month": "", "end_month": None}) is None
+
+
+def test_filtered_table_is_memoized_per_table_version(tmp_path):
+    (tmp_path / "processed").mkdir()
+    path = tmp_path / "processed" / "fact.parquet"
+    _fact().to_parquet(path, index=False)
+    filter_cache().clear()
+    filters = {"window_value": 6, "exclude_leave": True}
+    first = filtered_table(tmp_path, "fact", filters, columns=["hours_raw"])
+    assert first["hours_raw"].tolist() == [3.0, 4.0, 6.0]
+    assert filtered_table(tmp_path, "fact", {**filters, "client": []}, columns=["hours_raw"]) is first
+
+    _fact().assign(hours_raw=10.0).to_parquet(path, index=False)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert filtered_table(tmp_path, "fact", filters, columns=["hours_raw"])["hours_raw"].tolist() == [10.0] * 3
+
+
+def test_byte_lru_evicts_least_recently_used():
+    cache = ByteLRUCache(max_bytes=100)
+    cache.put("a", np.zeros(5), 40)
+    cache.put("b", np.zeros(5), 40)
+    assert cache.get("a") is not None
+    cache.put("c", np.zeros(5), 40)
+    assert cache.get("b") is None and cache.get("a") is not None and cache.get("c") is not None
+    cache.put("huge", np.zeros(5), 500)
+    assert cache.get("huge") is None and cache.report()["bytes"] == 80
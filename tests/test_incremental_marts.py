@@ -0,0 +1,72 @@
+import filecmp
+
+import pandas as pd
+
+from src.data.build_manifest import load_manifest
+from src.data.loader import load_mart_table
+from src.data.marts import build_all_marts
+from src.data.synthetic import synthetic_job_task_month, synthetic_timesheet
+
+
+def _fact(months: int, end_month: str = "2024-04") -> pd.DataFrame:
+    return synthetic_timesheet(1_500, seed=4, months=months, end_month=end_month)
+
+
+def _build(data_dir, fact, incremental):
+    build_all_marts(fact, synthetic_job_task_month(fact), data_dir, 21, 4, 0.75, incremental=incremental)
+    return load_manifest(data_dir)
+
+
+def test_incremental_build_matches_full_rebuild(tmp_path):
+    after = _fact(5, end_month="2024-05")
+    before = after.loc[after["month_key"] < "2024-05"].reset_index(drop=True)
+    after.loc[after["month_key"] == "2024-04", "hours_raw"] += 1.0
+
+    full_dir, incremental_dir = tmp_path / "full", tmp_path / "incremental"
+    _build(full_dir, after, incremental=False)
+    _build(incremental_dir, before, incremental=True)
+    manifest = _build(incremental_dir, after, incremental=True)
+
+    assert manifest["watermark"] == "2024-05"
+    assert manifest["marts"]["cube_dept_month"] == ["2024-04", "2024-05"]
+    assert manifest["marts"]["cube_dept_category_task"] == "all"
+    full_files = sorted(p.relative_to(full_dir) for p in (full_dir / "marts").rglob("*.parquet"))
+    assert full_files == sorted(p.relative_to(incremental_dir) for p in (incremental_dir / "marts").rglob("*.parquet"))
+    for path in full_files:
+        assert filecmp.cmp(full_dir / path, incremental_dir / path, shallow=False), path
+
+    assert _build(incremental_dir, after, incremental=True)["marts"]["cube_dept_month"] == []
+    cube = load_mart_table(incremental_dir, "cube_dept_month", filters=[("month_ord", ">=", 2024 * 12 + 3)])
+    assert sorted(cube["month_key"].unique()) == ["2024-04", "2024-05"]
+
+
+def test_parallel_build_matches_sequential(tmp_path):
+    fact = _fact(3)
+    build_all_marts(fact, synthetic_job_task_month(fact), tmp_path / "sequential", 21, 4, 0.75, jobs=1)
+    build_all_marts(fact, synthetic_job_task_month(fact), tmp_path / "parallel", 21, 4, 0.75, jobs=2)
+
+    assert set(load_manifest(tmp_path / "parallel")["timings"]) >= {"prepare", "cube_dept_month", "job_mix_month"}
+    files = sorted(p.relative_to(tmp_path / "sequential") for p in (tmp_path / "sequential" / "marts").rglob("*.parquet"))
+    for path in files:
+        assert filecmp.cmp(tmp_path / "sequential" / path, tmp_path / "parallel" / path, shallow=False), path
+    assert not list((tmp_path / "parallel" / "cache").iterdir())
+
+
+def test_appended_month_rebuilds_only_job_mix_months_it_touches(tmp_path):
+    before = _fact(3, end_month="2024-03")
+    # The new month repeats job-tasks already seen, so no job-level quote changes.
+    repeat = before.loc[before["month_key"] == "2024-03"].assign(month_key="2024-04")
+    after = pd.concat([before, repeat], ignore_index=True)
+    _build(tmp_path, before, incremental=True)
+    assert _build(tmp_path, after, incremental=True)["marts"]["job_mix_month"] == ["2024-04"]
+
+    # A quote change reaches every month of that job, and only those.
+    job_months = after.groupby("job_no", observed=True)["month_key"].unique().map(sorted)
+    job = job_months[job_months.map(len) == 2].index[0]
+    changed = after.copy()
+    changed.loc[changed["job_no"] == job, "quoted_amount_total"] += 100.0
+    assert _build(tmp_path, changed, incremental=True)["marts"]["job_mix_month"] == job_months[job]
+    _build(tmp_path / "full", changed, incremental=False)
+    incremental, full = (load_mart_table(path, "job_mix_month") for path in (tmp_path, tmp_path / "full"))
+    pd.testing.assert_frame_equal(incremental, full)
+    assert "implied_utilisation" not in incremental.columns
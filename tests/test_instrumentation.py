@@ -0,0 +1,66 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src import instrumentation
+from src.instrumentation import instrument, mark_cache, span
+
+
+@instrument("pack", cached=True)
+def _double(df: pd.DataFrame, miss: bool = False) -> pd.DataFrame:
+    if miss:
+        mark_cache("miss")
+    return pd.concat([df, df])
+
+
+@pytest.fixture
+def recording():
+    instrumentation.clear()
+    instrumentation.configure("timing", buffer_size=3)
+    yield
+    instrumentation.configure("off", buffer_size=5000)
+    instrumentation.clear()
+
+
+def test_disabled_records_nothing():
+    instrumentation.clear()
+    _double(pd.DataFrame({"a": [1]}))
+    with span("section"):
+        pass
+    assert instrumentation.spans() == []
+
+
+def test_spans_rows_cache_and_ring_buffer(recording):
+    df = pd.DataFrame({"a": [1, 2]})
+    _double(df, miss=True)
+    _double(df)
+    with span("section") as current:
+        current.output(df)
+    first, second, section = instrumentation.spans()
+    assert (first.name, first.kind, first.rows_in, first.rows_out, first.cache) == ("_double", "pack", 2, 4, "miss")
+    assert second.cache == "hit"
+    assert (section.kind, section.rows_out, section.cache) == ("page", 2, None)
+
+    _double(df)
+    assert len(instrumentation.spans()) == 3
+    summary = instrumentation.span_summary(instrumentation.spans_frame()).set_index("name")
+    assert summary.loc["_double", "calls"] == 2
+    assert summary.loc["_double", "cache_hit_rate"] == 1.0
+
+    trace = json.loads(instrumentation.to_chrome_trace(instrumentation.spans()))
+    assert [event["ph"] for event in trace["traceEvents"]] == ["X"] * 3
+    lines = instrumentation.to_jsonl(instrumentation.spans()).splitlines()
+    assert json.loads(lines[-1])["name"] == "_double"
+
+
+def test_memory_mode_attributes_nested_peaks(recording):
+    instrumentation.configure("memory")
+    with span("outer"):
+        with span("inner"):
+            block = bytearray(4_000_000)
+            del block
+    inner, outer = instrumentation.spans()
+    assert inner.depth == 1 and outer.depth == 0
+    assert inner.alloc_bytes >= 4_000_000
+    assert outer.alloc_bytes >= inner.alloc_bytes
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from src.data.inverted_index import ColumnIndex, resolve_rows
+
+
+def _frame(n: int = 5000) -> pd.DataFrame:
+    rng = np.random.default_rng(11)
+    client = pd.Series(rng.choice(["A", "B", "C", "D", None], n), dtype="category")
+    return pd.DataFrame({
+        "client": client,
+        "state": rng.choice(["NSW", "VIC", "QLD"], n),
+        "month_ord": rng.integers(24270, 24300, n),
+    })
+
+
+def test_postings_are_sorted_row_ids_per_value():
+    index = ColumnIndex.from_series(_frame()["client"])
+    assert list(index.values) == ["A", "B", "C", "D"]
+    rows = index.postings(index.isin(["B", "D"]))
+    expected = np.flatnonzero(_frame()["client"].isin(["B", "D"]).to_numpy())
+    assert np.array_equal(rows, expected)
+    # Missing values have their own slot.
+    missing = index.postings(index.allowed(np.zeros(4, dtype=bool), missing=True))
+    assert np.array_equal(missing, np.flatnonzero(_frame()["client"].isna().to_numpy()))
+
+
+def test_resolve_rows_matches_boolean_masks():
+    df = _frame()
+    client, state, month = (ColumnIndex.from_series(df[col]) for col in ["client", "state", "month_ord"])
+    in_range = (month.values >= 24290) & (month.values <= 24295)
+    cases = [
+        [(client, client.isin(["A"])), (month, month.allowed(in_range))],
+        [(state, state.isin(["NSW", "VIC"])), (client, client.isin(["A", "B", "C"]))],
+        [(state, state.isin(["QLD"])), (month, month.allowed(in_range)), (client, client.isin(["D"]))],
+    ]
+    masks = [
+        df["client"].eq("A") & df["month_ord"].between(24290, 24295),
+        df["state"].isin(["NSW", "VIC"]) & df["client"].isin(["A", "B", "C"]),
+        df["state"].eq("QLD") & df["month_ord"].between(24290, 24295) & df["client"].eq("D"),
+    ]
+    for predicates, mask in zip(cases, masks):
+        assert np.array_equal(resolve_rows(predicates, len(df)), np.flatnonzero(mask.to_numpy(dtype=bool)))
+    everything = state.isin(["NSW", "VIC", "QLD"])
+    assert resolve_rows([(state, everything)], len(df)) is None
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from src.data.synthetic import synthetic_job_task_month, synthetic_timesheet
+from src.metrics.job_mix import job_level_quotes, job_mix_pack
+
+
+def test_job_mix_quotes_match_per_group_isin():
+    df = synthetic_job_task_month(synthetic_timesheet(3_000, seed=11, months=4))
+    df.loc[df.index % 7 == 0, "job_category"] = None
+
+    job_quote = job_level_quotes(df)
+    mix = job_mix_pack(df, pd.DataFrame({"billable_capacity": [500.0]}), 4, 0.75, job_quote)
+
+    expected = df.groupby(["month_key", "department_final", "job_category"], dropna=False).apply(
+        lambda g: pd.Series({
+            "job_count": g["job_no"].nunique(),
+            "total_quoted_amount": job_quote.loc[job_quote["job_no"].isin(g["job_no"].unique()), "quoted_amount"].sum(),
+            "total_quoted_hours": job_quote.loc[job_quote["job_no"].isin(g["job_no"].unique()), "quoted_hours"].sum(),
+        })
+    ).reset_index()
+    for column in ["job_count", "total_quoted_amount", "total_quoted_hours"]:
+        np.testing.assert_allclose(mix[column], expected[column], err_msg=column)
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from src.data.loader import load_processed_table
+
+
+def _fact() -> pd.DataFrame:
+    return pd.DataFrame({
+        "department_final": ["D1", "D2", "D1", "D2", "D1", "D2"],
+        "month_key": ["2024-01", "2024-01", "2024-02", "2024-02", "2024-03", "2024-03"],
+        "hours_raw": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        "rev_alloc": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+    })
+
+
+@pytest.mark.parametrize("month_key", [
+    ["2024-01", "2024-01", "2024-02", "2024-02", "2024-03", "2024-03"],
+    ["202401", "202401", "202402", "202402", "202403", "202403"],
+    [202401, 202401, 202402, 202402, 202403, 202403],
+    ["2024-01-05", "2024-01-09", "2024-02-01", "2024-02-28", "2024-03-03", "2024-03-31"],
+])
+def test_parquet_projection_and_month_pushdown(tmp_path, month_key):
+    (tmp_path / "processed").mkdir()
+    _fact().assign(month_key=month_key).to_parquet(
+        tmp_path / "processed" / "fact.parquet", index=False, row_group_size=2
+    )
+    df = load_processed_table(
+        tmp_path,
+        "fact",
+        columns=["department_final", "hours_raw", "month_ord"],
+        filters=[("month_ord", ">=", 2024 * 12 + 1), ("department_final", "in", ["D1"])],
+    )
+    assert list(df.columns) == ["department_final", "hours_raw", "month_ord"]
+    assert df["hours_raw"].tolist() == [3.0, 5.0]
+
+
+def test_csv_projection_and_filters(tmp_path):
+    (tmp_path / "processed").mkdir()
+    _fact().to_csv(tmp_path / "processed" / "fact.csv", index=False)
+    df = load_processed_table(
+        tmp_path,
+        "fact",
+        columns=["rev_alloc"],
+        filters=[("department_final", "==", "D2"), ("month_ord", "<=", 2024 * 12 + 1)],
+    )
+    assert list(df.columns) == ["rev_alloc"]
+    assert df["rev_alloc"].tolist() == [20.0, 40.0]
+
+
+def test_dtype_profile_applied_at_load(tmp_path, monkeypatch):
+    monkeypatch.setenv("FLOAT32_MEASURES", "1")
+    (tmp_path / "processed").mkdir()
+    _fact().assign(is_billable=["True", "False", "", "yes", "0", "1"]).to_csv(
+        tmp_path / "processed" / "fact.csv", index=False
+    )
+    df = load_processed_table(tmp_path, "fact", filters=[("department_final", "==", "D1")])
+    assert isinstance(df["department_final"].dtype, pd.CategoricalDtype)
+    assert df["is_billable"].dtype == bool
+    assert df["is_billable"].tolist() == [True, False, False]
+    assert df["hours_raw"].dtype == "float32"
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from src.data.filters import filtered_table, read_filtered
+from src.data.marts import build_all_marts
+from src.data.semantic import build_quote_dim
+from src.data.synthetic import synthetic_job_task_month, synthetic_timesheet
+from src.metrics.margin_bridge import ADDITIVE_COLUMNS, monthly_bridge, summarise_bridge
+
+FACT_TABLE = "fact_timesheet_day_enriched"
+
+
+@pytest.fixture(scope="module")
+def data_dir(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp("data")
+    fact = synthetic_timesheet(4_000, seed=7, months=8)
+    (data_dir / "processed").mkdir()
+    fact.to_parquet(data_dir / "processed" / f"{FACT_TABLE}.parquet", index=False)
+    build_all_marts(fact, synthetic_job_task_month(fact), data_dir, recency_days=30, weeks_in_window=4, util_target=0.8)
+    return data_dir
+
+
+@pytest.mark.parametrize("filters", [{}, {"window_value": 3}, {"window_value": "FYTD"}])
+def test_bridge_from_the_mart_matches_the_fact(data_dir, filters):
+    mart = read_filtered(data_dir / "marts" / "cube_margin_bridge", filters)
+    fact = filtered_table(data_dir, FACT_TABLE, filters)
+    dim = build_quote_dim(filtered_table(data_dir, FACT_TABLE, {}))
+    from_mart, from_fact = (
+        summarise_bridge(bridge, ["department_final"]).astype({"department_final": str}).sort_values("department_final")
+        for bridge in (mart, monthly_bridge(fact, dim))
+    )
+    assert "month_ord" not in from_mart.columns
+    assert from_mart["department_final"].tolist() == from_fact["department_final"].tolist()
+    for col in ADDITIVE_COLUMNS:
+        np.testing.assert_allclose(from_mart[col].to_numpy(float), from_fact[col].to_numpy(float), rtol=1e-9)
+
+
+def test_summary_sums_only_the_additive_columns():
+    bridge = monthly_bridge(synthetic_timesheet(500, seed=3, months=2))
+    bridge["month_ord"] = 24290
+    department = bridge["department_final"].iloc[0]
+    bridge.loc[bridge["department_final"] == department, "expected_cost"] = np.nan
+    summary = summarise_bridge(bridge, ["department_final"]).set_index("department_final")
+    assert "month_ord" not in summary.columns and "expected_cost_rate" not in summary.columns
+    assert np.isnan(summary.loc[department, "expected_cost"])
+    totals = bridge.groupby("department_final", observed=True)["actual_cost"].sum()
+    np.testing.assert_allclose(summary["actual_cost"].to_numpy(), totals.loc[summary.index].to_numpy())
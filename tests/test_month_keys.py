@@ -0,0 +1,25 @@
+import pandas as pd
+
+from src.data.cohorts import recency_weights
+from src.data.semantic import add_aus_fy, month_key_to_ord, month_key_to_period
+
+
+def test_month_key_to_ord_mixed_formats():
+    keys = pd.Series(["2024-01", "202402", None, "2024-03-15", "2023-07"])
+    ords = month_key_to_ord(keys)
+    assert ords.dtype == "int32"
+    assert ords.tolist() == [2024 * 12, 2024 * 12 + 1, -1, 2024 * 12 + 2, 2023 * 12 + 6]
+    periods = month_key_to_period(keys)
+    assert periods.iloc[0] == pd.Period("2024-01", freq="M")
+    assert periods.isna().tolist() == [False, False, True, False, False]
+
+
+def test_month_key_to_ord_integer_keys():
+    assert month_key_to_ord(pd.Series([202401, 202312])).tolist() == [2024 * 12, 2023 * 12 + 11]
+
+
+def test_aus_fy_and_recency_from_month_ord():
+    df = pd.DataFrame({"month_key": ["2023-06", "2023-07", "2024-06"]})
+    assert add_aus_fy(df)["aus_fy"].tolist() == ["FY2023", "FY2024", "FY2024"]
+    weights = recency_weights(month_key_to_ord(df["month_key"]), half_life_months=12)
+    assert weights.tolist() == [0.5, 0.5 ** (11 / 12), 1.0]
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from src.data.options import (
+    build_department_categories,
+    build_filter_options,
+    category_options,
+    department_options,
+    filter_options,
+)
+
+
+def _fact() -> pd.DataFrame:
+    return pd.DataFrame({
+        "department_final": ["D1", "D1", "D2", "D2", None],
+        "job_category": ["Web", "Brand", "Web", "Web", "Web"],
+        "client": ["Acme", None, "Beta", "Acme", "Acme"],
+        "state": ["NSW", "VIC", "NSW", "NSW", "QLD"],
+        "month_key": ["2024-01", "2024-03", "2023-11", "2024-02", None],
+    })
+
+
+def test_filter_options_count_rows_and_month_span():
+    options = build_filter_options(_fact()).set_index(["dimension", "value"])
+    acme = options.loc[("client", "Acme")]
+    assert acme["row_count"] == 3
+    assert (acme["first_month_key"], acme["last_month_key"]) == ("2024-01", "2024-02")
+    assert ("client", "nan") not in options.index
+    assert pd.isna(options.loc[("state", "QLD"), "first_month_key"])
+    assert set(options.index.get_level_values("dimension")) == {"department_final", "job_category", "client", "state"}
+
+
+def test_department_categories_and_cached_lookups(tmp_path):
+    pairs = build_department_categories(_fact())
+    assert pairs[["department_final", "job_category", "row_count"]].values.tolist() == [
+        ["D1", "Brand", 1], ["D1", "Web", 1], ["D2", "Web", 2],
+    ]
+    (tmp_path / "marts").mkdir()
+    (tmp_path / "processed").mkdir()
+    _fact().to_parquet(tmp_path / "processed" / "fact_timesheet_day_enriched.parquet", index=False)
+    # Without the marts the options come from one scan of the fact table.
+    assert filter_options(tmp_path)["client"] == ["Acme", "Beta"]
+    pairs.to_parquet(tmp_path / "marts" / "dim_department_category.parquet", index=False)
+    assert department_options(tmp_path) == ["D1", "D2"]
+    assert category_options(tmp_path, "D1") == ["Brand", "Web"]
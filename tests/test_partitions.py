@@ -0,0 +1,92 @@
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from src.data.filters import filtered_table, partition_window, read_filtered
+from src.data.loader import _prune_partitions, load_table
+from src.data.partitions import file_label, partition_files, partition_values, write_partitions
+from src.data.synthetic import synthetic_timesheet
+
+
+def _fact() -> pd.DataFrame:
+    return synthetic_timesheet(3_000, seed=2, months=12)
+
+
+def test_hive_layout_sorted_row_groups_and_pruning(tmp_path, monkeypatch):
+    monkeypatch.setenv("PARQUET_ROW_GROUP_ROWS", "50")
+    df = _fact()
+    table_dir = tmp_path / "fact"
+    write_partitions(df, table_dir, by=["department_final"])
+    parts = partition_files(table_dir)
+    assert len({file_label(part) for part in parts}) == 12
+    first = parts[0]
+    values = partition_values(first)
+    assert first.relative_to(table_dir).parts[:2] == (f"aus_fy={values['aus_fy']}", f"month_key={file_label(first)}")
+    assert values["department_final"] in set(df["department_final"].astype(str))
+
+    month = df.loc[df["month_key"] == file_label(first)]
+    stored = pd.read_parquet(first)
+    assert len(stored) == (month["department_final"].astype(str) == values["department_final"]).sum()
+    assert stored["job_category"].tolist() == sorted(stored["job_category"].tolist())
+    metadata = pq.ParquetFile(first).metadata
+    assert metadata.num_row_groups == -(-len(stored) // 50)
+    column = metadata.row_group(0).column(metadata.schema.to_arrow_schema().get_field_index("job_category"))
+    assert column.statistics.has_min_max and "RLE_DICTIONARY" in str(column.encodings)
+
+    # A "Last 3 months" read opens only the three latest months of the selected department.
+    department = values["department_final"]
+    window = partition_window(table_dir, {"window_value": 3})
+    kept = _prune_partitions(parts, window, [("department_final", "in", (department,))])
+    assert {file_label(part) for part in kept} == set(sorted({file_label(part) for part in parts})[-3:])
+    assert all(partition_values(part)["department_final"] == department for part in kept)
+    loaded = load_table(table_dir)
+    assert len(loaded) == len(df)
+    assert loaded.groupby(["job_no", "task_name"], observed=True).ngroups == df.groupby(["job_no", "task_name"], observed=True).ngroups
+
+    # Rewriting one month replaces its directory and leaves the others alone.
+    label = file_label(parts[-1])
+    others = [part.stat().st_mtime_ns for part in parts if file_label(part) != label]
+    write_partitions(df.loc[df["month_key"] == label].head(5), table_dir, labels=[label], by=["department_final"])
+    assert sum(len(pd.read_parquet(part)) for part in partition_files(table_dir) if file_label(part) == label) == 5
+    assert [part.stat().st_mtime_ns for part in partition_files(table_dir) if file_label(part) != label] == others
+
+
+def test_filtered_table_reads_only_the_window(tmp_path):
+    df = _fact()
+    (tmp_path / "processed").mkdir()
+    df.to_parquet(tmp_path / "processed" / "flat.parquet", index=False)
+    write_partitions(df, tmp_path / "processed" / "fact_timesheet_day_enriched")
+    department = df["department_final"].iloc[0]
+    for filters in [{"window_value": 3, "exclude_leave": True}, {"window_value": "FYTD", "department_final": [department]}]:
+        partitioned = filtered_table(tmp_path, "fact_timesheet_day_enriched", filters)
+        flat = filtered_table(tmp_path, "flat", filters)
+        assert len(partitioned) == len(flat) > 0
+        assert partitioned["hours_raw"].sum() == pytest.approx(flat["hours_raw"].sum())
+    columns = read_filtered(tmp_path / "processed" / "fact_timesheet_day_enriched", {"window_value": 3}, ["hours_raw"])
+    assert list(columns.columns) == ["hours_raw"]
+    # month_ord comes back with month_key on both the windowed and the flat path.
+    for name in ["fact_timesheet_day_enriched", "flat"]:
+        months = filtered_table(tmp_path, name, {"window_value": 3}, ["month_key", "hours_raw"])
+        assert list(months.columns) == ["month_key", "hours_raw", "month_ord"]
+
+
+def test_flat_partitions_from_older_builds_are_read(tmp_path):
+    df = _fact()
+    table_dir = tmp_path / "cube"
+    table_dir.mkdir()
+    for label, part in df.groupby("month_key"):
+        part.to_parquet(table_dir / f"part-{label}.parquet", index=False)
+    assert len(load_table(table_dir)) == len(df)
+    write_partitions(df, table_dir)
+    assert not list(table_dir.glob("part-*.parquet"))
+    assert len(load_table(table_dir)) == len(df)
+
+
+def test_fully_pruned_read_does_no_io(tmp_path, monkeypatch):
+    df = _fact()
+    write_partitions(df, tmp_path / "fact")
+    full = load_table(tmp_path / "fact", ["month_key", "hours_raw"])
+    monkeypatch.setattr("src.data.loader._read_parquet", lambda *args: pytest.fail("read a pruned partition"))
+    empty = load_table(tmp_path / "fact", ["month_key", "hours_raw"], [("month_ord", "<", 0)])
+    assert empty.empty and list(empty.columns) == list(full.columns)
+    assert empty.dtypes.tolist() == full.dtypes.tolist()
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from src.data.aggregate import DedupSum, aggregate
+from src.data.cohorts import cohort_stats, recency_weights
+from src.data.semantic import build_quote_dim, get_month_ord, latest_month_ord
+from src.data.synthetic import synthetic_timesheet
+from src.metrics.benchmarks import task_quantile_benchmarks
+from src.metrics.quote_builder import quote_builder_scope, quote_builder_tasks, select_store, task_benchmarks
+
+
+def _fact() -> pd.DataFrame:
+    return synthetic_timesheet(4_000, seed=3, months=18)
+
+
+def _selection(df: pd.DataFrame) -> dict:
+    # The busiest department and category pair.
+    pair = df.groupby(["department_final", "job_category"], observed=True).size().idxmax()
+    return dict(zip(["department_final", "job_category"], pair))
+
+
+def _page_selection(df: pd.DataFrame, window: int, active_only: bool) -> pd.DataFrame:
+    # The Quote Builder's per-selection filtering before the store existed.
+    ords = get_month_ord(df)
+    df = df.loc[ords >= latest_month_ord(ords) - window + 1]
+    if active_only:
+        staff = df.groupby("staff_name")["hours_raw"].sum()
+        df = df.loc[df["staff_name"].isin(staff[staff > 0].index)]
+    return df
+
+
+def test_scope_matches_per_selection_recompute():
+    df = _fact()
+    scope = quote_builder_scope(df, half_life_months=3, active_staff_months=6)
+    pairs = df[["department_final", "job_category"]].drop_duplicates()
+    assert len(scope) == len(pairs) * 4 * 2 * 2
+    key = _selection(df)
+    for window in (3, 12):
+        for active_only in (False, True):
+            for recency in (False, True):
+                selection = df.loc[(df["department_final"] == key["department_final"]) & (df["job_category"] == key["job_category"])]
+                subset = _page_selection(selection, window, active_only)
+                row = select_store(scope, **key, window=window, recency_weighted=recency, active_only=active_only)
+                assert len(row) == 1
+                row = row.iloc[0]
+                weights = recency_weights(get_month_ord(subset), 3) if recency else 1.0
+                expected = (subset["base_cost"] * weights).sum() / (subset["hours_raw"] * weights).sum()
+                assert np.isclose(row["cost_rate"], expected)
+                stats = cohort_stats(subset, recency, 6)
+                assert row["n_jobs"] == stats.n_jobs
+                assert row["n_active_staff"] == stats.n_active_staff
+                assert f"{row['first_month_key']} to {row['last_month_key']}" == stats.date_span
+
+
+def test_task_templates_dedupe_quotes_within_window():
+    df = _fact()
+    tasks = quote_builder_tasks(df, windows=(6,))
+    key = _selection(df)
+    selection = df.loc[(df["department_final"] == key["department_final"]) & (df["job_category"] == key["job_category"])]
+    subset = _page_selection(selection, 6, True)
+    expected = aggregate(subset, ["task_name"], [DedupSum("quoted_hours", "quoted_time_total")])
+    got = select_store(tasks, **key, window=6, active_only=True)
+    merged = got.merge(expected, on="task_name", suffixes=("", "_expected"))
+    assert len(merged) == len(expected)
+    assert np.allclose(merged["quoted_hours"], merged["quoted_hours_expected"])
+
+
+def test_task_benchmarks_follow_window_and_active_staff():
+    df = _fact()
+    benchmarks = task_benchmarks(df, half_life_months=3, windows=(3, 12))
+    key = _selection(df)
+    selection = df.loc[(df["department_final"] == key["department_final"]) & (df["job_category"] == key["job_category"])]
+    for window, active_only in [(3, False), (12, True)]:
+        subset = _page_selection(selection, window, active_only)
+        expected = task_quantile_benchmarks(build_quote_dim(subset), 3, ["task_name"])
+        got = select_store(benchmarks, **key, window=window, active_only=active_only)
+        for weighting in ("recency", "uniform"):
+            pair = [frame.loc[frame["weighting"] == weighting].sort_values("task_name") for frame in (got, expected)]
+            assert pair[0]["task_name"].tolist() == pair[1]["task_name"].tolist()
+            for column in ["actual_hours_p50", "quoted_hours_p90", "job_count"]:
+                assert np.allclose(pair[0][column], pair[1][column], equal_nan=True)
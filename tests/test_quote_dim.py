@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from src.data.partitions import write_parquet
+from src.data.quote_dim import load_quote_dim, write_quote_dim
+from src.data.semantic import build_quote_dim, ensure_company
+from src.data.synthetic import synthetic_timesheet
+from src.metrics.active_projects import active_projects_pack
+from src.metrics.quote_delivery import quote_delivery_pack
+
+
+def _fact(seed: int = 2) -> pd.DataFrame:
+    return synthetic_timesheet(3_000, seed=seed, months=6)
+
+
+def test_quote_dim_has_one_row_per_job_task():
+    df = _fact()
+    dim = build_quote_dim(df)
+    first = df.drop_duplicates(["job_no", "task_name"])
+    assert dim[["job_no", "task_name"]].values.tolist() == first[["job_no", "task_name"]].values.tolist()
+    assert dim["month_key"].tolist() == first["month_key"].tolist()
+    totals = df.groupby(["job_no", "task_name"])["hours_raw"].sum()
+    assert np.allclose(dim.set_index(["job_no", "task_name"])["actual_hours"].loc[totals.index], totals)
+    months = df.groupby(["job_no", "task_name"])["month_key"].agg(["min", "max"])
+    indexed = dim.set_index(["job_no", "task_name"]).loc[months.index]
+    assert indexed["first_month_key"].tolist() == months["min"].tolist()
+    assert indexed["last_month_key"].tolist() == months["max"].tolist()
+
+
+def test_packs_match_with_quote_dim():
+    df = ensure_company(_fact())
+    dim = build_quote_dim(df)
+    for keys in (["department_final"], ["department_final", "job_category", "task_name"], ["staff_name"]):
+        pd.testing.assert_frame_equal(quote_delivery_pack(df, keys), quote_delivery_pack(df, keys, quote_dim=dim))
+    pd.testing.assert_frame_equal(active_projects_pack(df, 30), active_projects_pack(df, 30, quote_dim=dim))
+
+
+def test_jobs_without_scope_creep_have_missing_creep_hours():
+    df = _fact()
+    # Every second job is fully quoted.
+    matched = df["job_no"].isin(df["job_no"].unique()[::2])
+    df["quote_match_flag"] = df["quote_match_flag"].where(~matched, "matched")
+    pack = active_projects_pack(df, 120)
+    creep = df.loc[df["quote_match_flag"] == "no_match", "job_no"].unique()
+    with_creep = pack["job_no"].isin(creep)
+    assert with_creep.any() and not with_creep.all()
+    assert pack.loc[~with_creep, ["scope_creep_hours", "scope_creep_share"]].isna().all().all()
+    assert pack.loc[with_creep, "scope_creep_hours"].notna().all()
+
+
+def test_quote_dim_is_not_loaded_after_the_fact_changes(tmp_path):
+    fact_path = tmp_path / "processed" / "fact_timesheet_day_enriched.parquet"
+    df = _fact()
+    write_parquet(df, fact_path)
+    write_quote_dim(tmp_path, df)
+    dim = load_quote_dim(tmp_path)
+    assert dim is not None and len(dim) == len(build_quote_dim(df))
+
+    write_parquet(_fact(seed=3), fact_path)
+    assert load_quote_dim(tmp_path) is None
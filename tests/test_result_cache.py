@@ -0,0 +1,63 @@
+import os
+
+import pandas as pd
+
+from src.data.result_cache import ResultCache, cached_pack, result_cache, table_content_hash
+
+
+def _write_fact(data_dir, hours):
+    (data_dir / "processed").mkdir(parents=True, exist_ok=True)
+    path = data_dir / "processed" / "fact_timesheet_day_enriched.parquet"
+    pd.DataFrame({"department_final": ["D1", "D2"], "hours_raw": hours}).to_parquet(path, index=False)
+    return path
+
+
+def test_cached_pack_reuses_results_until_the_input_changes(tmp_path):
+    path = _write_fact(tmp_path, [1.0, 2.0])
+    calls = []
+
+    def compute():
+        calls.append(1)
+        df = pd.read_parquet(path)
+        return df.groupby("department_final", as_index=False)["hours_raw"].sum()
+
+    args = (tmp_path, "hours_pack", compute, ["fact_timesheet_day_enriched"])
+    first = cached_pack(*args, group_keys=["department_final"], filters={"window_value": 6})
+    again = cached_pack(*args, group_keys=["department_final"], filters={"window_value": 6})
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, again)
+    # Other filters or parameters are other entries.
+    cached_pack(*args, group_keys=["department_final"], filters={"window_value": 12})
+    cached_pack(*args, params={"weeks": 4}, group_keys=["department_final"], filters={"window_value": 6})
+    assert len(calls) == 3
+
+    before = table_content_hash(path)
+    _write_fact(tmp_path, [5.0, 2.0])
+    assert table_content_hash(path) != before
+    changed = cached_pack(*args, group_keys=["department_final"], filters={"window_value": 6})
+    assert len(calls) == 4
+    assert changed["hours_raw"].tolist() == [5.0, 2.0]
+    assert result_cache(tmp_path).report()["hits"] >= 1
+
+
+def test_dict_results_and_lru_eviction(tmp_path):
+    cache = ResultCache(tmp_path / "results", max_bytes=10**9)
+    frames = {"staff": pd.DataFrame({"a": [1]}), "department": pd.DataFrame({"b": ["x"]})}
+    cache.put("aa" + "0" * 30, frames)
+    stored = cache.get("aa" + "0" * 30)
+    assert set(stored) == {"staff", "department"}
+    assert stored["department"]["b"].tolist() == ["x"]
+
+    frame = pd.DataFrame({"value": range(1000)})
+    for index, key in enumerate(["b1" + "1" * 30, "b2" + "2" * 30, "b3" + "3" * 30]):
+        cache.put(key, frame)
+        entry = cache._paths(key)[0]
+        os.utime(entry, (1_000_000 + index, 1_000_000 + index))
+    cache.get("b1" + "1" * 30)  # most recently used again
+    sizes = {path.name: size for _, size, path in cache.entries()}
+    cache.max_bytes = sum(sizes.values()) - 1
+    cache.evict()
+    remaining = {path.stem for _, _, path in cache.entries()}
+    assert "b1" + "1" * 30 in remaining
+    assert "b2" + "2" * 30 not in remaining
+    assert cache.get("missing" + "0" * 25) is None
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.marts import build_all_marts
+from src.data.router import FACT_TABLE, _from_fact, query, route
+from src.data.synthetic import synthetic_job_task_month, synthetic_timesheet
+
+MEASURES = ["hours", "revenue", "margin", "margin_pct", "realised_rate", "quoted_hours", "quote_rate"]
+PROFIT = ["hours", "revenue", "margin", "margin_pct", "realised_rate"]
+
+
+@pytest.fixture(scope="module")
+def data_dir(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp("data")
+    fact = synthetic_timesheet(4_000, seed=5, months=8)
+    (data_dir / "processed").mkdir()
+    fact.to_parquet(data_dir / "processed" / f"{FACT_TABLE}.parquet", index=False)
+    build_all_marts(fact, synthetic_job_task_month(fact), data_dir, recency_days=30, weeks_in_window=4, util_target=0.8)
+    return data_dir
+
+
+def _assert_matches_fact(data_dir, result, keys, filters, measures=MEASURES):
+    expected = _from_fact(data_dir, measures, keys, filters)
+    result, expected = (frame.astype({key: str for key in keys}).sort_values(keys) for frame in (result, expected))
+    assert result[keys].values.tolist() == expected[keys].values.tolist()
+    for name in measures:
+        np.testing.assert_allclose(result[name].to_numpy(float), expected[name].to_numpy(float), rtol=1e-9)
+
+
+@pytest.mark.parametrize("measures, keys, filters, source", [
+    (MEASURES, ["department_final"], {}, "cube_dept_month"),
+    (PROFIT, ["department_final", "job_category"], {"window_value": 3}, "cube_dept_category_month"),
+    (PROFIT, ["department_final"], {"window_value": 6, "exclude_leave": True}, "cube_hierarchy_month[task]"),
+    (MEASURES, ["staff_name"], {}, "cube_dept_category_staff"),
+])
+def test_routes_to_the_coarsest_covering_mart(data_dir, measures, keys, filters, source):
+    grain = route(data_dir, measures, keys, filters)
+    assert grain.source == source
+    _assert_matches_fact(data_dir, query(data_dir, measures, keys, filters), keys, filters, measures)
+
+
+def test_windowed_quotes_do_not_depend_on_the_route(data_dir):
+    # Marts attribute each quote to the job-task's first month, so under a window quotes are
+    # answered from the fact table whichever other filters apply.
+    fact = pd.read_parquet(data_dir / "processed" / f"{FACT_TABLE}.parquet")
+    filters = {"window_value": 3}
+    assert route(data_dir, MEASURES, ["department_final"], filters) is None
+    _assert_matches_fact(data_dir, query(data_dir, MEASURES, ["department_final"], filters), ["department_final"], filters)
+    clients = sorted(fact["client"].dropna().unique().tolist())
+    narrowed = query(data_dir, MEASURES, ["department_final"], {**filters, "client": clients})
+    base = query(data_dir, MEASURES, ["department_final"], filters).dropna(subset=["quoted_hours"])
+    assert narrowed["department_final"].astype(str).tolist() == base["department_final"].astype(str).tolist()
+    np.testing.assert_allclose(narrowed["quoted_hours"].to_numpy(float), base["quoted_hours"].to_numpy(float))
+
+
+def test_selection_and_fact_fallback(data_dir):
+    fact = pd.read_parquet(data_dir / "processed" / f"{FACT_TABLE}.parquet")
+    department = fact["department_final"].iloc[0]
+    filters = {"window_value": 3}
+    tasks = query(data_dir, PROFIT, ["task_name"], filters, department_final=department)
+    assert route(data_dir, PROFIT, ["task_name", "department_final"], filters).source == "cube_hierarchy_month[task]"
+    _assert_matches_fact(data_dir, tasks, ["task_name"], {**filters, "department_final": [department]}, PROFIT)
+
+    # Filters on columns no mart keeps and non-additive measures are served by the fact table.
+    client = fact["client"].iloc[0]
+    assert route(data_dir, MEASURES, ["department_final"], {"client": [client]}) is None
+    assert route(data_dir, ["job_count"], ["department_final"], {}) is None
+    counts = query(data_dir, ["hours", "job_count"], ["department_final"], {"client": [client]})
+    selected = fact.loc[fact["client"] == client]
+    assert counts["job_count"].sum() == selected.groupby("department_final", observed=True)["job_no"].nunique().sum()
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from src.metrics.staffing import CapabilityIndex, assign_staff, staff_task_capability
+
+
+def _skill() -> pd.DataFrame:
+    df = pd.DataFrame({
+        "task_name": ["Design", "Design", "Design", "Build", "Build", "QA"],
+        "staff_name": ["Ann", "Bob", "Cy", "Bob", "Cy", "Ann"],
+        "month_key": ["2024-06", "2024-06", "2024-01", "2024-06", "2024-06", "2024-06"],
+        "hours_raw": [10.0, 30.0, 40.0, 20.0, 5.0, 8.0],
+    })
+    return staff_task_capability(df, half_life_months=1)
+
+
+def test_top_k_ranks_by_recency_weighted_hours():
+    index = CapabilityIndex.from_frame(_skill())
+    top = index.top_k(["Design", "Missing", "Build"], k=2)
+    assert top["task_name"].tolist() == ["Design", "Design", "Build", "Build"]
+    # Cy's 40h are five half-lives old (1.25 weighted hours).
+    assert top["staff_name"].tolist() == ["Bob", "Ann", "Bob", "Cy"]
+    assert top["rank"].tolist() == [1, 2, 1, 2]
+    assert np.isclose(index.top_k(["Design"], k=3)["capability_score"].iloc[-1], 1.25)
+
+
+def test_assignment_respects_headroom():
+    index = CapabilityIndex.from_frame(_skill())
+    plan = pd.DataFrame({"task_name": ["Design", "Build", "QA"], "planned_hours": [25.0, 10.0, 5.0]})
+    headroom = pd.Series({"Ann": 12.0, "Bob": 20.0, "Cy": 100.0})
+    allocation = assign_staff(index, plan, headroom)
+
+    by_staff = allocation.groupby("staff_name")["assigned_hours"].sum()
+    assert (by_staff <= headroom.reindex(by_staff.index)).all()
+    by_task = allocation.groupby("task_name")["assigned_hours"].sum()
+    assert by_task.to_dict() == {"Build": 10.0, "Design": 25.0, "QA": 5.0}
+    # Bob (the best Design and Build candidate) is filled on Design first, then Cy picks up Build.
+    design = allocation.loc[allocation["task_name"] == "Design"].set_index("staff_name")["assigned_hours"]
+    assert design.to_dict() == {"Bob": 20.0, "Ann": 5.0}
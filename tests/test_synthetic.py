@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from src.data.loader import load_table
+from src.data.schema import (
+    validate_audit_revenue,
+    validate_audit_unallocated,
+    validate_fact_job_task_month,
+    validate_fact_timesheet,
+)
+from src.data.synthetic import (
+    synthetic_audit_tables,
+    synthetic_job_task_month,
+    synthetic_timesheet,
+    write_synthetic_tables,
+)
+
+
+def test_synthetic_tables_match_schema_and_are_seeded():
+    df = synthetic_timesheet(20_000, seed=3, months=12)
+    assert len(df) == 20_000
+    assert not validate_fact_timesheet(df).missing_soft
+    assert not validate_fact_job_task_month(synthetic_job_task_month(df)).missing_soft
+    revenue, unallocated = synthetic_audit_tables(df)
+    validate_audit_revenue(revenue)
+    validate_audit_unallocated(unallocated)
+    assert np.isclose(revenue["rev_alloc_total"].sum(), df["rev_alloc"].sum())
+
+    pd.testing.assert_frame_equal(df, synthetic_timesheet(20_000, seed=3, months=12))
+    assert not df["hours_raw"].equals(synthetic_timesheet(20_000, seed=4, months=12)["hours_raw"])
+    assert df["month_key"].nunique() == 12
+    # Heavy-tailed jobs: the largest tenth of jobs hold most of the rows.
+    sizes = df["job_no"].value_counts()
+    assert sizes.iloc[: len(sizes) // 10].sum() > 0.4 * len(df)
+    # A job-task has one quote.
+    quotes = df.groupby(["job_no", "task_name"], observed=True)["quoted_time_total"].nunique()
+    assert quotes.max() <= 1
+
+
+def test_written_tables_do_not_depend_on_chunking(tmp_path):
+    paths = write_synthetic_tables(tmp_path, 5_000, seed=1, months=6)
+    written = load_table(paths["fact_timesheet_day_enriched"])
+    expected = synthetic_timesheet(5_000, seed=1, months=6)
+    assert len(written) == len(expected)
+    assert np.isclose(written["hours_raw"].sum(), expected["hours_raw"].sum())
+    job_task = load_table(paths["fact_job_task_month"])
+    assert np.isclose(job_task["hours_raw_sum"].sum(), expected["hours_raw"].sum())